@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synthetic Corpora - scaled copies of the shipped data/ directory for benchmarks.
+
+Usage:
+    python corpus.py --scale 100 --output /tmp/uipro-100x
+
+A scale-N corpus keeps every searchable CSV's header and original rows, then
+appends N-1 perturbed copies of each row: in every copy a share of the words
+in each cell is swapped for words seen in the same column elsewhere, so
+vocabulary, document lengths and term statistics grow like real data instead
+of repeating the same documents. Only the domain and stack files
+(CSV_CONFIG / STACK_CONFIG) are scaled; configuration tables such as the
+domain keywords and reasoning rules are copied unchanged.
+"""
+
+import csv
+import random
+import shutil
+import sys
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from core import CSV_CONFIG, DATA_DIR, STACK_CONFIG
+
+
+# ============ CONFIGURATION ============
+SEED = 1729
+# Share of words per cell replaced in each synthetic copy
+MUTATION_RATE = 0.3
+# Columns whose values stay as-is (identifiers, URLs, hex colours, JSON)
+VERBATIM_SUFFIXES = ("(Hex)", "URL", "Import", "Decision_Rules")
+
+
+def _csv_files(source):
+    return sorted(p for p in Path(source).rglob("*.csv"))
+
+
+def _scaled_files():
+    """Relative paths of the searchable CSVs; every other CSV is configuration"""
+    return {config["file"] for config in CSV_CONFIG.values()} | {config["file"] for config in STACK_CONFIG.values()}
+
+
+def _row_count(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return sum(1 for _ in csv.DictReader(f))
+
+
+def _column_words(rows, columns):
+    words = {col: [] for col in columns}
+    for row in rows:
+        for col in columns:
+            words[col].extend((row.get(col) or "").split())
+    return words
+
+
+def _mutate(value, pool, rng):
+    words = value.split()
+    if not words or not pool:
+        return value
+    return " ".join(rng.choice(pool) if rng.random() < MUTATION_RATE else word for word in words)
+
+
+def scale_csv(source_file, target_file, scale, seed=SEED):
+    """Write source_file with its rows expanded to scale copies; returns the row count"""
+    with open(source_file, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        columns = reader.fieldnames or []
+        rows = list(reader)
+
+    rng = random.Random(f"{seed}:{source_file.name}:{scale}")
+    pools = _column_words(rows, columns)
+    text_cols = [col for col in columns if col != "No" and not col.endswith(VERBATIM_SUFFIXES)]
+
+    target_file.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with open(target_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, restval="", extrasaction="ignore")
+        writer.writeheader()
+        for copy in range(scale):
+            for row in rows:
+                out = {col: row.get(col) or "" for col in columns}
+                if copy:
+                    for col in text_cols:
+                        out[col] = _mutate(out[col], pools[col], rng)
+                if "No" in out:
+                    out["No"] = str(count + 1)
+                writer.writerow(out)
+                count += 1
+    return count
+
+
+def build_corpus(output, scale, source=None, seed=SEED):
+    """Scale the domain and stack CSVs under source (default: data/) into output, copying
+    the other CSVs unchanged; returns {relative file: rows}"""
+    source = Path(source) if source else DATA_DIR
+    output = Path(output)
+    if output.exists():
+        shutil.rmtree(output)
+    scaled = _scaled_files()
+    counts = {}
+    for source_file in _csv_files(source):
+        rel = source_file.relative_to(source)
+        if rel.as_posix() in scaled:
+            counts[rel.as_posix()] = scale_csv(source_file, output / rel, scale, seed)
+        else:
+            (output / rel).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(source_file, output / rel)
+            counts[rel.as_posix()] = _row_count(source_file)
+    return counts
+
+
+# ============ CLI SUPPORT ============
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a scaled synthetic copy of data/")
+    parser.add_argument("--scale", type=int, required=True, help="Row multiplier (e.g. 10, 100, 1000)")
+    parser.add_argument("--output", "-o", type=str, required=True, help="Output directory (replaced)")
+    parser.add_argument("--seed", type=int, default=SEED, help="Random seed")
+
+    args = parser.parse_args()
+
+    counts = build_corpus(args.output, args.scale, seed=args.seed)
+    print(f"Wrote {sum(counts.values())} rows across {len(counts)} files to {args.output}")
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reference BM25 and differential check.
+
+Usage:
+    python reference.py                      # shipped data/, 300 queries per corpus
+    python reference.py --scale 10 --queries 1000
+
+ReferenceBM25 is the original exhaustive scorer: it re-counts term
+frequencies for every document on every query and sorts all N scores. Every
+optimised engine (BM25.top_k, NumpyBM25, the memory-mapped index, a
+ShardedIndex) must return exactly its ranked document IDs for randomised
+queries - unfiltered, with random --where filters and with typo'd queries
+under fuzzy=True (expanded here by a full vocabulary scan). The combined
+index over every stack (search_stack "all") is checked the same way.
+"""
+
+import random
+import re
+import sys
+import tempfile
+from collections import defaultdict
+from math import log
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import core
+from core import (BM25, CSV_CONFIG, FUZZY_DISCOUNTS, FUZZY_MAX_DISTANCE, FUZZY_MAX_EXPANSIONS, FUZZY_SHORT_TOKEN,
+                  STACK_CONFIG, STACK_LABEL_COL, ShardedIndex, _STACK_COLS, bitmap_ids, edit_distance, where_conditions)
+
+# ============ CONFIGURATION ============
+# Worker processes of the ShardedIndex under test
+SHARDS = 2
+# Random filters per corpus, and typo'd queries per corpus as a fraction of --queries
+FILTERS_PER_CORPUS = 3
+FUZZY_QUERY_FRACTION = 0.2
+
+
+# ============ REFERENCE IMPLEMENTATION ============
+class ReferenceBM25:
+    """BM25 ranking algorithm for text search (original exhaustive version)"""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.corpus = []
+        self.doc_lengths = []
+        self.avgdl = 0
+        self.idf = {}
+        self.doc_freqs = defaultdict(int)
+        self.N = 0
+
+    def tokenize(self, text):
+        """Lowercase, split, remove punctuation, filter short words"""
+        text = re.sub(r'[^\w\s]', ' ', str(text).lower())
+        return [w for w in text.split() if len(w) > 2]
+
+    def fit(self, documents):
+        """Build BM25 index from documents"""
+        self.corpus = [self.tokenize(doc) for doc in documents]
+        self.N = len(self.corpus)
+        if self.N == 0:
+            return
+        self.doc_lengths = [len(doc) for doc in self.corpus]
+        self.avgdl = sum(self.doc_lengths) / self.N
+
+        for doc in self.corpus:
+            seen = set()
+            for word in doc:
+                if word not in seen:
+                    self.doc_freqs[word] += 1
+                    seen.add(word)
+
+        for word, freq in self.doc_freqs.items():
+            self.idf[word] = log((self.N - freq + 0.5) / (freq + 0.5) + 1)
+
+    def score(self, query):
+        """Score all documents against query"""
+        return self.score_weighted([(token, 1.0) for token in self.tokenize(query)])
+
+    def score_weighted(self, weighted_terms):
+        """Score all documents against [(term, factor)]: each term's contribution is scaled by its factor"""
+        scores = []
+
+        for idx, doc in enumerate(self.corpus):
+            score = 0
+            doc_len = self.doc_lengths[idx]
+            term_freqs = defaultdict(int)
+            for word in doc:
+                term_freqs[word] += 1
+
+            for token, factor in weighted_terms:
+                if token in self.idf:
+                    tf = term_freqs[token]
+                    idf = self.idf[token]
+                    numerator = tf * (self.k1 + 1)
+                    denominator = tf + self.k1 * (1 - self.b + self.b * doc_len / self.avgdl)
+                    score += factor * (idf * numerator / denominator)
+
+            scores.append((idx, score))
+
+        return sorted(scores, key=lambda x: x[1], reverse=True)
+
+    def expand(self, tokens):
+        """fuzzy=True query terms [(term, factor)] by scanning the whole vocabulary, or None for the exact query"""
+        if all(token in self.idf for token in tokens) or not self.idf:
+            return None
+        weighted, expanded = [], False
+        for token in tokens:
+            if token in self.idf:
+                weighted.append((token, 1.0))
+                continue
+            if token.isdigit():
+                continue
+            limit = 1 if len(token) <= FUZZY_SHORT_TOKEN else FUZZY_MAX_DISTANCE
+            near = [(edit_distance(token, term, limit), term) for term in self.idf]
+            near = [(distance, term) for distance, term in near if distance <= limit]
+            if not near:
+                continue
+            closest = min(near)[0]
+            terms = sorted((term for distance, term in near if distance == closest),
+                           key=lambda term: (-self.doc_freqs[term], term))
+            weighted.extend((term, FUZZY_DISCOUNTS[closest]) for term in terms[:FUZZY_MAX_EXPANSIONS])
+            expanded = True
+        return weighted if expanded else None
+
+    def ranked_ids(self, query, k, allowed=None, fuzzy=False):
+        """IDs of the top-k documents with score > 0, as the search functions return them.
+
+        allowed is an optional set of document IDs; only those are ranked.
+        """
+        weighted = self.expand(self.tokenize(query)) if fuzzy else None
+        scores = self.score_weighted(weighted) if weighted is not None else self.score(query)
+        return [idx for idx, score in scores if score > 0 and (allowed is None or idx in allowed)][:k]
+
+
+# ============ DIFFERENTIAL CHECK ============
+def corpora(data_dir):
+    """(relative file, search_cols, documents) for every configured CSV under data_dir"""
+    sources = [(c["file"], c["search_cols"]) for c in CSV_CONFIG.values()]
+    sources += [(c["file"], _STACK_COLS["search_cols"]) for c in STACK_CONFIG.values()]
+    for rel_file, search_cols in sources:
+        filepath = Path(data_dir) / rel_file
+        if filepath.exists():
+            rows = core.load_rows(filepath)
+            documents = [" ".join(str(row.get(col, "")) for col in search_cols) for row in rows]
+            yield rel_file, search_cols, documents
+
+
+def random_queries(documents, count, rng):
+    """Queries mixing corpus words, repeated words, unknown words and punctuation"""
+    tokenizer = BM25()
+    vocabulary = sorted({w for doc in documents for w in tokenizer.tokenize(doc)})
+    noise = ["zzqx", "a", "of", "ui-ux", "#fff", "3d", "e-commerce", ""]
+    queries = []
+    for _ in range(count):
+        words = rng.sample(vocabulary, min(len(vocabulary), rng.randint(1, 6)))
+        if words and rng.random() < 0.2:
+            words.append(rng.choice(words))
+        if rng.random() < 0.3:
+            words.append(rng.choice(noise))
+        rng.shuffle(words)
+        queries.append(" ".join(words))
+    return queries
+
+
+def _typo(word, rng):
+    """word with one deletion, insertion, substitution or adjacent swap"""
+    pos = rng.randrange(len(word))
+    char = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    edit = rng.randrange(4)
+    if edit == 0:
+        return word[:pos] + word[pos + 1:]
+    if edit == 1:
+        return word[:pos] + char + word[pos:]
+    if edit == 2:
+        return word[:pos] + char + word[pos + 1:]
+    return word[:pos] + word[pos + 1:pos + 2] + word[pos] + word[pos + 2:]
+
+
+def fuzzy_queries(documents, count, rng):
+    """Queries of corpus words, most of them misspelt by one or two edits"""
+    tokenizer = BM25()
+    vocabulary = sorted({w for doc in documents for w in tokenizer.tokenize(doc)})
+    queries = []
+    for _ in range(count if vocabulary else 0):
+        words = [_typo(word, rng) if rng.random() < 0.6 else word
+                 for word in rng.sample(vocabulary, min(len(vocabulary), rng.randint(1, 3)))]
+        if rng.random() < 0.3:
+            words.append(_typo(_typo(rng.choice(vocabulary), rng), rng))
+        queries.append(" ".join(words))
+    return queries
+
+
+def random_filters(records, count, rng):
+    """Normalised where conditions: one or two values of a column, sometimes ANDed with a second column"""
+    columns = list(records[0].keys()) if records else []
+    filters = []
+    for _ in range(count if columns else 0):
+        picked = rng.sample(columns, min(len(columns), rng.choice([1, 1, 2])))
+        where = {}
+        for col in picked:
+            values = sorted({row.get(col) or "" for row in records})
+            where[col] = rng.sample(values, min(len(values), rng.randint(1, 2)))
+        filters.append(where_conditions(where))
+    return filters
+
+
+def matching_rows(records, conditions):
+    """IDs of the records matching every (column, value keys) condition, by plain comparison"""
+    def key(value):
+        return "" if value is None else value.strip().casefold()
+
+    return {idx for idx, row in enumerate(records) if all(key(row.get(col)) in keys for col, keys in conditions)}
+
+
+def _engines(rel_file, search_cols, documents, mapped):
+    engines = [("BM25", BM25())]
+    if core._numpy() is not None:
+        engines.append(("NumpyBM25", core.NumpyBM25()))
+    for _, engine in engines:
+        engine.fit(documents)
+    if mapped is not None:
+        section = mapped.section(rel_file, search_cols)
+        if section is not None:
+            engines.append(("MappedSection", section))
+    engines.append(("ShardedIndex", ShardedIndex(engines[0][1], SHARDS)))
+    return engines
+
+
+def _check_corpus(label, reference, engines, rows, documents, queries, k_values, rng, mismatches):
+    """Compare engines with the reference on one corpus: unfiltered, filtered and fuzzy; returns lists checked"""
+    cases = [(random_queries(documents, queries, rng), None, False)]
+    # A Table, or CombinedRows over several
+    records = [row for table in getattr(rows, "tables", [rows]) for row in table]
+    for conditions in random_filters(records, FILTERS_PER_CORPUS, rng):
+        cases.append((random_queries(documents, max(1, queries // 10), rng), conditions, False))
+    cases.append((fuzzy_queries(documents, max(1, int(queries * FUZZY_QUERY_FRACTION)), rng), None, True))
+
+    checked = 0
+    for batch, conditions, fuzzy in cases:
+        bitmap = rows.where(conditions) if conditions else None
+        allowed = matching_rows(records, conditions) if conditions else None
+        mode = "fuzzy" if fuzzy else f"where={dict(conditions)}" if conditions else "exact"
+        if conditions and set(bitmap_ids(bitmap)) != allowed:
+            mismatches.append(f"{type(rows).__name__} {label} {mode}: row bitmap differs from a row scan")
+        for k in k_values:
+            expected = [reference.ranked_ids(query, k, allowed, fuzzy) for query in batch]
+            for name, engine in engines:
+                got = [[idx for idx, _ in ranked] for ranked in engine.top_k_many(batch, k, bitmap, fuzzy)]
+                for query, want, have in zip(batch, expected, got):
+                    checked += 1
+                    if want != have:
+                        mismatches.append(f"{name} {label} {mode} k={k} {query!r}: expected {want}, got {have}")
+    return checked
+
+
+def _close(engines):
+    for _, engine in engines:
+        if isinstance(engine, ShardedIndex):
+            engine.close()
+
+
+def differential_check(data_dir=None, queries=300, k_values=(1, 3, 10), seed=0, out=None):
+    """Compare every engine with ReferenceBM25; returns a list of mismatch descriptions"""
+    from binary_index import BinaryIndex, build_index
+
+    out = out or sys.stdout
+    data_dir = Path(data_dir) if data_dir else core.DATA_DIR
+    rng = random.Random(seed)
+    mismatches = []
+    checked = 0
+
+    saved_data_dir = core.DATA_DIR
+    core.DATA_DIR = data_dir
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            index_path = Path(tmp) / "search.idx"
+            build_index(index_path)
+            mapped = BinaryIndex(index_path)
+
+            for rel_file, search_cols, documents in corpora(data_dir):
+                reference = ReferenceBM25()
+                reference.fit(documents)
+                engines = _engines(rel_file, search_cols, documents, mapped)
+                try:
+                    checked += _check_corpus(rel_file, reference, engines, core.load_rows(data_dir / rel_file),
+                                             documents, queries, k_values, rng, mismatches)
+                finally:
+                    _close(engines)
+            del mapped
+
+            # Every stack through one combined index, as search_stack(query, "all") scores them
+            stacks = [name for name, config in STACK_CONFIG.items() if (data_dir / config["file"]).exists()]
+            if stacks:
+                search_cols = _STACK_COLS["search_cols"]
+                filepaths = [data_dir / STACK_CONFIG[name]["file"] for name in stacks]
+                rows, engine, _ = core._registry.combined(filepaths, stacks, search_cols, STACK_LABEL_COL)
+                documents = [" ".join(str(row.get(col, "")) for col in search_cols)
+                             for table in rows.tables for row in table]
+                reference = ReferenceBM25()
+                reference.fit(documents)
+                engines = [(f"Combined{type(engine).__name__}", engine), ("CombinedSharded", ShardedIndex(engine, SHARDS))]
+                try:
+                    checked += _check_corpus("stacks/*", reference, engines, rows, documents, queries, k_values, rng,
+                                             mismatches)
+                finally:
+                    _close(engines)
+    finally:
+        core.DATA_DIR = saved_data_dir
+
+    out.write(f"Differential check: {checked} ranked lists, {len(mismatches)} mismatches\n")
+    for line in mismatches[:20]:
+        out.write(f"  {line}\n")
+    return mismatches
+
+
+# ============ CLI SUPPORT ============
+if __name__ == "__main__":
+    import argparse
+
+    from corpus import build_corpus
+
+    parser = argparse.ArgumentParser(description="Check optimised BM25 engines against the reference")
+    parser.add_argument("--scale", type=int, default=1, help="Synthetic corpus scale (1 = shipped data/)")
+    parser.add_argument("--queries", type=int, default=300, help="Random queries per corpus")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+
+    args = parser.parse_args()
+
+    if args.scale == 1:
+        failures = differential_check(queries=args.queries, seed=args.seed)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            build_corpus(tmp, args.scale)
+            failures = differential_check(tmp, args.queries, seed=args.seed)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark Suite - throughput, latency and memory of search and generation.
+
+Usage:
+    python run.py                                   # shipped data, 10x and 100x corpora
+    python run.py --scales 1,10,100,1000            # add the 1000x corpus
+    python run.py --only search,search_stack        # subset of benchmarks
+    python run.py --save-baseline baselines/main.json
+    python run.py --baseline baselines/main.json --max-regression 0.2
+
+Every (benchmark, scale) pair runs in a fresh interpreter so peak RSS is
+measured per benchmark. Scale 1 is the shipped data/ directory; larger
+scales are synthetic corpora from corpus.py. Results report ops/sec,
+p50/p99 latency and peak RSS. With --baseline, any benchmark whose ops/sec
+drops (or peak RSS grows) by more than the allowed fraction fails the run.
+
+Unless --skip-differential is given, the run also checks that every
+optimised engine returns the reference BM25 ranking (reference.py).
+"""
+
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+SCRIPTS_DIR = BENCH_DIR.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is reported as null
+    resource = None
+
+
+# ============ CONFIGURATION ============
+DEFAULT_SCALES = [1, 10, 100]
+MIN_TIME = 1.0
+MIN_ITERATIONS = 5
+MAX_REGRESSION = 0.25
+MAX_RSS_REGRESSION = 0.5
+
+QUERIES = [
+    "saas dashboard", "fintech crypto", "glassmorphism", "luxury e-commerce", "healthcare app",
+    "minimalism dark mode", "landing page hero pricing", "color palette for banking",
+    "accessible form validation", "react performance memo", "serif font elegant",
+    "gaming neon", "portfolio creative", "chart trend comparison", "mobile navigation gestures",
+]
+STACK = "react"
+FIT_FILE = "styles.csv"
+
+
+# ============ BENCHMARKS ============
+# Each setup returns op(i); setup runs untimed in the worker after DATA_DIR is pointed at the corpus.
+
+def _fit_documents(core):
+    config = next(c for c in core.CSV_CONFIG.values() if c["file"] == FIT_FILE)
+    rows = core.load_rows(core.DATA_DIR / FIT_FILE)
+    return [" ".join(str(row.get(col, "")) for col in config["search_cols"]) for row in rows]
+
+
+def setup_bm25_fit(core, ds, tmp):
+    documents = _fit_documents(core)
+    return lambda i: core.BM25().fit(documents)
+
+
+def setup_bm25_score(core, ds, tmp):
+    bm25 = core.BM25()
+    bm25.fit(_fit_documents(core))
+    return lambda i: bm25.score(QUERIES[i % len(QUERIES)])
+
+
+def setup_search(core, ds, tmp):
+    return lambda i: core.search(QUERIES[i % len(QUERIES)])
+
+
+def setup_search_stack(core, ds, tmp):
+    return lambda i: core.search_stack(QUERIES[i % len(QUERIES)], STACK)
+
+
+def setup_design_system_ascii(core, ds, tmp):
+    return lambda i: ds.generate_design_system(QUERIES[i % len(QUERIES)], output_format="ascii")
+
+
+def setup_design_system_markdown(core, ds, tmp):
+    return lambda i: ds.generate_design_system(QUERIES[i % len(QUERIES)], output_format="markdown")
+
+
+def setup_persist(core, ds, tmp):
+    generator = ds.DesignSystemGenerator()
+    systems = [(query, generator.generate(query, f"Bench {n}")) for n, query in enumerate(QUERIES)]
+
+    def op(i):
+        query, design_system = systems[i % len(systems)]
+        # A fresh directory per iteration, so every one times a real write (not the unchanged-file skip)
+        ds.persist_design_system(design_system, "dashboard", os.path.join(tmp, f"persist-{i}"), query)
+    return op
+
+
+BENCHMARKS = {
+    "bm25_fit": setup_bm25_fit,
+    "bm25_score": setup_bm25_score,
+    "search": setup_search,
+    "search_stack": setup_search_stack,
+    "design_system_ascii": setup_design_system_ascii,
+    "design_system_markdown": setup_design_system_markdown,
+    "persist": setup_persist,
+}
+
+
+# ============ WORKER ============
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 2)
+
+
+def _percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    rank = max(1, -(-len(sorted_values) * fraction // 1))
+    return sorted_values[int(rank) - 1]
+
+
+def run_worker(name, data_dir, min_time, min_iterations):
+    """Time one benchmark in this process and return its result dict"""
+    import core
+    import design_system as ds
+
+    core.DATA_DIR = Path(data_dir)
+    ds.DATA_DIR = core.DATA_DIR
+    # Measure the engine, not the result cache
+    core.configure_cache(maxsize=0, disk_path=None)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Steady state: every corpus loaded and indexed before timing
+        core.warm()
+        op = BENCHMARKS[name](core, ds, tmp)
+        op(0)
+
+        latencies = []
+        start = time.perf_counter()
+        i = 0
+        while i < min_iterations or time.perf_counter() - start < min_time:
+            t0 = time.perf_counter()
+            op(i)
+            latencies.append(time.perf_counter() - t0)
+            i += 1
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "iterations": len(latencies),
+        "ops_per_sec": round(len(latencies) / elapsed, 3),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 4),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 4),
+        "peak_rss_mb": _peak_rss_mb(),
+        # NumPy is imported only once a vectorised scorer ran
+        "engine": "NumpyBM25" if core.np is not None else "BM25",
+    }
+
+
+def _spawn_worker(name, data_dir, min_time, min_iterations):
+    cmd = [sys.executable, str(Path(__file__).resolve()), "--worker", name, "--data-dir", str(data_dir),
+           "--min-time", str(min_time), "--min-iterations", str(min_iterations)]
+    env = dict(os.environ)
+    env.pop("UIPRO_CACHE_DB", None)
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=env)
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# ============ SUITE ============
+def run_suite(scales, names, min_time=MIN_TIME, min_iterations=MIN_ITERATIONS, out=None):
+    """Run names x scales; returns {"<name>@<scale>x": result}"""
+    from core import DATA_DIR
+    from corpus import build_corpus
+
+    out = out or sys.stdout
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            if scale == 1:
+                data_dir = DATA_DIR
+            else:
+                data_dir = Path(tmp) / f"{scale}x"
+                out.write(f"Generating {scale}x corpus...\n")
+                out.flush()
+                build_corpus(data_dir, scale)
+            for name in names:
+                key = f"{name}@{scale}x"
+                result = _spawn_worker(name, data_dir, min_time, min_iterations)
+                results[key] = result
+                out.write(_format_row(key, result) + "\n")
+                out.flush()
+            if scale != 1:
+                # Large corpora are regenerated on demand; free the disk between scales
+                shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+
+def _format_row(key, result):
+    if "error" in result:
+        return f"{key:<32} ERROR {result['error']}"
+    rss = f"{result['peak_rss_mb']:>9.1f} MB" if result["peak_rss_mb"] is not None else "        n/a"
+    return (f"{key:<32} {result['ops_per_sec']:>12.2f} ops/s  p50 {result['p50_ms']:>10.3f} ms  "
+            f"p99 {result['p99_ms']:>10.3f} ms  {rss}")
+
+
+def compare(results, baseline, max_regression=MAX_REGRESSION, max_rss_regression=MAX_RSS_REGRESSION):
+    """Regressions of results against a baseline's results, as readable strings"""
+    regressions = []
+    for key, base in baseline.get("results", {}).items():
+        current = results.get(key)
+        if current is None or "error" in base:
+            continue
+        if "error" in current:
+            regressions.append(f"{key}: failed ({current['error']})")
+            continue
+        floor = base["ops_per_sec"] * (1 - max_regression)
+        if current["ops_per_sec"] < floor:
+            drop = 1 - current["ops_per_sec"] / base["ops_per_sec"]
+            regressions.append(f"{key}: {current['ops_per_sec']:.2f} ops/s vs baseline {base['ops_per_sec']:.2f} (-{drop:.0%})")
+        if base.get("peak_rss_mb") and current.get("peak_rss_mb"):
+            ceiling = base["peak_rss_mb"] * (1 + max_rss_regression)
+            if current["peak_rss_mb"] > ceiling:
+                regressions.append(f"{key}: peak RSS {current['peak_rss_mb']} MB vs baseline {base['peak_rss_mb']} MB")
+    return regressions
+
+
+# ============ CLI SUPPORT ============
+if __name__ == "__main__":
+    import argparse
+    import platform
+
+    parser = argparse.ArgumentParser(description="UI Pro Max benchmark suite")
+    parser.add_argument("--scales", type=str, default=",".join(map(str, DEFAULT_SCALES)), help="Comma-separated corpus scales (1 = shipped data)")
+    parser.add_argument("--only", type=str, default=None, help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME, help="Minimum timed seconds per benchmark")
+    parser.add_argument("--min-iterations", type=int, default=MIN_ITERATIONS, help="Minimum timed iterations per benchmark")
+    parser.add_argument("--save-baseline", type=str, default=None, help="Write results as a JSON baseline")
+    parser.add_argument("--baseline", type=str, default=None, help="Fail on regressions against this JSON baseline")
+    parser.add_argument("--max-regression", type=float, default=MAX_REGRESSION, help="Allowed ops/sec drop as a fraction (default: 0.25)")
+    parser.add_argument("--max-rss-regression", type=float, default=MAX_RSS_REGRESSION, help="Allowed peak RSS growth as a fraction (default: 0.5)")
+    parser.add_argument("--skip-differential", action="store_true", help="Skip the reference ranking check")
+    parser.add_argument("--differential-queries", type=int, default=100, help="Random queries per corpus for the ranking check")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the ranking check queries (default: random)")
+    # Internal: one benchmark in a fresh interpreter
+    parser.add_argument("--worker", type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", type=str, default=None, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.data_dir, args.min_time, args.min_iterations)))
+        sys.exit(0)
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+
+    failed = False
+    if not args.skip_differential:
+        from reference import differential_check
+        seed = args.seed if args.seed is not None else random.randrange(1 << 30)
+        print(f"Differential check seed: {seed}")
+        failed = bool(differential_check(queries=args.differential_queries, seed=seed))
+
+    results = run_suite(scales, names, args.min_time, args.min_iterations)
+    failed = failed or any("error" in r for r in results.values())
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.save_baseline:
+        Path(args.save_baseline).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression, args.max_rss_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            failed = True
+        else:
+            print(f"No regressions against {args.baseline}")
+
+    sys.exit(1 if failed else 0)
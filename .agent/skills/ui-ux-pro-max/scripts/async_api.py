@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Async API - asyncio counterparts of search, search_stack and
+generate_design_system for embedding the engine in an event loop.
+
+Usage:
+    from async_api import AsyncEngine
+
+    engine = AsyncEngine(max_concurrency=4)
+    result = await engine.search("glassmorphism dark", domain="style")
+    output = await engine.generate_design_system("fintech dashboard", "Acme")
+
+    # or the shared default engine
+    from async_api import asearch, agenerate_design_system
+    result = await asearch("fintech")
+
+Scoring runs on an executor (a private thread pool by default; pass a
+ProcessPoolExecutor to score in parallel), so the event loop never blocks.
+Identical in-flight calls - same method and arguments - are coalesced: the
+first caller starts the computation and later callers await the same one,
+so a burst of fifty identical design-system requests costs one generation.
+At most max_concurrency computations run at once; further ones wait for a
+slot, and with max_pending set, calls beyond that many waiting computations
+fail fast with Overloaded instead of queueing without bound.
+
+An engine serves one event loop at a time. Its semaphore and in-flight
+table are created on first use and recreated when it is used from a new
+loop, so the shared default engine works across successive asyncio.run()
+calls. Loops running concurrently in other threads need their own engines.
+"""
+
+import asyncio
+import copy
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from core import MAX_RESULTS, FilterError, search, search_stack, where_conditions
+from design_system import generate_design_system, page_names
+
+
+# ============ CONFIGURATION ============
+DEFAULT_CONCURRENCY = 4
+
+
+class Overloaded(RuntimeError):
+    """Raised when max_pending computations are already waiting for a slot"""
+
+
+def _share(value):
+    """Copy of a mutable result for a coalesced caller (the first caller keeps the original)"""
+    return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+
+# ============ ASYNC ENGINE ============
+class AsyncEngine:
+    """Runs blocking engine calls on an executor with coalescing and a concurrency limit"""
+
+    def __init__(self, executor=None, max_concurrency=DEFAULT_CONCURRENCY, max_pending=None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_pending = max_pending
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="uipro")
+        # Loop-bound state, (re)created by _bind for the loop the engine is used from
+        self._loop = self._slots = None
+        self._inflight = {}
+        self.running = self.waiting = 0
+        self.computed = self.coalesced = self.rejected = 0
+
+    def _bind(self):
+        """Attach to the running loop: asyncio primitives cannot be shared between loops"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._inflight = {}
+
+    async def _call(self, key, func, *args):
+        self._bind()
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return _share(await asyncio.shield(task))
+
+        if self.max_pending is not None and self.running + self.waiting >= self.max_concurrency + self.max_pending:
+            self.rejected += 1
+            raise Overloaded(f"{self.waiting} computations already waiting for {self.max_concurrency} slots")
+
+        # Counted as waiting right away so a burst within one loop tick sees its own load
+        self.waiting += 1
+        task = asyncio.ensure_future(self._compute(self._slots, func, *args))
+        inflight = self._inflight
+        inflight[key] = task
+        task.add_done_callback(lambda _: inflight.pop(key, None))
+        # Shielded so a cancelled caller does not cancel the work other callers share
+        return await asyncio.shield(task)
+
+    async def _compute(self, slots, func, *args):
+        try:
+            await slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            self.computed += 1
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(func, *args))
+        finally:
+            self.running -= 1
+            slots.release()
+
+    async def search(self, query, domain=None, max_results=MAX_RESULTS, where=None, fuzzy=False):
+        """Async core.search"""
+        try:
+            conditions = where_conditions(where)
+        except FilterError:
+            return search(query, domain, max_results, where=where)  # the error response, without scoring
+        return await self._call(("search", query, domain, max_results, conditions, fuzzy),
+                                partial(search, where=conditions, fuzzy=fuzzy), query, domain, max_results)
+
+    async def search_stack(self, query, stack, max_results=MAX_RESULTS, where=None, fuzzy=False):
+        """Async core.search_stack"""
+        try:
+            conditions = where_conditions(where)
+        except FilterError:
+            return search_stack(query, stack, max_results, where=where)
+        stack_key = stack if isinstance(stack, str) else tuple(stack)
+        return await self._call(("search_stack", query, stack_key, max_results, conditions, fuzzy),
+                                partial(search_stack, where=conditions, fuzzy=fuzzy), query, stack, max_results)
+
+    async def generate_design_system(self, query, project_name=None, output_format="ascii",
+                                     persist=False, page=None, output_dir=None):
+        """Async design_system.generate_design_system"""
+        args = (query, project_name, output_format, persist, page, output_dir)
+        # Pages may come as a list; the key needs a hashable, normalised form
+        key = ("generate_design_system", query, project_name, output_format, persist,
+               tuple(page_names(page)), output_dir)
+        return await self._call(key, generate_design_system, *args)
+
+    def stats(self):
+        """Counters: computations started, calls coalesced/rejected, and current load"""
+        return {
+            "computed": self.computed,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "running": self.running,
+            "waiting": self.waiting,
+            "in_flight": len(self._inflight),
+        }
+
+    def close(self, wait=True):
+        """Shut down the executor if this engine created it"""
+        if self._own_executor:
+            self._executor.shutdown(wait=wait)
+
+
+# ============ DEFAULT ENGINE ============
+_default_engine = None
+
+
+def default_engine():
+    """Shared AsyncEngine behind asearch / asearch_stack / agenerate_design_system"""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = AsyncEngine()
+    return _default_engine
+
+
+def configure(executor=None, max_concurrency=DEFAULT_CONCURRENCY, max_pending=None):
+    """Replace the shared default engine (closing the old one's private executor)"""
+    global _default_engine
+    if _default_engine is not None:
+        _default_engine.close(wait=False)
+    _default_engine = AsyncEngine(executor, max_concurrency, max_pending)
+    return _default_engine
+
+
+async def asearch(query, domain=None, max_results=MAX_RESULTS, where=None, fuzzy=False):
+    return await default_engine().search(query, domain, max_results, where, fuzzy)
+
+
+async def asearch_stack(query, stack, max_results=MAX_RESULTS, where=None, fuzzy=False):
+    return await default_engine().search_stack(query, stack, max_results, where, fuzzy)
+
+
+async def agenerate_design_system(query, project_name=None, output_format="ascii",
+                                  persist=False, page=None, output_dir=None):
+    return await default_engine().generate_design_system(query, project_name, output_format,
+                                                         persist, page, output_dir)
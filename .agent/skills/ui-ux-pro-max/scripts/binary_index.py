@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Binary Index - compiles every CSV in CSV_CONFIG and STACK_CONFIG into one
+versioned, memory-mapped search index.
+
+Usage:
+    python binary_index.py                 # build data/search.idx
+    python binary_index.py --output x.idx  # build to a custom path
+    python binary_index.py --workers 4 --memory-limit 512 --chunk-rows 50000
+
+The build streams each CSV in row chunks, spills sorted postings runs to
+disk whenever the memory budget is reached and merges them at the end, so
+multi-million-row exports index in bounded memory; files build in parallel.
+
+Only the build streams. Once built, single-domain and single-stack searches
+(core.search, including the --domain all fan-out, and core.search_stack for
+one stack) read postings and stored fields straight from the mapped file; a
+section whose source CSV changed since the build is ignored and served from
+the CSV instead. Sharded searches (shards > 1), multi-stack searches,
+suggest and the design-system reasoning tables still load whole CSVs
+through core's registry, so those paths are not bounded by --memory-limit.
+
+Layout (native byte order, recorded in the header):
+    header     8s magic | u32 version | u32 byteorder | u64 directory length
+    directory  UTF-8 JSON: one entry per CSV with its stats and array offsets
+    arrays     8-byte aligned; offsets in the directory are relative to here
+               term_offsets u32[V+1] + terms (UTF-8, byte-sorted vocabulary)
+               idf f64[V] | max_weights f64[V]
+               postings_offsets u32[V+1] + postings u32[P*2] (doc_id, tf)
+               doc_lengths u32[N] | doc_norms f64[N]
+               cells u32[N*C] value ids (0xFFFFFFFF = empty cell)
+               value_offsets u32[D+1] + heap (UTF-8, each distinct cell value once)
+"""
+
+import csv
+import heapq
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from math import log
+from pathlib import Path
+
+import core
+from core import BM25, CSV_CONFIG, STACK_CONFIG, Table, _STACK_COLS, span
+
+
+# ============ CONFIGURATION ============
+INDEX_FILENAME = "search.idx"
+INDEX_MAGIC = b"UIPMIDX\0"
+INDEX_VERSION = 2
+
+_HEADER = struct.Struct("<8sIIQ")
+_BYTEORDER = {"little": 0, "big": 1}
+_ARRAY_ORDER = ("term_offsets", "terms", "idf", "max_weights", "postings_offsets", "postings",
+                "doc_lengths", "doc_norms", "cells", "value_offsets", "heap")
+
+# Streaming build: rows per read chunk and the default total memory budget
+CHUNK_ROWS = 10000
+MEMORY_LIMIT_MB = 256
+# Rough in-memory cost estimates used against the budget
+_POSTING_BYTES = 16
+_TERM_BYTES = 160
+# Spilled run record: u32 term length | u32 postings count, then term, docs, tfs
+_RUN_HEADER = struct.Struct("<II")
+
+
+def default_index_path():
+    """Index location next to the CSVs (follows core.DATA_DIR)"""
+    return core.DATA_DIR / INDEX_FILENAME
+
+
+def _sources():
+    """(relative file, search_cols) for every searchable CSV"""
+    for config in CSV_CONFIG.values():
+        yield config["file"], config["search_cols"]
+    for config in STACK_CONFIG.values():
+        yield config["file"], _STACK_COLS["search_cols"]
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+# ============ BUILD ============
+class _SectionBuilder:
+    """Streams one CSV into the section arrays, spilling postings under a memory budget.
+
+    Rows are read in chunks and tokenised one document at a time. Postings
+    accumulate per term until the estimated footprint reaches the budget, then
+    are written as a run sorted by term bytes; finish() k-way merges the runs
+    into the final vocabulary and postings. Row cells, doc lengths and the
+    value heap go straight to temporary files, so memory stays bounded by the
+    budget (plus one term's postings during the merge) instead of the corpus.
+    """
+
+    def __init__(self, filepath, search_cols, workdir, memory_limit, chunk_rows=CHUNK_ROWS):
+        self.filepath = Path(filepath)
+        self.search_cols = list(search_cols)
+        self.workdir = Path(workdir)
+        self.memory_limit = memory_limit
+        self.chunk_rows = chunk_rows
+        self.tokenizer = BM25()
+        self.k1, self.b = self.tokenizer.k1, self.tokenizer.b
+        self.files = {}
+        self.runs = []
+        self.postings = {}
+        self.postings_count = 0
+        self.value_ids = {}
+        self.value_bytes = 0
+        self.heap_size = 0
+        self.value_count = 0
+        self.N = 0
+        self.total_length = 0
+
+    def _file(self, name):
+        path = self.workdir / name
+        self.files[name] = path
+        return open(path, "wb")
+
+    def _footprint(self):
+        return (self.postings_count * _POSTING_BYTES + len(self.postings) * _TERM_BYTES
+                + self.value_bytes + len(self.value_ids) * _TERM_BYTES)
+
+    def _documents(self, columns, rows):
+        """Search text per row, exactly as the registry builds it (missing column -> "", short row -> "None")"""
+        present = set(columns)
+        for row in rows:
+            yield " ".join(str(row.get(col)) if col in present else "" for col in self.search_cols)
+
+    def _add_cells(self, columns, rows, cells_out, offsets_out, heap_out):
+        cells, offsets = array("I"), array("I")
+        for row in rows:
+            for col in columns:
+                value = row.get(col)
+                if value is None:
+                    cells.append(Table.NULL_CELL)
+                    continue
+                vid = self.value_ids.get(value)
+                if vid is None:
+                    encoded = value.encode("utf-8")
+                    heap_out.write(encoded)
+                    self.heap_size += len(encoded)
+                    if self.heap_size > 0xFFFFFFFF:
+                        raise ValueError(f"{self.filepath.name}: stored fields exceed the 4 GiB section limit")
+                    offsets.append(self.heap_size)
+                    vid = self.value_count
+                    self.value_count += 1
+                    # Dedup dictionary is a cache: past the budget, repeats are simply stored again
+                    self.value_ids[value] = vid
+                    self.value_bytes += len(encoded) + 64
+                cells.append(vid)
+        cells.tofile(cells_out)
+        offsets.tofile(offsets_out)
+
+    def _add_postings(self, documents, lengths_out):
+        lengths = array("I")
+        for tokens in map(self.tokenizer.tokenize, documents):
+            lengths.append(len(tokens))
+            self.total_length += len(tokens)
+            for term, tf in Counter(tokens).items():
+                entry = self.postings.get(term)
+                if entry is None:
+                    entry = self.postings[term] = (array("I"), array("I"))
+                entry[0].append(self.N)
+                entry[1].append(tf)
+                self.postings_count += 1
+            self.N += 1
+        lengths.tofile(lengths_out)
+
+    def _spill(self):
+        """Write the in-memory postings as a run sorted by term bytes"""
+        path = self.workdir / f"run{len(self.runs)}.bin"
+        with open(path, "wb") as out:
+            for encoded, term in sorted((term.encode("utf-8"), term) for term in self.postings):
+                docs, tfs = self.postings[term]
+                out.write(_RUN_HEADER.pack(len(encoded), len(docs)))
+                out.write(encoded)
+                docs.tofile(out)
+                tfs.tofile(out)
+        self.runs.append(path)
+        self.postings.clear()
+        self.postings_count = 0
+
+    @staticmethod
+    def _read_run(path):
+        with open(path, "rb") as f:
+            while True:
+                header = f.read(_RUN_HEADER.size)
+                if not header:
+                    return
+                term_len, count = _RUN_HEADER.unpack(header)
+                encoded = f.read(term_len)
+                docs, tfs = array("I"), array("I")
+                docs.fromfile(f, count)
+                tfs.fromfile(f, count)
+                yield encoded, docs, tfs
+
+    def ingest(self):
+        with open(self.filepath, "r", encoding="utf-8") as f, \
+                self._file("cells") as cells_out, self._file("value_offsets") as offsets_out, \
+                self._file("heap") as heap_out, self._file("doc_lengths") as lengths_out:
+            array("I", [0]).tofile(offsets_out)
+            reader = csv.DictReader(f)
+            self.columns = [col for col in (reader.fieldnames or []) if col is not None]
+            while True:
+                rows = list(islice(reader, self.chunk_rows))
+                if not rows:
+                    break
+                self._add_cells(self.columns, rows, cells_out, offsets_out, heap_out)
+                self._add_postings(self._documents(self.columns, rows), lengths_out)
+                if self._footprint() > self.memory_limit:
+                    if self.postings:
+                        self._spill()
+                    self.value_ids.clear()
+                    self.value_bytes = 0
+        if self.runs and self.postings:
+            self._spill()
+
+    def _write_norms(self):
+        """doc_norms from the spilled doc lengths, in chunks"""
+        self.avgdl = self.total_length / self.N if self.N else 0
+        with open(self.files["doc_lengths"], "rb") as lengths_in, self._file("doc_norms") as norms_out:
+            while True:
+                lengths = array("I")
+                try:
+                    lengths.fromfile(lengths_in, self.chunk_rows)
+                except EOFError:
+                    pass
+                if not lengths:
+                    break
+                norms = array("d", (self.k1 * (1 - self.b + self.b * doc_len / self.avgdl) for doc_len in lengths))
+                norms.tofile(norms_out)
+
+    def _merged_terms(self):
+        """(term bytes, docs, tfs) in byte order, postings of a term concatenated across runs"""
+        if not self.runs:
+            for encoded, term in sorted((term.encode("utf-8"), term) for term in self.postings):
+                yield (encoded, *self.postings[term])
+            return
+        streams = [((encoded, run, docs, tfs) for encoded, docs, tfs in self._read_run(path))
+                   for run, path in enumerate(self.runs)]
+        current, docs, tfs = None, None, None
+        for encoded, _, run_docs, run_tfs in heapq.merge(*streams, key=lambda item: (item[0], item[1])):
+            if encoded != current:
+                if current is not None:
+                    yield current, docs, tfs
+                current, docs, tfs = encoded, array("I"), array("I")
+            docs.extend(run_docs)
+            tfs.extend(run_tfs)
+        if current is not None:
+            yield current, docs, tfs
+
+    def finish(self):
+        """Merge runs into the vocabulary/postings arrays; returns the section meta"""
+        self._write_norms()
+        with open(self.files["doc_norms"], "rb") as f:
+            # Random access by doc id during the merge without loading the array
+            norms_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.N else None
+        norms = memoryview(norms_map).cast("d") if norms_map is not None else ()
+        try:
+            vocab_size = self._write_vocabulary(norms)
+        finally:
+            if norms_map is not None:
+                norms.release()
+                norms_map.close()
+        for path in self.runs:
+            os.unlink(path)
+        return {
+            "columns": self.columns,
+            "N": self.N,
+            "avgdl": self.avgdl,
+            "k1": self.k1,
+            "b": self.b,
+            "vocab_size": vocab_size,
+        }
+
+    def _write_vocabulary(self, norms):
+        vocab_size = 0
+        with self._file("term_offsets") as term_offsets_out, self._file("terms") as terms_out, \
+                self._file("idf") as idf_out, self._file("max_weights") as max_weights_out, \
+                self._file("postings_offsets") as postings_offsets_out, self._file("postings") as postings_out:
+            term_offsets, postings_offsets = array("I", [0]), array("I", [0])
+            idf_values, max_weights = array("d"), array("d")
+            term_bytes, posting_count = 0, 0
+            for encoded, docs, tfs in self._merged_terms():
+                term_bytes += len(encoded)
+                terms_out.write(encoded)
+                term_offsets.append(term_bytes)
+                df = len(docs)
+                idf = log((self.N - df + 0.5) / (df + 0.5) + 1)
+                idf_values.append(idf)
+                # Same operation order as BM25._weight
+                max_weights.append(max(idf * (tf * (self.k1 + 1)) / (tf + norms[idx]) for idx, tf in zip(docs, tfs)))
+                interleaved = array("I", bytes(8 * df))
+                interleaved[0::2] = docs
+                interleaved[1::2] = tfs
+                interleaved.tofile(postings_out)
+                posting_count += df
+                postings_offsets.append(posting_count)
+                vocab_size += 1
+                if len(idf_values) >= self.chunk_rows:
+                    for values, out in ((term_offsets, term_offsets_out), (postings_offsets, postings_offsets_out),
+                                        (idf_values, idf_out), (max_weights, max_weights_out)):
+                        values.tofile(out)
+                        del values[:]
+            for values, out in ((term_offsets, term_offsets_out), (postings_offsets, postings_offsets_out),
+                                (idf_values, idf_out), (max_weights, max_weights_out)):
+                values.tofile(out)
+        return vocab_size
+
+
+def _build_section(job):
+    """Worker: stream one CSV into array files under workdir; returns (meta, {array: path})"""
+    rel_file, search_cols, filepath, workdir, memory_limit, chunk_rows = job
+    Path(workdir).mkdir(parents=True, exist_ok=True)
+    stat = os.stat(filepath)
+    builder = _SectionBuilder(filepath, search_cols, workdir, memory_limit, chunk_rows)
+    with span("index_build", file=rel_file):
+        builder.ingest()
+        meta = builder.finish()
+    meta.update({
+        "file": rel_file,
+        "signature": [stat.st_mtime_ns, stat.st_size],
+        "search_cols": list(search_cols),
+    })
+    return meta, {name: str(path) for name, path in builder.files.items()}
+
+
+def build_index(output=None, workers=None, memory_limit_mb=MEMORY_LIMIT_MB, chunk_rows=CHUNK_ROWS):
+    """Compile all configured CSVs into one binary index file.
+
+    Files are streamed in parallel on a process pool (workers, default: CPU
+    count); memory_limit_mb is the total postings/dedup budget shared by the
+    workers. Returns a summary dict with the output path and per-file
+    document counts.
+    """
+    if array("I").itemsize != 4:
+        raise RuntimeError("binary index requires 32-bit unsigned array items")
+
+    output = Path(output) if output else default_index_path()
+    sources = [(rel_file, search_cols, core.DATA_DIR / rel_file)
+               for rel_file, search_cols in _sources() if (core.DATA_DIR / rel_file).exists()]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(sources) or 1))
+    memory_limit = max(1, int(memory_limit_mb * 1024 * 1024) // workers)
+
+    with tempfile.TemporaryDirectory(dir=output.parent, prefix=".index-build-") as workdir:
+        jobs = [(rel_file, search_cols, str(filepath), str(Path(workdir) / f"section{n}"), memory_limit, chunk_rows)
+                for n, (rel_file, search_cols, filepath) in enumerate(sources)]
+        if workers == 1:
+            built = [_build_section(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                built = list(pool.map(_build_section, jobs))
+
+        directory = {"sections": []}
+        placements = []
+        position = 0
+        for meta, files in built:
+            offsets = {}
+            for name in _ARRAY_ORDER:
+                size = os.path.getsize(files[name])
+                position = _align(position)
+                offsets[name] = [position, size]
+                placements.append((position, files[name]))
+                position += size
+            meta["offsets"] = offsets
+            directory["sections"].append(meta)
+
+        directory_bytes = json.dumps(directory, ensure_ascii=False).encode("utf-8")
+        base = _align(_HEADER.size + len(directory_bytes))
+
+        tmp = output.with_name(output.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, _BYTEORDER[sys.byteorder], len(directory_bytes)))
+            f.write(directory_bytes)
+            for offset, path in placements:
+                f.seek(base + offset)
+                with open(path, "rb") as src:
+                    shutil.copyfileobj(src, f, 1 << 20)
+            f.truncate(base + position)
+        os.replace(tmp, output)
+
+    return {
+        "path": str(output),
+        "bytes": base + position,
+        "sections": {s["file"]: s["N"] for s in directory["sections"]},
+    }
+
+
+# ============ READ ============
+class MappedSection(BM25):
+    """BM25 over one CSV's section of the mapped index.
+
+    The packed arrays are zero-copy views into the file and the vocabulary is
+    binary-searched in place, so the inherited top_k and score touch only the
+    vocabulary entries and postings of the query. Stored fields are a Table
+    whose heap is the mapped file.
+    """
+
+    def __init__(self, mm, view, base, meta):
+        super().__init__(meta["k1"], meta["b"])
+        self.file = meta["file"]
+        self.signature = tuple(meta["signature"])
+        self.search_cols = tuple(meta["search_cols"])
+        self.N = meta["N"]
+        self.avgdl = meta["avgdl"]
+        self.vocab_size = meta["vocab_size"]
+        self._mm = mm
+        self._term_ids = {}
+
+        def region(name, fmt=None):
+            start, length = meta["offsets"][name]
+            start += base
+            if fmt is None:
+                return start
+            return view[start:start + length].cast(fmt)
+
+        self._terms_start = region("terms")
+        self._term_offsets = region("term_offsets", "I")
+        self._postings = region("postings", "I")
+        self._idf_values = region("idf", "d")
+        self.max_weight_values = region("max_weights", "d")
+        self.postings_offsets = region("postings_offsets", "I")
+        self.doc_lengths = region("doc_lengths", "I")
+        self.doc_norms = region("doc_norms", "d")
+        self.rows = Table(meta["columns"], region("cells", "I"), region("value_offsets", "I"), mm, region("heap"))
+
+    def fit(self, documents):
+        raise TypeError("MappedSection is read-only; rebuild with build_index()")
+
+    def _term_bytes(self, lid):
+        start = self._terms_start + self._term_offsets[lid]
+        end = self._terms_start + self._term_offsets[lid + 1]
+        return self._mm[start:end]
+
+    def _lookup(self, term):
+        """Binary search the byte-sorted vocabulary (memoised for terms it contains)"""
+        lid = self._term_ids.get(term)
+        if lid is not None:
+            return lid
+        target = term.encode("utf-8")
+        lo, hi = 0, self.vocab_size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term_bytes(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.vocab_size and self._term_bytes(lo) == target:
+            # Misses are not memoised: arbitrary query words would grow the dict without bound
+            self._term_ids[term] = lo
+            return lo
+        return None
+
+    def _idf_at(self, lid):
+        return self._idf_values[lid]
+
+    def _iter_terms(self):
+        for lid in range(self.vocab_size):
+            yield self._term_bytes(lid).decode("utf-8")
+
+    def _term_postings(self, lid):
+        # Interleaved (doc_id, tf) pairs: strided views, still zero-copy
+        lo, hi = self.postings_offsets[lid], self.postings_offsets[lid + 1]
+        return self._postings[2 * lo:2 * hi:2], self._postings[2 * lo + 1:2 * hi:2]
+
+    def record(self, idx, output_cols):
+        """Decode the requested stored fields of one document"""
+        return self.rows.record(idx, output_cols)
+
+    def is_fresh(self, filepath):
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return False
+        return (stat.st_mtime_ns, stat.st_size) == self.signature
+
+
+class BinaryIndex:
+    """A mapped index file: one MappedSection per source CSV"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, byteorder, dir_len = _HEADER.unpack_from(self._mm, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION or byteorder != _BYTEORDER[sys.byteorder]:
+            raise ValueError(f"Incompatible search index: {self.path}")
+        directory = json.loads(self._mm[_HEADER.size:_HEADER.size + dir_len].decode("utf-8"))
+        base = _align(_HEADER.size + dir_len)
+        view = memoryview(self._mm)
+        self.sections = {
+            meta["file"]: MappedSection(self._mm, view, base, meta)
+            for meta in directory["sections"]
+        }
+
+    def section(self, rel_file, search_cols):
+        """Section for a CSV if present and built with the same search columns"""
+        section = self.sections.get(rel_file)
+        if section is None or section.search_cols != tuple(search_cols):
+            return None
+        return section
+
+
+_open_indexes = {}
+
+
+def open_index(path=None):
+    """Open (and cache per process) the binary index; None if absent or unusable"""
+    path = Path(path) if path else default_index_path()
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = str(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _open_indexes.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    try:
+        with span("index_open", path=key):
+            index = BinaryIndex(path)
+    except (ValueError, OSError, struct.error):
+        index = None
+    _open_indexes[key] = (signature, index)
+    return index
+
+
+# ============ CLI SUPPORT ============
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the memory-mapped search index")
+    parser.add_argument("--output", "-o", type=str, default=None, help=f"Index path (default: data/{INDEX_FILENAME})")
+    parser.add_argument("--workers", "-w", type=int, default=None, help="Files built in parallel (default: CPU count)")
+    parser.add_argument("--memory-limit", type=int, default=MEMORY_LIMIT_MB, help=f"Total build memory budget in MB (default: {MEMORY_LIMIT_MB})")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help=f"CSV rows read per chunk (default: {CHUNK_ROWS})")
+
+    args = parser.parse_args()
+
+    summary = build_index(args.output, args.workers, args.memory_limit, args.chunk_rows)
+    print(f"Built {summary['path']} ({summary['bytes']} bytes, {len(summary['sections'])} files)")
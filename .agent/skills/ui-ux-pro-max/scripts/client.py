@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Search Client - forwards requests to a running search daemon (server.py).
+
+Standard library only: a CLI call answered by the daemon never imports
+the engine, so it costs an interpreter start plus one local round trip.
+
+Forwarding is opt-in: requests go to a daemon only when an address is
+given (--address or $UIPRO_SERVER). Over TCP both sides prove knowledge of
+the daemon's token, which it writes to an owner-only file at startup, so
+neither another local process nor a web page can call the daemon, and the
+client never trusts an answer from whatever else listens on the port. A
+unix socket is owner-only, so its file permissions do the same job.
+"""
+
+import errno
+import hashlib
+import hmac
+import http.client
+import json
+import os
+import secrets
+import socket
+import time
+
+
+# ============ CONFIGURATION ============
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+SERVER_ENV = "UIPRO_SERVER"
+CLIENT_TIMEOUT = 30
+# Connect retries while a busy daemon's accept queue is full (delay doubles per attempt, seconds)
+CONNECT_RETRIES = 4
+CONNECT_RETRY_DELAY = 0.005
+# Owner-only directory holding each TCP daemon's token (server-<host>-<port>.token)
+TOKEN_DIR = os.path.join(os.path.expanduser("~"), ".cache", "uipro")
+NONCE_HEADER = "X-UIPro-Nonce"
+AUTH_HEADER = "X-UIPro-Auth"
+PROOF_HEADER = "X-UIPro-Proof"
+
+
+def _parse_address(address=None):
+    """'host:port' -> ("tcp", (host, port)); 'unix:/path' -> ("unix", path)"""
+    address = address or os.environ.get(SERVER_ENV) or DEFAULT_ADDRESS
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+def _token_path(target):
+    """Token file of the TCP daemon listening on (host, port)"""
+    host, port = target
+    return os.path.join(TOKEN_DIR, f"server-{host}-{port}.token")
+
+
+def _read_token(target):
+    try:
+        with open(_token_path(target), 'rb') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _sign(token, role, nonce):
+    """HMAC proving knowledge of token for one nonce; role ("client" / "server") keeps the two proofs apart"""
+    return hmac.new(token, f"{role}:{nonce}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self._path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+def _connect(conn, kind):
+    """Open conn, retrying briefly while the daemon is too busy to accept.
+
+    A full unix-socket backlog fails with EAGAIN (or ECONNREFUSED); both are
+    retried there, since the socket file shows a daemon exists. Over TCP
+    ECONNREFUSED is the normal "no daemon" answer and falls back at once.
+    """
+    for attempt in range(CONNECT_RETRIES + 1):
+        try:
+            conn.connect()
+            return
+        except OSError as e:
+            busy = e.errno == errno.EAGAIN or (kind == "unix" and e.errno == errno.ECONNREFUSED)
+            if not busy or attempt == CONNECT_RETRIES:
+                raise
+            time.sleep(CONNECT_RETRY_DELAY * 2 ** attempt)
+
+
+def call(method, params, address=None):
+    """Forward a request to the configured daemon; None when none is configured or answers"""
+    address = address or os.environ.get(SERVER_ENV)
+    if not address:
+        return None
+    kind, target = _parse_address(address)
+    headers = {"Content-Type": "application/json"}
+    token = None
+    if kind == "unix":
+        if not os.path.exists(target):
+            return None
+        conn = _UnixHTTPConnection(target, CLIENT_TIMEOUT)
+    else:
+        token = _read_token(target)
+        if token is None:
+            return None
+        nonce = secrets.token_hex(16)
+        headers[NONCE_HEADER] = nonce
+        headers[AUTH_HEADER] = _sign(token, "client", nonce)
+        conn = http.client.HTTPConnection(target[0], target[1], timeout=CLIENT_TIMEOUT)
+
+    body = json.dumps(params, ensure_ascii=False).encode("utf-8")
+    try:
+        _connect(conn, kind)
+        conn.request("POST", f"/{method}", body, headers)
+        response = conn.getresponse()
+        payload = response.read()
+        if response.status != 200:
+            return None
+        # An answer only counts when the peer is the daemon that wrote the token
+        if token is not None and not hmac.compare_digest(response.getheader(PROOF_HEADER, ""),
+                                                         _sign(token, "server", nonce)):
+            return None
+        return json.loads(payload.decode("utf-8"))
+    except (OSError, http.client.HTTPException, ValueError):
+        return None
+    finally:
+        conn.close()
+
+
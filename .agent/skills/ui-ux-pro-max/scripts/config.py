@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+UI/UX Pro Max Config - domain and stack tables shared by the engine and
+the CLI. Standard library only, so a client that forwards to the search
+daemon can build its argument parser without loading the engine.
+"""
+
+# ============ CONFIGURATION ============
+MAX_RESULTS = 3
+# Cross-domain search (--domain all) and its score calibration methods
+ALL_DOMAINS = "all"
+FUSION_METHODS = ("zscore", "rrf")
+# Autocomplete (suggest): default completions per list
+SUGGEST_LIMIT = 10
+
+CSV_CONFIG = {
+    "style": {
+        "file": "styles.csv",
+        "search_cols": ["Style Category", "Keywords", "Best For", "Type", "AI Prompt Keywords"],
+        "title_col": "Style Category",
+        "output_cols": ["Style Category", "Type", "Keywords", "Primary Colors", "Effects & Animation", "Best For", "Performance", "Accessibility", "Framework Compatibility", "Complexity", "AI Prompt Keywords", "CSS/Technical Keywords", "Implementation Checklist", "Design System Variables"]
+    },
+    "color": {
+        "file": "colors.csv",
+        "search_cols": ["Product Type", "Notes"],
+        "output_cols": ["Product Type", "Primary (Hex)", "Secondary (Hex)", "CTA (Hex)", "Background (Hex)", "Text (Hex)", "Notes"]
+    },
+    "chart": {
+        "file": "charts.csv",
+        "search_cols": ["Data Type", "Keywords", "Best Chart Type", "Accessibility Notes"],
+        "output_cols": ["Data Type", "Keywords", "Best Chart Type", "Secondary Options", "Color Guidance", "Accessibility Notes", "Library Recommendation", "Interactive Level"]
+    },
+    "landing": {
+        "file": "landing.csv",
+        "search_cols": ["Pattern Name", "Keywords", "Conversion Optimization", "Section Order"],
+        "output_cols": ["Pattern Name", "Keywords", "Section Order", "Primary CTA Placement", "Color Strategy", "Conversion Optimization"]
+    },
+    "product": {
+        "file": "products.csv",
+        "search_cols": ["Product Type", "Keywords", "Primary Style Recommendation", "Key Considerations"],
+        "title_col": "Product Type",
+        "output_cols": ["Product Type", "Keywords", "Primary Style Recommendation", "Secondary Styles", "Landing Page Pattern", "Dashboard Style (if applicable)", "Color Palette Focus"]
+    },
+    "ux": {
+        "file": "ux-guidelines.csv",
+        "search_cols": ["Category", "Issue", "Description", "Platform"],
+        "output_cols": ["Category", "Issue", "Platform", "Description", "Do", "Don't", "Code Example Good", "Code Example Bad", "Severity"]
+    },
+    "typography": {
+        "file": "typography.csv",
+        "search_cols": ["Font Pairing Name", "Category", "Mood/Style Keywords", "Best For", "Heading Font", "Body Font"],
+        "title_col": "Font Pairing Name",
+        "output_cols": ["Font Pairing Name", "Category", "Heading Font", "Body Font", "Mood/Style Keywords", "Best For", "Google Fonts URL", "CSS Import", "Tailwind Config", "Notes"]
+    },
+    "icons": {
+        "file": "icons.csv",
+        "search_cols": ["Category", "Icon Name", "Keywords", "Best For"],
+        "title_col": "Icon Name",
+        "output_cols": ["Category", "Icon Name", "Keywords", "Library", "Import Code", "Usage", "Best For", "Style"]
+    },
+    "react": {
+        "file": "react-performance.csv",
+        "search_cols": ["Category", "Issue", "Keywords", "Description"],
+        "output_cols": ["Category", "Issue", "Platform", "Description", "Do", "Don't", "Code Example Good", "Code Example Bad", "Severity"]
+    },
+    "web": {
+        "file": "web-interface.csv",
+        "search_cols": ["Category", "Issue", "Keywords", "Description"],
+        "output_cols": ["Category", "Issue", "Platform", "Description", "Do", "Don't", "Code Example Good", "Code Example Bad", "Severity"]
+    }
+}
+
+STACK_CONFIG = {
+    "html-tailwind": {"file": "stacks/html-tailwind.csv"},
+    "react": {"file": "stacks/react.csv"},
+    "nextjs": {"file": "stacks/nextjs.csv"},
+    "astro": {"file": "stacks/astro.csv"},
+    "vue": {"file": "stacks/vue.csv"},
+    "nuxtjs": {"file": "stacks/nuxtjs.csv"},
+    "nuxt-ui": {"file": "stacks/nuxt-ui.csv"},
+    "svelte": {"file": "stacks/svelte.csv"},
+    "swiftui": {"file": "stacks/swiftui.csv"},
+    "react-native": {"file": "stacks/react-native.csv"},
+    "flutter": {"file": "stacks/flutter.csv"},
+    "shadcn": {"file": "stacks/shadcn.csv"},
+    "jetpack-compose": {"file": "stacks/jetpack-compose.csv"}
+}
+
+# Common columns for all stacks
+_STACK_COLS = {
+    "search_cols": ["Category", "Guideline", "Description", "Do", "Don't"],
+    "output_cols": ["Category", "Guideline", "Description", "Do", "Don't", "Code Good", "Code Bad", "Severity", "Docs URL"]
+}
+
+AVAILABLE_STACKS = list(STACK_CONFIG.keys())
+
+
+# ============ REQUEST HELPERS ============
+def page_names(page) -> list:
+    """Page names from None, a comma-separated string or a list, de-duplicated by file name"""
+    if not page:
+        return []
+    items = page.split(",") if isinstance(page, str) else page
+    names, seen = [], set()
+    for name in (str(item).strip() for item in items):
+        slug = name.lower().replace(' ', '-')
+        if name and slug not in seen:
+            seen.add(slug)
+            names.append(name)
+    return names
+
+
+def _positive_int(value):
+    # bool is an int subclass, but true is not a count
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def _names(value):
+    return isinstance(value, str) or (isinstance(value, list) and all(isinstance(name, str) for name in value))
+
+
+# Request fields shared by the daemon and batch input: (accepts value, expected kind); None is
+# checked separately, since every optional field may be null
+REQUEST_FIELDS = {
+    "query": (lambda value: isinstance(value, str), "a string"),
+    "prefix": (lambda value: isinstance(value, str), "a string"),
+    "domain": (lambda value: isinstance(value, str), "a string"),
+    "stack": (_names, "a string or list of strings"),
+    "page": (_names, "a string or list of strings"),
+    "max_results": (_positive_int, "a positive integer"),
+    "limit": (_positive_int, "a positive integer"),
+    "shards": (_positive_int, "a positive integer"),
+    "fuzzy": (lambda value: isinstance(value, bool), "true or false"),
+    "persist": (lambda value: isinstance(value, bool), "true or false"),
+    "fusion": (lambda value: value in FUSION_METHODS, f"one of {', '.join(FUSION_METHODS)}"),
+    "output_format": (lambda value: value in ("ascii", "markdown"), "ascii or markdown"),
+    "project_name": (lambda value: isinstance(value, str), "a string"),
+    "output_dir": (lambda value: isinstance(value, str), "a string"),
+}
+
+
+def field_error(params, required=()):
+    """Why a request's fields are unusable (the first problem found), or None when they are fine.
+
+    required fields must be present and non-null; fields not in REQUEST_FIELDS
+    (such as "where", which the engine validates) are left alone.
+    """
+    for name in required:
+        if params.get(name) is None:
+            return f"'{name}' is required"
+    for name, value in params.items():
+        accepts, kind = REQUEST_FIELDS.get(name, (None, None))
+        if accepts is not None and value is not None and not accepts(value):
+            return f"'{name}' must be {kind}"
+    return None
@@ -5,106 +5,353 @@ UI/UX Pro Max Core - BM25 search engine for UI/UX style guides
 """
 
 import csv
+import hashlib
+import json
+import os
 import re
+import heapq
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
 from pathlib import Path
-from math import log
-from collections import defaultdict
+from math import log, sqrt
+from collections import Counter, OrderedDict, defaultdict
+from collections.abc import Mapping, Sequence
+from contextlib import contextmanager
+
+from config import (ALL_DOMAINS, AVAILABLE_STACKS, CSV_CONFIG, FUSION_METHODS, MAX_RESULTS, STACK_CONFIG,
+                    SUGGEST_LIMIT, _STACK_COLS)
+
+# numpy is optional and imported on first use by _numpy(), so single queries never pay for it
+np = None
+_numpy_missing = False
+
+try:
+    import sqlite3
+except ImportError:  # optional: only the on-disk result cache tier needs it
+    sqlite3 = None
 
 # ============ CONFIGURATION ============
 DATA_DIR = Path(__file__).parent.parent / "data"
-MAX_RESULTS = 3
-
-CSV_CONFIG = {
-    "style": {
-        "file": "styles.csv",
-        "search_cols": ["Style Category", "Keywords", "Best For", "Type", "AI Prompt Keywords"],
-        "output_cols": ["Style Category", "Type", "Keywords", "Primary Colors", "Effects & Animation", "Best For", "Performance", "Accessibility", "Framework Compatibility", "Complexity", "AI Prompt Keywords", "CSS/Technical Keywords", "Implementation Checklist", "Design System Variables"]
-    },
-    "color": {
-        "file": "colors.csv",
-        "search_cols": ["Product Type", "Notes"],
-        "output_cols": ["Product Type", "Primary (Hex)", "Secondary (Hex)", "CTA (Hex)", "Background (Hex)", "Text (Hex)", "Notes"]
-    },
-    "chart": {
-        "file": "charts.csv",
-        "search_cols": ["Data Type", "Keywords", "Best Chart Type", "Accessibility Notes"],
-        "output_cols": ["Data Type", "Keywords", "Best Chart Type", "Secondary Options", "Color Guidance", "Accessibility Notes", "Library Recommendation", "Interactive Level"]
-    },
-    "landing": {
-        "file": "landing.csv",
-        "search_cols": ["Pattern Name", "Keywords", "Conversion Optimization", "Section Order"],
-        "output_cols": ["Pattern Name", "Keywords", "Section Order", "Primary CTA Placement", "Color Strategy", "Conversion Optimization"]
-    },
-    "product": {
-        "file": "products.csv",
-        "search_cols": ["Product Type", "Keywords", "Primary Style Recommendation", "Key Considerations"],
-        "output_cols": ["Product Type", "Keywords", "Primary Style Recommendation", "Secondary Styles", "Landing Page Pattern", "Dashboard Style (if applicable)", "Color Palette Focus"]
-    },
-    "ux": {
-        "file": "ux-guidelines.csv",
-        "search_cols": ["Category", "Issue", "Description", "Platform"],
-        "output_cols": ["Category", "Issue", "Platform", "Description", "Do", "Don't", "Code Example Good", "Code Example Bad", "Severity"]
-    },
-    "typography": {
-        "file": "typography.csv",
-        "search_cols": ["Font Pairing Name", "Category", "Mood/Style Keywords", "Best For", "Heading Font", "Body Font"],
-        "output_cols": ["Font Pairing Name", "Category", "Heading Font", "Body Font", "Mood/Style Keywords", "Best For", "Google Fonts URL", "CSS Import", "Tailwind Config", "Notes"]
-    },
-    "icons": {
-        "file": "icons.csv",
-        "search_cols": ["Category", "Icon Name", "Keywords", "Best For"],
-        "output_cols": ["Category", "Icon Name", "Keywords", "Library", "Import Code", "Usage", "Best For", "Style"]
-    },
-    "react": {
-        "file": "react-performance.csv",
-        "search_cols": ["Category", "Issue", "Keywords", "Description"],
-        "output_cols": ["Category", "Issue", "Platform", "Description", "Do", "Don't", "Code Example Good", "Code Example Bad", "Severity"]
-    },
-    "web": {
-        "file": "web-interface.csv",
-        "search_cols": ["Category", "Issue", "Keywords", "Description"],
-        "output_cols": ["Category", "Issue", "Platform", "Description", "Do", "Don't", "Code Example Good", "Code Example Bad", "Severity"]
-    }
-}
-
-STACK_CONFIG = {
-    "html-tailwind": {"file": "stacks/html-tailwind.csv"},
-    "react": {"file": "stacks/react.csv"},
-    "nextjs": {"file": "stacks/nextjs.csv"},
-    "astro": {"file": "stacks/astro.csv"},
-    "vue": {"file": "stacks/vue.csv"},
-    "nuxtjs": {"file": "stacks/nuxtjs.csv"},
-    "nuxt-ui": {"file": "stacks/nuxt-ui.csv"},
-    "svelte": {"file": "stacks/svelte.csv"},
-    "swiftui": {"file": "stacks/swiftui.csv"},
-    "react-native": {"file": "stacks/react-native.csv"},
-    "flutter": {"file": "stacks/flutter.csv"},
-    "shadcn": {"file": "stacks/shadcn.csv"},
-    "jetpack-compose": {"file": "stacks/jetpack-compose.csv"}
-}
-
-# Common columns for all stacks
-_STACK_COLS = {
-    "search_cols": ["Category", "Guideline", "Description", "Do", "Don't"],
-    "output_cols": ["Category", "Guideline", "Description", "Do", "Don't", "Code Good", "Code Bad", "Severity", "Docs URL"]
-}
-
-AVAILABLE_STACKS = list(STACK_CONFIG.keys())
+# Domain routing keywords for detect_domain (Domain, comma-separated Keywords; row order breaks ties)
+DOMAIN_KEYWORDS_FILE = "domain-keywords.csv"
+FALLBACK_DOMAIN = "style"
+# Relative slack on MaxScore upper bounds so float rounding can never prune a true top-k hit
+_BOUND_SLACK = 1e-9
+# NumPy backend: max dense score cells (queries x documents) per batch chunk
+_SCORE_CHUNK_CELLS = 1 << 22
+# NumPy backend: single queries use it only from this corpus size on (batches always do)
+NUMPY_MIN_DOCUMENTS = 5000
+# Columns with at most this many distinct values (and at most half the rows) get bitmap facets
+FACET_MAX_VALUES = 64
+# Multi-stack search (--stack all / a,b,c): column that tags each result with its stack
+STACK_LABEL_COL = "Stack"
+# Combined multi-stack indexes kept per process (least recently used dropped first)
+COMBINED_CACHE_SIZE = 8
+# Cross-domain search (--domain all): result tag column and reciprocal-rank fusion constant
+DOMAIN_LABEL_COL = "Domain"
+RRF_K = 60
+# Fuzzy matching (fuzzy=True): an unknown query token expands to the closest vocabulary terms
+# within FUZZY_MAX_DISTANCE edits (1 for tokens up to FUZZY_SHORT_TOKEN chars), weighted by distance
+FUZZY_MAX_DISTANCE = 2
+FUZZY_SHORT_TOKEN = 4
+FUZZY_DISCOUNTS = {1: 0.5, 2: 0.25}
+FUZZY_MAX_EXPANSIONS = 3
+# Symmetric-delete keys cover the first FUZZY_PREFIX_LENGTH chars of a term (as in SymSpell)
+FUZZY_PREFIX_LENGTH = 7
+# Autocomplete (suggest): how many completions each trie node keeps precomputed
+SUGGEST_TOP_N = 10
+
+
+# ============ TIMING SPANS ============
+class _NullSpan:
+    """Shared no-op span handed out while nothing is listening"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+_span_hooks = []
+_span_local = threading.local()
+_span_lock = threading.Lock()
+# Active profile() blocks + registered hooks; span() is a no-op while this is 0
+_span_listeners = 0
+
+
+class Trace:
+    """Spans recorded on one thread while profile() is active"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = []
+        self.depth = 0
+
+    def to_dict(self):
+        """JSON-ready trace: per-stage totals plus every span in start order"""
+        stages = {}
+        for record in self.spans:
+            stage = stages.setdefault(record["name"], {"count": 0, "total_ms": 0.0})
+            stage["count"] += 1
+            stage["total_ms"] += record["duration_ms"]
+        for stage in stages.values():
+            stage["total_ms"] = round(stage["total_ms"], 4)
+        return {
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 4),
+            "stages": stages,
+            "spans": sorted(self.spans, key=lambda record: record["start_ms"]),
+        }
+
+
+class _Span:
+    __slots__ = ("name", "meta", "trace", "start", "depth")
+
+    def __init__(self, name, meta, trace):
+        self.name = name
+        self.meta = meta
+        self.trace = trace
+
+    def __enter__(self):
+        if self.trace is not None:
+            self.depth = self.trace.depth
+            self.trace.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        seconds = end - self.start
+        trace = self.trace
+        if trace is not None:
+            trace.depth -= 1
+            record = {
+                "name": self.name,
+                "start_ms": round((self.start - trace.start) * 1000, 4),
+                "duration_ms": round(seconds * 1000, 4),
+                "depth": self.depth,
+            }
+            if self.meta:
+                record.update(self.meta)
+            trace.spans.append(record)
+        for hook in _span_hooks:
+            hook(self.name, seconds, self.meta)
+        return False
+
+
+def span(name, **meta):
+    """Time a stage: `with span("fit", file=...):`. Costs one call when not profiling."""
+    if not _span_listeners:
+        return _NULL_SPAN
+    return _Span(name, meta, getattr(_span_local, "trace", None))
+
+
+@contextmanager
+def profile():
+    """Record every span on this thread into the yielded Trace"""
+    global _span_listeners
+    trace = Trace()
+    previous = getattr(_span_local, "trace", None)
+    _span_local.trace = trace
+    with _span_lock:
+        _span_listeners += 1
+    try:
+        yield trace
+    finally:
+        _span_local.trace = previous
+        with _span_lock:
+            _span_listeners -= 1
+
+
+def add_span_hook(hook):
+    """Call hook(name, seconds, meta) when any span on any thread ends"""
+    global _span_listeners
+    with _span_lock:
+        _span_hooks.append(hook)
+        _span_listeners += 1
+
+
+def remove_span_hook(hook):
+    global _span_listeners
+    with _span_lock:
+        _span_hooks.remove(hook)
+        _span_listeners -= 1
+
+
+# ============ VOCABULARY ============
+class Vocabulary:
+    """Process-wide token <-> integer ID table shared by every BM25 index.
+
+    Each distinct token string is stored once per process; indexes refer to
+    tokens by ID only. invalidate() starts a fresh table: indexes keep the
+    table they were built with, so the old one is freed with its last index.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.terms = []
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        return self.ids.get(token)
+
+    def add(self, token):
+        tid = self.ids.get(token)
+        if tid is None:
+            with self._lock:
+                tid = self.ids.get(token)
+                if tid is None:
+                    tid = len(self.terms)
+                    self.terms.append(token)
+                    self.ids[token] = tid
+        return tid
+
+
+_vocabulary = Vocabulary()
+
+
+def _reset_vocabulary():
+    """Start a new vocabulary for indexes built from now on"""
+    global _vocabulary
+    _vocabulary = Vocabulary()
+
+
+class _TermView(Mapping):
+    """Read-only term -> value mapping over an index's per-term arrays"""
+
+    __slots__ = ("_index", "_value")
+
+    def __init__(self, index, value):
+        self._index = index
+        self._value = value
+
+    def __getitem__(self, term):
+        lid = self._index._lookup(term)
+        if lid is None:
+            raise KeyError(term)
+        return self._value(lid)
+
+    def __contains__(self, term):
+        return self._index._lookup(term) is not None
+
+    def __iter__(self):
+        return self._index._iter_terms()
+
+    def __len__(self):
+        return self._index.vocab_size
+
+
+def _compact_array(values):
+    """array of unsigned ints in the narrowest typecode that holds them"""
+    top = max(values, default=0)
+    typecode = 'B' if top < 1 << 8 else 'H' if top < 1 << 16 else 'I'
+    return array(typecode, values)
+
+
+# ============ FUZZY MATCHING ============
+def _deletes(word, distance):
+    """word and every string reachable from it by deleting up to `distance` characters"""
+    found = frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - found
+        found = found | frontier
+    return found
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (an adjacent swap costs 1), or limit + 1 once it exceeds limit.
+
+    Only the diagonal band |i - j| <= limit is computed; cells outside it are
+    already over the limit.
+    """
+    over = limit + 1
+    if abs(len(a) - len(b)) > limit:
+        return over
+    before, previous = None, [min(j, over) for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [min(i, over)] + [over] * len(b)
+        lo, hi = max(1, i - limit), min(len(b), i + limit)
+        for j in range(lo, hi + 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+        # No later row can come back under the limit
+        if min(current[lo - 1:hi + 1]) > limit:
+            return over
+        before, previous = previous, current
+    return min(previous[-1], over)
+
+
+class FuzzyIndex:
+    """Symmetric-delete (SymSpell) index over a term list: typo lookups without a vocabulary scan.
+
+    Each term is filed under every string its first prefix_length characters
+    reduce to by up to max_distance deletions. A lookup generates the same
+    deletes for the query word; only terms sharing one of them are candidates,
+    and each candidate is verified with edit_distance.
+    """
+
+    def __init__(self, terms, max_distance=FUZZY_MAX_DISTANCE, prefix_length=FUZZY_PREFIX_LENGTH):
+        self.terms = list(terms)
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        deletes = defaultdict(list)
+        for pos, term in enumerate(self.terms):
+            for key in _deletes(term[:prefix_length], max_distance):
+                deletes[key].append(pos)
+        self.deletes = dict(deletes)
+
+    def lookup(self, word, max_distance=None):
+        """[(position, distance)] of terms within max_distance edits of word, closest first, then by position"""
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        candidates = set()
+        for key in _deletes(word[:self.prefix_length], max_distance):
+            candidates.update(self.deletes.get(key, ()))
+        found = []
+        for pos in candidates:
+            distance = edit_distance(word, self.terms[pos], max_distance)
+            if distance <= max_distance:
+                found.append((pos, distance))
+        return sorted(found, key=lambda match: (match[1], match[0]))
 
 
 # ============ BM25 IMPLEMENTATION ============
 class BM25:
-    """BM25 ranking algorithm for text search"""
+    """BM25 ranking algorithm for text search.
+
+    The index is packed into flat arrays: terms are IDs in the vocabulary
+    current when the index was built (term_ids, sorted; a term's position is
+    its local id), and postings for local id t are
+    posting_docs / posting_tfs[postings_offsets[t]:postings_offsets[t + 1]],
+    in the narrowest integer typecode that fits. IDF is derived from the
+    postings length on demand. idf, max_weights, doc_freqs and postings are
+    term-keyed views over these arrays.
+    """
 
     def __init__(self, k1=1.5, b=0.75):
         self.k1 = k1
         self.b = b
-        self.corpus = []
-        self.doc_lengths = []
+        self.doc_lengths = array('I')
         self.avgdl = 0
-        self.idf = {}
-        self.doc_freqs = defaultdict(int)
         self.N = 0
+        self.vocab_size = 0
+        self.term_ids = array('I')
+        self.vocabulary = _vocabulary
+        self.max_weight_values = array('d')
+        self.postings_offsets = array('I', [0])
+        self.posting_docs = array('I')
+        self.posting_tfs = array('I')
+        self.doc_norms = array('d')
+        self.idf = _TermView(self, self._idf_at)
+        self.max_weights = _TermView(self, self._max_weight_at)
+        self.doc_freqs = _TermView(self, self._doc_freq_at)
+        self.postings = _TermView(self, self._term_postings)
+        self._fuzzy = None
 
     def tokenize(self, text):
         """Lowercase, split, remove punctuation, filter short words"""
@@ -112,107 +359,1910 @@ class BM25:
         return [w for w in text.split() if len(w) > 2]
 
     def fit(self, documents):
-        """Build BM25 index from documents"""
-        self.corpus = [self.tokenize(doc) for doc in documents]
-        self.N = len(self.corpus)
+        """Build BM25 inverted index from documents"""
+        postings = defaultdict(lambda: (array('I'), array('I')))
+        doc_lengths = array('I')
+        vocabulary = self.vocabulary = _vocabulary
+        for idx, doc in enumerate(documents):
+            tokens = self.tokenize(doc)
+            doc_lengths.append(len(tokens))
+            term_freqs = defaultdict(int)
+            for word in tokens:
+                term_freqs[vocabulary.add(word)] += 1
+            for tid, tf in term_freqs.items():
+                docs, tfs = postings[tid]
+                docs.append(idx)
+                tfs.append(tf)
+
+        self.N = len(doc_lengths)
         if self.N == 0:
             return
-        self.doc_lengths = [len(doc) for doc in self.corpus]
+        self.doc_lengths = doc_lengths
         self.avgdl = sum(self.doc_lengths) / self.N
 
-        for doc in self.corpus:
-            seen = set()
-            for word in doc:
-                if word not in seen:
-                    self.doc_freqs[word] += 1
-                    seen.add(word)
+        # Length normalisation: k1 * (1 - b + b * |d| / avgdl), once per document
+        self.doc_norms = array('d', (self.k1 * (1 - self.b + self.b * doc_len / self.avgdl) for doc_len in self.doc_lengths))
 
-        for word, freq in self.doc_freqs.items():
-            self.idf[word] = log((self.N - freq + 0.5) / (freq + 0.5) + 1)
+        # Pack postings in vocabulary-ID order; per-term upper bounds feed MaxScore pruning
+        self.term_ids = array('I', sorted(postings))
+        self.vocab_size = len(self.term_ids)
+        self.max_weight_values = array('d')
+        self.postings_offsets = array('I', [0])
+        posting_docs, posting_tfs = array('I'), array('I')
+        for tid in self.term_ids:
+            docs, tfs = postings[tid]
+            posting_docs.extend(docs)
+            posting_tfs.extend(tfs)
+            self.postings_offsets.append(len(posting_docs))
+        self.posting_docs = _compact_array(posting_docs)
+        self.posting_tfs = _compact_array(posting_tfs)
+        for lid in range(self.vocab_size):
+            idf = self._idf_at(lid)
+            self.max_weight_values.append(max(self._weight(idf, idx, tf) for idx, tf in zip(*self._term_postings(lid))))
+
+    def _lookup(self, term):
+        """Local term id in this index, or None"""
+        tid = self.vocabulary.get(term)
+        if tid is None:
+            return None
+        pos = bisect_left(self.term_ids, tid)
+        if pos < self.vocab_size and self.term_ids[pos] == tid:
+            return pos
+        return None
+
+    def _iter_terms(self):
+        for tid in self.term_ids:
+            yield self.vocabulary.terms[tid]
+
+    def fuzzy_index(self):
+        """FuzzyIndex over this index's vocabulary (positions are local term ids), built once"""
+        if self._fuzzy is None:
+            with span("fuzzy_index", terms=self.vocab_size):
+                self._fuzzy = FuzzyIndex(self._iter_terms())
+        return self._fuzzy
+
+    def expand(self, tokens):
+        """Fuzzy form of a tokenised query: [(term, factor)], or None when there is nothing to expand.
+
+        Known tokens keep factor 1.0. Each unknown token is replaced by its
+        closest vocabulary terms (at most FUZZY_MAX_EXPANSIONS, most frequent
+        first, then alphabetical) at FUZZY_DISCOUNTS[distance]; unknown tokens
+        with no near term are dropped, as in exact scoring. None means the
+        exact query already says it all, so callers keep the exact path.
+        """
+        if all(self._lookup(token) is not None for token in tokens) or self.vocab_size == 0:
+            return None
+        index = self.fuzzy_index()
+        weighted, expanded = [], False
+        for token in tokens:
+            if self._lookup(token) is not None:
+                weighted.append((token, 1.0))
+                continue
+            if token.isdigit():
+                continue
+            matches = index.lookup(token, 1 if len(token) <= FUZZY_SHORT_TOKEN else FUZZY_MAX_DISTANCE)
+            if not matches:
+                continue
+            distance = matches[0][1]
+            closest = sorted((lid for lid, d in matches if d == distance),
+                             key=lambda lid: (-self._doc_freq_at(lid), index.terms[lid]))
+            weighted.extend((index.terms[lid], FUZZY_DISCOUNTS[distance]) for lid in closest[:FUZZY_MAX_EXPANSIONS])
+            expanded = True
+        return weighted if expanded else None
+
+    def _idf_at(self, lid):
+        freq = self._doc_freq_at(lid)
+        return log((self.N - freq + 0.5) / (freq + 0.5) + 1)
+
+    def _max_weight_at(self, lid):
+        return self.max_weight_values[lid]
+
+    def _doc_freq_at(self, lid):
+        return self.postings_offsets[lid + 1] - self.postings_offsets[lid]
+
+    def _term_postings(self, lid):
+        """(doc_ids, tfs) of one term, ascending doc_id, as zero-copy views"""
+        lo, hi = self.postings_offsets[lid], self.postings_offsets[lid + 1]
+        return memoryview(self.posting_docs)[lo:hi], memoryview(self.posting_tfs)[lo:hi]
+
+    def _weight(self, idf, idx, tf):
+        """BM25 contribution of one query term occurrence to document idx"""
+        numerator = tf * (self.k1 + 1)
+        denominator = tf + self.doc_norms[idx]
+        return idf * numerator / denominator
 
     def score(self, query):
         """Score all documents against query"""
-        query_tokens = self.tokenize(query)
-        scores = []
+        accumulators = {}
 
-        for idx, doc in enumerate(self.corpus):
-            score = 0
-            doc_len = self.doc_lengths[idx]
-            term_freqs = defaultdict(int)
-            for word in doc:
-                term_freqs[word] += 1
+        # Only the postings of query terms are touched; repeated query terms add again
+        for token in self.tokenize(query):
+            lid = self._lookup(token)
+            if lid is not None:
+                idf = self._idf_at(lid)
+                docs, tfs = self._term_postings(lid)
+                for idx, tf in zip(docs, tfs):
+                    accumulators[idx] = accumulators.get(idx, 0) + self._weight(idf, idx, tf)
+
+        scores = [(idx, accumulators.get(idx, 0)) for idx in range(self.N)]
+        return sorted(scores, key=lambda x: x[1], reverse=True)
 
-            for token in query_tokens:
-                if token in self.idf:
-                    tf = term_freqs[token]
-                    idf = self.idf[token]
-                    numerator = tf * (self.k1 + 1)
-                    denominator = tf + self.k1 * (1 - self.b + self.b * doc_len / self.avgdl)
-                    score += idf * numerator / denominator
+    def top_k(self, query, k=MAX_RESULTS, allowed=None):
+        """Return the k best (idx, score) pairs with score > 0, same order as score()[:k].
 
-            scores.append((idx, score))
+        Document-at-a-time MaxScore: query terms are ordered by upper bound, and
+        terms whose combined bound cannot beat the current k-th score become
+        non-essential - documents that only contain them are never visited.
 
-        return sorted(scores, key=lambda x: x[1], reverse=True)
+        allowed is an optional row bitmap (int, bit i = document i): only those
+        documents are ranked. A selective bitmap is scored document by document;
+        a broad one masks candidates inside MaxScore.
+        """
+        with span("tokenize"):
+            query_lids = [lid for lid in map(self._lookup, self.tokenize(query)) if lid is not None]
+        if k <= 0 or not query_lids or allowed == 0:
+            return []
+
+        with span("score"):
+            if allowed is None:
+                heap = self._max_score(query_lids, k)
+            else:
+                postings = sum(self._doc_freq_at(lid) for lid in set(query_lids))
+                if bitmap_count(allowed) * len(set(query_lids)) < postings:
+                    heap = self._score_subset(query_lids, k, bitmap_ids(allowed))
+                else:
+                    heap = self._max_score(query_lids, k, bitmap_mask(allowed, self.N))
+
+        with span("top_k"):
+            return [(-neg_idx, doc_score) for doc_score, neg_idx in sorted(heap, key=lambda x: (-x[0], -x[1]))]
+
+    def _score_subset(self, query_lids, k, doc_ids):
+        """Exact scores of the given documents (ascending ids) only; returns the min-heap of (score, -idx)"""
+        terms = list(dict.fromkeys(query_lids))
+        idfs = {lid: self._idf_at(lid) for lid in terms}
+        lists = {lid: self._term_postings(lid) for lid in terms}
+        cursors = dict.fromkeys(terms, 0)
+        heap = []
+        for idx in doc_ids:
+            weights = {}
+            for lid in terms:
+                docs, tfs = lists[lid]
+                pos = cursors[lid] = bisect_left(docs, idx, cursors[lid])
+                if pos < len(docs) and docs[pos] == idx:
+                    weights[lid] = self._weight(idfs[lid], idx, tfs[pos])
+            if not weights:
+                continue
+            doc_score = 0
+            for lid in query_lids:
+                doc_score += weights.get(lid, 0)
+            if len(heap) < k:
+                heapq.heappush(heap, (doc_score, -idx))
+            elif doc_score > heap[0][0]:
+                heapq.heapreplace(heap, (doc_score, -idx))
+        return heap
+
+    def _max_score(self, query_lids, k, mask=None):
+        """MaxScore traversal; returns the final min-heap of (score, -idx).
+
+        mask (one byte per document, 0 = excluded) drops documents before they are scored.
+        """
+
+        counts = Counter(query_lids)
+        terms = sorted(counts, key=lambda lid: counts[lid] * self._max_weight_at(lid))
+        idfs = [self._idf_at(lid) for lid in terms]
+        lists = [self._term_postings(lid) for lid in terms]
+        prefix_bounds = []
+        total = 0
+        for lid in terms:
+            total += counts[lid] * self._max_weight_at(lid)
+            prefix_bounds.append(total * (1 + _BOUND_SLACK))
+
+        cursors = [0] * len(terms)
+        heap = []  # (score, -idx): heap[0] is the current k-th best
+        threshold = 0
+        first_essential = 0
+
+        while True:
+            # Next candidate: smallest doc id across essential postings lists
+            idx = None
+            for i in range(first_essential, len(terms)):
+                docs = lists[i][0]
+                if cursors[i] < len(docs):
+                    doc = docs[cursors[i]]
+                    if idx is None or doc < idx:
+                        idx = doc
+            if idx is None:
+                break
+
+            if mask is not None and not mask[idx]:
+                for i in range(first_essential, len(terms)):
+                    docs = lists[i][0]
+                    if cursors[i] < len(docs) and docs[cursors[i]] == idx:
+                        cursors[i] += 1
+                continue
+
+            weights = {}
+            bound = 0
+            for i in range(first_essential, len(terms)):
+                docs, tfs = lists[i]
+                pos = cursors[i]
+                if pos < len(docs) and docs[pos] == idx:
+                    weights[terms[i]] = self._weight(idfs[i], idx, tfs[pos])
+                    bound += counts[terms[i]] * weights[terms[i]]
+                    cursors[i] = pos + 1
+
+            # Non-essential terms, highest bound first, while the doc can still qualify
+            for i in range(first_essential - 1, -1, -1):
+                if bound * (1 + _BOUND_SLACK) + prefix_bounds[i] <= threshold:
+                    break
+                docs, tfs = lists[i]
+                pos = bisect_left(docs, idx, cursors[i])
+                cursors[i] = pos
+                if pos < len(docs) and docs[pos] == idx:
+                    weights[terms[i]] = self._weight(idfs[i], idx, tfs[pos])
+                    bound += counts[terms[i]] * weights[terms[i]]
+            else:
+                # Exact score, accumulated in query-token order like score()
+                doc_score = 0
+                for lid in query_lids:
+                    doc_score += weights.get(lid, 0)
+
+                # Ties keep the lower doc id, and candidates arrive in ascending id order
+                if len(heap) < k:
+                    heapq.heappush(heap, (doc_score, -idx))
+                elif doc_score > heap[0][0]:
+                    heapq.heapreplace(heap, (doc_score, -idx))
+                if len(heap) == k:
+                    threshold = heap[0][0]
+                    while first_essential < len(terms) and prefix_bounds[first_essential] <= threshold:
+                        first_essential += 1
+
+        return heap
+
+    def top_k_many(self, queries, k=MAX_RESULTS, allowed=None, fuzzy=False):
+        """top_k for a batch of queries, in input order (fuzzy: see expand)"""
+        if fuzzy:
+            return self._fuzzy_top_k_many(queries, k, allowed)
+        return [self.top_k(query, k, allowed) for query in queries]
+
+    def _fuzzy_top_k_many(self, queries, k, allowed):
+        """top_k_many with typo expansion; queries expand() leaves alone take the exact batch path"""
+        queries = list(queries)
+        with span("fuzzy_expand", queries=len(queries)):
+            expansions = [self.expand(self.tokenize(query)) for query in queries]
+        exact = [pos for pos, weighted in enumerate(expansions) if weighted is None]
+        results = [None] * len(queries)
+        for pos, ranked in zip(exact, self.top_k_many([queries[pos] for pos in exact], k, allowed)):
+            results[pos] = ranked
+        for pos, weighted in enumerate(expansions):
+            if weighted is not None:
+                results[pos] = self.top_k_weighted(weighted, k, allowed)
+        return results
+
+    def top_k_weighted(self, weighted_terms, k=MAX_RESULTS, allowed=None):
+        """Top-k (idx, score) for expand() output, ties by lower idx"""
+        if k <= 0 or allowed == 0:
+            return []
+        with span("score"):
+            matches = self.weighted_matches(weighted_terms, allowed)
+        with span("top_k"):
+            return heapq.nsmallest(k, matches, key=lambda match: (-match[1], match[0]))
+
+    def scored_matches(self, tokens, allowed=None):
+        """(idx, score) of every document with score > 0, ascending idx, for an already tokenised query.
+
+        Term-at-a-time over the query's postings, accumulated in query-token
+        order, so scores are bit-identical to score() and top_k().
+        """
+        return self.weighted_matches([(token, 1.0) for token in tokens], allowed)
+
+    def weighted_matches(self, weighted_terms, allowed=None):
+        """scored_matches for [(term, factor)]: each term's BM25 weight is scaled by its factor"""
+        accumulators = {}
+        for term, factor in weighted_terms:
+            lid = self._lookup(term)
+            if lid is not None:
+                idf = self._idf_at(lid)
+                docs, tfs = self._term_postings(lid)
+                for idx, tf in zip(docs, tfs):
+                    accumulators[idx] = accumulators.get(idx, 0) + factor * self._weight(idf, idx, tf)
+        matches = sorted(accumulators.items())
+        if allowed is not None:
+            mask = bitmap_mask(allowed, self.N)
+            matches = [(idx, score) for idx, score in matches if mask[idx]]
+        return matches
+
+    def matching(self, query, allowed=None, fuzzy=False):
+        """Ids of every document with score > 0 (containing any query term, or an expansion), ascending"""
+        weighted = self.expand(self.tokenize(query)) if fuzzy else None
+        if weighted is not None:
+            return [idx for idx, _ in self.weighted_matches(weighted, allowed)]
+        docs = set()
+        for lid in {self._lookup(token) for token in self.tokenize(query)} - {None}:
+            docs.update(self._term_postings(lid)[0])
+        if allowed is not None:
+            docs.intersection_update(bitmap_ids(allowed))
+        return sorted(docs)
+
+
+def _numpy():
+    """The numpy module, imported on first call; None when it is not installed"""
+    global np, _numpy_missing
+    if np is None and not _numpy_missing:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:  # optional: the pure-Python BM25 paths are the fallback
+            _numpy_missing = True
+    return np
+
+
+class NumpyBM25(BM25):
+    """BM25 with a vectorised batch scorer, used when NumPy is importable.
+
+    On first use the term-document matrix is stored in CSR form over token IDs
+    (indptr / indices / data), with data holding the precomputed BM25 weight of
+    each posting. A batch of queries becomes one sparse product accumulated
+    with bincount, and top-k is taken with argpartition. Single queries over
+    corpora smaller than NUMPY_MIN_DOCUMENTS keep the pure-Python paths, which
+    answer them faster than NumPy can be imported.
+    """
+
+    data = None
+
+    def fit(self, documents):
+        super().fit(documents)
+        self.data = None
+
+    def _vectorised(self, batch):
+        """True when this call should score with NumPy (building the CSR arrays once)"""
+        if self.N == 0 or (not batch and self.N < NUMPY_MIN_DOCUMENTS) or _numpy() is None:
+            return False
+        if self.data is None:
+            self._build_csr()
+        return True
+
+    def _build_csr(self):
+        # indptr / indices are zero-copy views of the packed postings arrays
+        self.indptr = np.frombuffer(self.postings_offsets, dtype=np.uint32)
+        self.indices = np.frombuffer(self.posting_docs, dtype=self.posting_docs.typecode)
+        tf = np.frombuffer(self.posting_tfs, dtype=self.posting_tfs.typecode).astype(np.float64)
+        # math.log per term (not np.log) keeps IDF bit-identical to the reference engine
+        idf = np.repeat(np.array([self._idf_at(lid) for lid in range(self.vocab_size)]), np.diff(self.indptr))
+        norms = np.frombuffer(self.doc_norms, dtype=np.float64)[self.indices]
+        # Same operation order as BM25._weight, so weights are bit-identical (assigned last:
+        # a concurrent caller only sees data once indptr / indices are in place)
+        self.data = idf * (tf * (self.k1 + 1)) / (tf + norms)
+
+    def top_k(self, query, k=MAX_RESULTS, allowed=None):
+        if not self._vectorised(False):
+            return super().top_k(query, k, allowed)
+        return self.top_k_many([query], k, allowed)[0]
+
+    def _keep_mask(self, allowed):
+        """Boolean row mask for an allowed bitmap (None when unfiltered)"""
+        if allowed is None:
+            return None
+        packed = np.frombuffer(allowed.to_bytes((self.N + 7) // 8, 'little'), dtype=np.uint8)
+        return np.unpackbits(packed, count=self.N, bitorder='little').astype(bool)
+
+    def weighted_matches(self, weighted_terms, allowed=None):
+        """Vectorised BM25.weighted_matches: one bincount over the query's postings"""
+        if not self._vectorised(False):
+            return super().weighted_matches(weighted_terms, allowed)
+        terms = [(self._lookup(term), factor) for term, factor in weighted_terms]
+        terms = [(lid, factor) for lid, factor in terms if lid is not None]
+        if not terms or self.N == 0:
+            return []
+        keep = self._keep_mask(allowed)
+        cols, vals = [], []
+        for lid, factor in terms:
+            term_cols, term_vals = self._postings_slice(lid, keep)
+            cols.append(term_cols)
+            vals.append(term_vals if factor == 1.0 else term_vals * factor)
+        scores = np.bincount(np.concatenate(cols).astype(np.int64), weights=np.concatenate(vals), minlength=self.N)
+        positive = np.flatnonzero(scores > 0)
+        return list(zip(positive.tolist(), scores[positive].tolist()))
+
+    def _postings_slice(self, lid, keep):
+        """(doc ids, weights) of one term, restricted to documents where keep is True"""
+        lo, hi = self.indptr[lid], self.indptr[lid + 1]
+        cols, vals = self.indices[lo:hi], self.data[lo:hi]
+        if keep is not None:
+            selected = keep[cols]
+            cols, vals = cols[selected], vals[selected]
+        return cols, vals
+
+    def top_k_many(self, queries, k=MAX_RESULTS, allowed=None, fuzzy=False):
+        """Score a batch with one sparse product per chunk, then argpartition top-k.
+
+        With an allowed row bitmap, postings of excluded documents are dropped
+        before the product, so only matching documents are scored.
+        """
+        if fuzzy:
+            return self._fuzzy_top_k_many(queries, k, allowed)
+        queries = list(queries)
+        if k <= 0 or self.N == 0 or allowed == 0:
+            return [[] for _ in queries]
+        if not self._vectorised(len(queries) > 1):
+            return [BM25.top_k(self, query, k, allowed) for query in queries]
+
+        with span("tokenize", queries=len(queries)):
+            query_lids = [[lid for lid in map(self._lookup, self.tokenize(query)) if lid is not None] for query in queries]
+
+        keep = self._keep_mask(allowed)
+        slices = {}
+
+        results = []
+        chunk = max(1, _SCORE_CHUNK_CELLS // self.N)
+        for start in range(0, len(queries), chunk):
+            batch = query_lids[start:start + chunk]
+            with span("score", queries=len(batch)):
+                rows, cols, vals = [], [], []
+                # Query tokens expand in order (repeats included), so bincount adds in the
+                # same order as the reference loop and scores match exactly
+                for row, lids in enumerate(batch):
+                    for lid in lids:
+                        if lid not in slices:
+                            slices[lid] = self._postings_slice(lid, keep)
+                        term_cols, term_vals = slices[lid]
+                        rows.append(np.full(len(term_cols), row * self.N, dtype=np.int64))
+                        cols.append(term_cols)
+                        vals.append(term_vals)
+                if rows:
+                    cells = np.concatenate(rows) + np.concatenate(cols).astype(np.int64)
+                    scores = np.bincount(cells, weights=np.concatenate(vals), minlength=len(batch) * self.N)
+                    scores = scores.reshape(len(batch), self.N)
+                else:
+                    scores = np.zeros((len(batch), self.N))
+            with span("top_k", queries=len(batch)):
+                results.extend(self._select_top_k(row_scores, k) for row_scores in scores)
+        return results
+
+    @staticmethod
+    def _select_top_k(row_scores, k):
+        """Top-k positive (idx, score) of one score row, ties by lower idx"""
+        positive = np.flatnonzero(row_scores > 0)
+        if len(positive) > k:
+            kth = row_scores[positive[np.argpartition(row_scores[positive], -k)[-k]]]
+            positive = positive[row_scores[positive] >= kth]
+        order = np.lexsort((positive, -row_scores[positive]))[:k]
+        return [(int(idx), float(row_scores[idx])) for idx in positive[order]]
+
+
+def _new_engine():
+    """Engine for a registry corpus: NumpyBM25, which stays pure Python until NumPy pays off"""
+    return NumpyBM25()
+
+
+# ============ SHARDED INDEX ============
+class BM25Shard(BM25):
+    """Documents [offset, offset + N) of a fitted engine, scored with the parent's statistics.
+
+    IDF comes from the parent's global document frequencies and the length
+    norms from its global avgdl, so every per-document score is bit-identical
+    to the unsharded engine; only the postings are local.
+    """
+
+    @staticmethod
+    def parts(engine, lo, hi):
+        """Picklable slice of a fitted engine: stats, local postings keyed by term string"""
+        terms = []
+        for lid, term in enumerate(engine._iter_terms()):
+            docs, tfs = engine._term_postings(lid)
+            start, end = bisect_left(docs, lo), bisect_left(docs, hi)
+            if start < end:
+                terms.append((term, engine._idf_at(lid), array('I', docs[start:end]), array('I', tfs[start:end])))
+        return {
+            "k1": engine.k1, "b": engine.b, "offset": lo, "avgdl": engine.avgdl,
+            "doc_lengths": array('I', engine.doc_lengths[lo:hi]),
+            "doc_norms": array('d', engine.doc_norms[lo:hi]),
+            "terms": terms,
+        }
+
+    @classmethod
+    def from_parts(cls, parts):
+        shard = cls(parts["k1"], parts["b"])
+        lo = shard.offset = parts["offset"]
+        shard.avgdl = parts["avgdl"]
+        shard.doc_lengths = parts["doc_lengths"]
+        shard.doc_norms = parts["doc_norms"]
+        shard.N = len(shard.doc_lengths)
+
+        entries = [(shard.vocabulary.add(term), idf, docs, tfs) for term, idf, docs, tfs in parts["terms"]]
+        entries.sort(key=lambda entry: entry[0])
+
+        shard.term_ids = array('I', (tid for tid, _, _, _ in entries))
+        shard.vocab_size = len(entries)
+        shard.idf_values = array('d', (idf for _, idf, _, _ in entries))
+        posting_docs, posting_tfs = array('I'), array('I')
+        for _, _, docs, tfs in entries:
+            posting_docs.extend(idx - lo for idx in docs)
+            posting_tfs.extend(tfs)
+            shard.postings_offsets.append(len(posting_docs))
+        shard.posting_docs = _compact_array(posting_docs)
+        shard.posting_tfs = _compact_array(posting_tfs)
+        shard.max_weight_values = array('d', (
+            max(shard._weight(shard.idf_values[lid], idx, tf) for idx, tf in zip(*shard._term_postings(lid)))
+            for lid in range(shard.vocab_size)
+        ))
+        return shard
+
+    def _idf_at(self, lid):
+        return self.idf_values[lid]
+
+    def top_k_many(self, queries, k=MAX_RESULTS, allowed=None, expansions=None):
+        """Local top-k per query with global document ids (allowed is a shard-local bitmap).
+
+        expansions holds the parent's expand() output per query (None = exact),
+        so fuzzy queries expand against the global vocabulary, not the shard's.
+        """
+        expansions = expansions or [None] * len(queries)
+        return [
+            [(self.offset + idx, score) for idx, score in
+             (self.top_k(query, k, allowed) if weighted is None else self.top_k_weighted(weighted, k, allowed))]
+            for query, weighted in zip(queries, expansions)
+        ]
+
+
+def _shard_worker(conn, engine, lo, hi, parts):
+    """Shard process: build the shard, then answer (queries, k, allowed, expansions) requests until None"""
+    try:
+        shard = BM25Shard.from_parts(parts if parts is not None else BM25Shard.parts(engine, lo, hi))
+        engine = parts = None
+        conn.send(("ready", None))
+    except Exception as e:  # reported to the parent instead of hanging it
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    while True:
+        request = conn.recv()
+        if request is None:
+            break
+        queries, k, allowed, expansions = request
+        try:
+            conn.send(("ok", shard.top_k_many(queries, k, allowed, expansions)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+    conn.close()
+
+
+class ShardedIndex:
+    """Scatter-gather BM25 over contiguous document shards, one worker process per shard.
+
+    Each query batch is sent to every shard, each shard returns its local
+    top-k (MaxScore over its own postings, global statistics), and the
+    candidates are merged by (score desc, doc id asc) - the same order as the
+    unsharded engine. Workers are forked so they inherit the fitted index; on
+    platforms without fork each shard is built in the parent and pickled.
+    """
+
+    def __init__(self, engine, shards):
+        self.engine = engine
+        self.N = engine.N
+        self.shards = max(1, min(shards, engine.N or 1))
+        bounds = [engine.N * i // self.shards for i in range(self.shards + 1)]
+        self.ranges = list(zip(bounds, bounds[1:]))
+        self._lock = threading.Lock()
+        import multiprocessing  # deferred: only sharded searches start worker processes
+        fork = "fork" in multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if fork else None)
+
+        self._workers = []
+        for lo, hi in self.ranges:
+            parent_conn, child_conn = context.Pipe()
+            # Forked workers slice the inherited engine themselves; spawned ones get pickled parts
+            args = (child_conn, engine, lo, hi, None) if fork else (child_conn, None, lo, hi, BM25Shard.parts(engine, lo, hi))
+            process = context.Process(target=_shard_worker, args=args, daemon=True)
+            process.start()
+            child_conn.close()
+            self._workers.append((process, parent_conn))
+        for _, conn in self._workers:
+            self._receive(conn)
+
+    @staticmethod
+    def _receive(conn):
+        status, payload = conn.recv()
+        if status == "error":
+            raise RuntimeError(f"Shard worker failed: {payload}")
+        return payload
+
+    def top_k_many(self, queries, k=MAX_RESULTS, allowed=None, fuzzy=False):
+        """Merged global top-k per query, in input order (allowed: global row bitmap).
+
+        fuzzy queries are expanded here, against the full vocabulary, and the
+        shards score the expanded terms.
+        """
+        queries = list(queries)
+        if k <= 0 or not queries:
+            return [[] for _ in queries]
+        expansions = None
+        if fuzzy:
+            with span("fuzzy_expand", queries=len(queries)):
+                expansions = [self.engine.expand(self.engine.tokenize(query)) for query in queries]
+            if all(weighted is None for weighted in expansions):
+                expansions = None
+        with self._lock:
+            for (lo, hi), (_, conn) in zip(self.ranges, self._workers):
+                local = None if allowed is None else (allowed >> lo) & ((1 << (hi - lo)) - 1)
+                conn.send((queries, k, local, expansions))
+            partials = [self._receive(conn) for _, conn in self._workers]
+        merged = []
+        for candidates in zip(*partials):
+            ranked = sorted((hit for shard_hits in candidates for hit in shard_hits), key=lambda hit: (-hit[1], hit[0]))
+            merged.append(ranked[:k])
+        return merged
+
+    def top_k(self, query, k=MAX_RESULTS, allowed=None):
+        return self.top_k_many([query], k, allowed)[0]
+
+    def close(self):
+        """Stop the shard workers"""
+        with self._lock:
+            for process, conn in self._workers:
+                try:
+                    conn.send(None)
+                    conn.close()
+                except OSError:
+                    pass
+                process.join(timeout=5)
+            self._workers = []
+
+
+# ============ MULTI-PATTERN MATCHING ============
+class AhoCorasick:
+    """Aho-Corasick automaton: one pass over a text reports every pattern it contains.
+
+    Built from (pattern, value) pairs; overlapping and nested occurrences are
+    all reported, matching what `pattern in text` would say for each pattern.
+    """
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self.empty_values = []
+        for pattern, value in patterns:
+            if not pattern:
+                # "" is in every text
+                self.empty_values.append(value)
+                continue
+            state = 0
+            for char in pattern:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(value)
+
+        # Breadth-first failure links; each state also reports its suffix states' outputs
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_values(self, text):
+        """Yield the value of every pattern occurrence in text (repeats included)"""
+        yield from self.empty_values
+        state = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                yield from out[state]
+
+    def values(self, text):
+        """Set of values whose pattern occurs in text"""
+        return set(self.iter_values(text))
+
+
+# ============ PREFIX COMPLETION ============
+class PrefixTrie:
+    """Character trie with the best top_n items of every subtree precomputed at its node.
+
+    An item is filed under one or more keys and ranked by a sort key
+    (smallest first). After freeze(), a prefix lookup is one walk down the
+    trie plus a slice of that node's list; only limits above top_n scan
+    the subtree.
+    """
+
+    def __init__(self, top_n=SUGGEST_TOP_N):
+        self.top_n = top_n
+        self.items = []  # (rank, value)
+        self.root = [{}, None, ()]  # children, items filed at this node, precomputed top items
+
+    def add(self, keys, value, rank):
+        item = len(self.items)
+        self.items.append((rank, value))
+        for key in keys:
+            node = self.root
+            for char in key:
+                child = node[0].get(char)
+                if child is None:
+                    child = node[0][char] = [{}, None, ()]
+                node = child
+            if node[1] is None:
+                node[1] = []
+            node[1].append(item)
+
+    def freeze(self):
+        """Precompute every node's top_n, children before parents"""
+        def rank(item):
+            return self.items[item][0]
+
+        stack = [(self.root, False)]
+        while stack:
+            node, ready = stack.pop()
+            if not ready:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node[0].values())
+            elif node[1] is None and len(node[0]) == 1:
+                # A chain link ranks exactly like its only child; share the tuple
+                node[2] = next(iter(node[0].values()))[2]
+            else:
+                # Any item in this node's top_n is also in its child's top_n
+                candidates = set(node[1] or ())
+                for child in node[0].values():
+                    candidates.update(child[2])
+                node[2] = tuple(heapq.nsmallest(self.top_n, candidates, key=rank))
+
+    def top(self, prefix, limit):
+        """Values of the best `limit` items filed under a key that starts with prefix"""
+        node = self.root
+        for char in prefix:
+            node = node[0].get(char)
+            if node is None:
+                return []
+        if limit <= self.top_n:
+            items = node[2][:max(limit, 0)]
+        else:
+            items, stack = set(), [node]
+            while stack:
+                current = stack.pop()
+                items.update(current[1] or ())
+                stack.extend(current[0].values())
+            items = heapq.nsmallest(limit, items, key=lambda item: self.items[item][0])
+        return [self.items[item][1] for item in items]
+
+
+class Suggester:
+    """Autocomplete over fitted domain indexes: vocabulary terms and row titles.
+
+    Terms rank by document frequency (summed over the domains). Titles rank
+    by mentions, the number of rows whose indexed text holds every word of
+    the title, then by CSV order. A title is filed under each of its word
+    starts, so "dash" completes "Analytics Dashboard".
+    """
+
+    def __init__(self, sources, top_n=SUGGEST_TOP_N):
+        """sources: (domain, engine, rows, title column or None) per domain"""
+        doc_freqs = Counter()
+        for _, engine, _, _ in sources:
+            for lid, term in enumerate(engine._iter_terms()):
+                doc_freqs[term] += engine._doc_freq_at(lid)
+        self.terms = PrefixTrie(top_n)
+        for term, freq in doc_freqs.items():
+            self.terms.add([term], {"term": term, "doc_freq": freq}, (-freq, term))
+
+        self.titles = PrefixTrie(top_n)
+        for order, (domain, engine, rows, title_col) in enumerate(sources):
+            if title_col is None:
+                continue
+            seen = set()
+            for idx, row in enumerate(rows):
+                title = " ".join(str(row.get(title_col) or "").split())
+                key = title.lower()
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                mentions = sum(self._mentions(source_engine, title) for _, source_engine, _, _ in sources)
+                value = {"title": title, "domain": domain, "column": title_col, "mentions": mentions}
+                keys = {key[match.start():] for match in re.finditer(r'\w+', key)}
+                self.titles.add(keys, value, (-mentions, order, idx))
+
+        self.terms.freeze()
+        self.titles.freeze()
+
+    @staticmethod
+    def _mentions(engine, title):
+        """Documents of engine containing every token of title"""
+        lids = [engine._lookup(token) for token in set(engine.tokenize(title))]
+        if not lids or None in lids:
+            return 0
+        lids.sort(key=engine._doc_freq_at)
+        docs = engine._term_postings(lids[0])[0]
+        # Probe the longer postings lists for the shortest one's documents
+        for lid in lids[1:]:
+            others = engine._term_postings(lid)[0]
+            kept = []
+            for idx in docs:
+                pos = bisect_left(others, idx)
+                if pos < len(others) and others[pos] == idx:
+                    kept.append(idx)
+            docs = kept
+        return len(docs)
+
+    def suggest(self, prefix, limit=SUGGEST_LIMIT):
+        """(terms, titles): terms complete the prefix's last word, titles the whole prefix"""
+        text = prefix.lower()
+        title_key = " ".join(text.split())
+        if title_key and text[-1].isspace():
+            title_key += " "
+        # Like tokenize(): punctuation separates words; a trailing separator leaves nothing to complete
+        words = re.sub(r'[^\w\s]', ' ', text)
+        if not words.strip():
+            terms = self.terms.top("", limit)
+        elif words[-1].isspace():
+            terms = []
+        else:
+            terms = self.terms.top(words.split()[-1], limit)
+        titles = self.titles.top(title_key, limit)
+        return [dict(value) for value in terms], [dict(value) for value in titles]
+
+
+# ============ ROW BITMAPS ============
+# Row sets are Python ints: bit i set = row i included. AND/OR are single big-int operations.
+_BYTE_BITS = tuple(tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256))
+_BYTE_MASKS = tuple(bytes(byte >> bit & 1 for bit in range(8)) for byte in range(256))
+
+
+def bitmap_count(bitmap):
+    """Number of rows in a bitmap"""
+    return bin(bitmap).count("1")
+
+
+def bitmap_ids(bitmap):
+    """Row ids of a bitmap in ascending order"""
+    for pos, byte in enumerate(bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')):
+        if byte:
+            base = pos * 8
+            for bit in _BYTE_BITS[byte]:
+                yield base + bit
+
+
+def bitmap_mask(bitmap, n):
+    """bytes of length n with 1 for rows in the bitmap and 0 elsewhere"""
+    mask = b"".join(_BYTE_MASKS[byte] for byte in bitmap.to_bytes((n + 7) // 8, 'little'))
+    return mask[:n]
+
+
+def _bitmaps(column, key_of):
+    """{key: bitmap} of a column of value ids, grouped by key_of(vid) (None keys are skipped)"""
+    keys = {vid: key_of(vid) for vid in set(column)}
+    buffers = {key: bytearray((len(column) + 7) // 8) for key in set(keys.values()) if key is not None}
+    for idx, vid in enumerate(column):
+        key = keys[vid]
+        if key is not None:
+            buffers[key][idx >> 3] |= 1 << (idx & 7)
+    return {key: int.from_bytes(buffer, 'little') for key, buffer in buffers.items()}
+
+
+def _facet_key(value):
+    """Filter values match cells case-insensitively, ignoring surrounding whitespace"""
+    return value.strip().casefold()
+
+
+class FilterError(ValueError):
+    """Malformed filter or unknown filter column"""
+
+
+def where_conditions(where):
+    """Normalise filters to a hashable ((column, (value keys...)), ...) tuple.
+
+    where is a {column: value or list of values} mapping or a list / tuple of
+    "column=value" strings (or already normalised (column, values) pairs).
+    Values of one column are alternatives; different columns must all match.
+    Anything else raises FilterError.
+    """
+    if not where:
+        return ()
+    if isinstance(where, str):
+        where = [where]
+    if isinstance(where, Mapping):
+        items = where.items()
+    elif not isinstance(where, (list, tuple)):
+        raise FilterError(f"Filters must be a column=value string, a list of them or a mapping: {where!r}")
+    else:
+        items = []
+        for condition in where:
+            if isinstance(condition, tuple) and len(condition) == 2:
+                items.append(condition)
+                continue
+            col, sep, value = str(condition).partition("=")
+            if not sep or not col.strip():
+                raise FilterError(f"Filter must look like column=value: {condition!r}")
+            items.append((col, value))
+    # Columns match case-insensitively too; the first spelling seen names the condition
+    names, merged = {}, defaultdict(set)
+    for col, values in items:
+        if not isinstance(col, str):
+            raise FilterError(f"Filter column must be a string: {col!r}")
+        if not isinstance(values, (list, tuple, set, frozenset)):
+            values = [values]
+        name = names.setdefault(col.strip().casefold(), col.strip())
+        merged[name].update(_facet_key(str(value)) for value in values if value is not None)
+    return tuple(sorted((col, tuple(sorted(keys))) for col, keys in merged.items()))
+
+
+# ============ ROW STORAGE ============
+class _Row(Mapping):
+    """Read-only dict-like view of one table row"""
+
+    __slots__ = ("_table", "_idx")
+
+    def __init__(self, table, idx):
+        self._table = table
+        self._idx = idx
+
+    def __getitem__(self, col):
+        return self._table.value(self._idx, self._table.positions[col])
+
+    def __iter__(self):
+        return iter(self._table.columns)
+
+    def __len__(self):
+        return len(self._table.columns)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class Table(Sequence):
+    """Columnar CSV rows.
+
+    Each distinct cell value is stored once in a UTF-8 heap (value i spans
+    value_offsets[i]:value_offsets[i + 1]), and cells is a flat array('I') of
+    value ids, row-major - so repeated values (Severity, Platform, Category,
+    Type, ...) cost four bytes per cell. Empty cells of short CSV rows read
+    back as None, as csv.DictReader reports them. The heap may be a mapped
+    file (see binary_index), in which case heap_start locates it.
+
+    facets() holds row bitmaps for every low-cardinality column (value ->
+    rows), which where() intersects to resolve structured filters.
+    """
+
+    NULL_CELL = 0xFFFFFFFF
+
+    def __init__(self, columns, cells, value_offsets, heap, heap_start=0):
+        self.columns = list(columns)
+        self.positions = {col: pos for pos, col in enumerate(self.columns)}
+        self.cells = cells
+        self.value_offsets = value_offsets
+        self.heap = heap
+        self.heap_start = heap_start
+        self._len = len(cells) // len(self.columns) if self.columns else 0
+        self._facets = None
+
+    @classmethod
+    def from_csv(cls, filepath):
+        with open(filepath, 'r', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            columns = [col for col in (reader.fieldnames or []) if col is not None]
+            cells, value_offsets, heap, value_ids = array('I'), array('I', [0]), bytearray(), {}
+            for row in reader:
+                for col in columns:
+                    value = row.get(col)
+                    if value is None:
+                        cells.append(cls.NULL_CELL)
+                        continue
+                    vid = value_ids.get(value)
+                    if vid is None:
+                        vid = value_ids[value] = len(value_offsets) - 1
+                        heap += value.encode('utf-8')
+                        value_offsets.append(len(heap))
+                    cells.append(vid)
+        return cls(columns, cells, value_offsets, bytes(heap))
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(self._len))]
+        if idx < 0:
+            idx += self._len
+        if not 0 <= idx < self._len:
+            raise IndexError("row index out of range")
+        return _Row(self, idx)
+
+    def value(self, idx, pos):
+        """Decode one cell"""
+        return self._decode(self.cells[idx * len(self.columns) + pos])
+
+    def _decode(self, vid):
+        if vid == self.NULL_CELL:
+            return None
+        start = self.heap_start + self.value_offsets[vid]
+        end = self.heap_start + self.value_offsets[vid + 1]
+        return self.heap[start:end].decode('utf-8')
+
+    def _column(self, pos):
+        """Value ids of one column, one per row"""
+        return self.cells[pos::len(self.columns)]
+
+    def _facet_key_of(self, vid):
+        # Missing cells of short rows match an empty filter value, like empty cells
+        value = self._decode(vid)
+        return "" if value is None else _facet_key(value)
+
+    def facets(self):
+        """{column: {value key: row bitmap}} for low-cardinality columns (built once)"""
+        if self._facets is None:
+            limit = min(FACET_MAX_VALUES, max(1, self._len // 2))
+            facets = {}
+            for pos, col in enumerate(self.columns):
+                column = self._column(pos)
+                if len(set(column)) <= limit:
+                    facets[col] = _bitmaps(column, self._facet_key_of)
+            self._facets = facets
+        return self._facets
+
+    def column_name(self, name):
+        """Exact column name for a filter column given in any case; FilterError if unknown"""
+        if name in self.positions:
+            return name
+        for col in self.columns:
+            if col.casefold() == name.strip().casefold():
+                return col
+        raise FilterError(f"Unknown filter column: {name}. Available: {', '.join(self.columns)}")
+
+    def where(self, conditions):
+        """Bitmap of rows matching every (column, value keys) condition; keys of one column are alternatives.
+
+        Faceted columns resolve through their bitmaps; any other column is scanned once.
+        """
+        allowed = (1 << self._len) - 1
+        for name, keys in conditions:
+            col = self.column_name(name)
+            bitmaps = self.facets().get(col)
+            if bitmaps is None:
+                wanted = set(keys)
+                bitmaps = _bitmaps(self._column(self.positions[col]),
+                                   lambda vid: True if self._facet_key_of(vid) in wanted else None)
+                allowed &= bitmaps.get(True, 0)
+            else:
+                matched = 0
+                for key in keys:
+                    matched |= bitmaps.get(key, 0)
+                allowed &= matched
+            if not allowed:
+                break
+        return allowed
+
+    def record(self, idx, output_cols):
+        """Decode the requested columns of one row (columns the CSV lacks are skipped)"""
+        return {col: self.value(idx, self.positions[col]) for col in output_cols if col in self.positions}
+
+
+class CombinedRows:
+    """Several same-schema Tables viewed as one corpus, each under a label (e.g. its stack).
+
+    Document ids run table after table in the given order; record() tags each
+    row with its label under label_col, and where() shifts every table's
+    bitmap to its offset.
+    """
+
+    def __init__(self, labels, tables, label_col):
+        self.labels = list(labels)
+        self.tables = list(tables)
+        self.label_col = label_col
+        self.offsets = [0]
+        for table in self.tables:
+            self.offsets.append(self.offsets[-1] + len(table))
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def locate(self, idx):
+        """(table position, row within that table) of a combined document id"""
+        pos = bisect_right(self.offsets, idx) - 1
+        return pos, idx - self.offsets[pos]
+
+    def record(self, idx, output_cols):
+        pos, local = self.locate(idx)
+        return {self.label_col: self.labels[pos], **self.tables[pos].record(local, output_cols)}
+
+    def where(self, conditions):
+        allowed = 0
+        for table, offset in zip(self.tables, self.offsets):
+            allowed |= table.where(conditions) << offset
+        return allowed
+
+    def label_counts(self, doc_ids):
+        """{label: number of the given documents from that table}, every label included"""
+        counts = dict.fromkeys(self.labels, 0)
+        for idx in doc_ids:
+            counts[self.labels[self.locate(idx)[0]]] += 1
+        return counts
+
+
+# ============ CORPUS REGISTRY ============
+
+class CorpusRegistry:
+    """Process-wide cache of parsed CSV rows and fitted BM25 indexes.
+
+    Entries are keyed by resolved file path and validated against the file's
+    (mtime, size), so an edited CSV is reloaded on its next use. After
+    pin_shards() no new shard workers are started: requests for shards that
+    are not already running are scored unsharded.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._combined = OrderedDict()
+        self._suggesters = {}
+        self._lock = threading.RLock()
+        self._start_shards = True
+
+    def pin_shards(self):
+        """Stop forking shard workers (the daemon calls this once warm: fork is unsafe from handler threads)"""
+        with self._lock:
+            self._start_shards = False
+
+    @staticmethod
+    def _signature(filepath):
+        stat = os.stat(filepath)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _entry(self, filepath):
+        key = str(Path(filepath).resolve())
+        signature = self._signature(key)
+        entry = self._entries.get(key)
+        if entry is None or entry["signature"] != signature:
+            if entry is not None:
+                self._close_shards(entry)
+            with span("csv_load", file=Path(key).name):
+                rows = Table.from_csv(key)
+            with span("facets", file=Path(key).name):
+                rows.facets()
+            entry = {"signature": signature, "rows": rows, "indexes": {}, "sharded": {}}
+            self._entries[key] = entry
+        return entry
+
+    @staticmethod
+    def _close_shards(entry):
+        for sharded in entry["sharded"].values():
+            sharded.close()
+
+    def rows(self, filepath):
+        """Parsed rows of a CSV file as a shared read-only Table"""
+        with self._lock:
+            return self._entry(filepath)["rows"]
+
+    def index(self, filepath, search_cols):
+        """Return (rows, BM25 fitted over search_cols) for a CSV file"""
+        with self._lock:
+            entry = self._entry(filepath)
+            cols = tuple(search_cols)
+            bm25 = entry["indexes"].get(cols)
+            if bm25 is None:
+                documents = [" ".join(str(row.get(col, "")) for col in cols) for row in entry["rows"]]
+                bm25 = _new_engine()
+                with span("fit", file=Path(filepath).name, documents=len(documents)):
+                    bm25.fit(documents)
+                entry["indexes"][cols] = bm25
+            return entry["rows"], bm25
+
+    def sharded(self, filepath, search_cols, shards):
+        """Return (rows, ShardedIndex with `shards` worker processes) for a CSV file
+
+        Once shards are pinned, a count that is not running yields the plain engine.
+        """
+        with self._lock:
+            rows, bm25 = self.index(filepath, search_cols)
+            entry = self._entry(filepath)
+            key = (tuple(search_cols), shards)
+            sharded = entry["sharded"].get(key)
+            if sharded is None:
+                if not self._start_shards:
+                    return rows, bm25
+                with span("shard_start", file=Path(filepath).name, shards=shards):
+                    sharded = entry["sharded"][key] = ShardedIndex(bm25, shards)
+            return rows, sharded
+
+    def combined(self, filepaths, labels, search_cols, label_col, shards=None):
+        """Return (CombinedRows, engine, scorer) for one index fitted over several CSVs.
+
+        IDF and avgdl come from the union, so scores are comparable across
+        files. The combined index is rebuilt when any of its files changes.
+        scorer is the engine itself, or a ShardedIndex over it when shards > 1
+        (and workers may still be started, see pin_shards). At most
+        COMBINED_CACHE_SIZE selections are kept.
+        """
+        with self._lock:
+            entries = [self._entry(filepath) for filepath in filepaths]
+            key = (tuple(str(Path(filepath).resolve()) for filepath in filepaths), tuple(search_cols))
+            signature = tuple(entry["signature"] for entry in entries)
+            combined = self._combined.get(key)
+            if combined is None or combined["signature"] != signature:
+                if combined is not None:
+                    self._close_shards(combined)
+                rows = CombinedRows(labels, [entry["rows"] for entry in entries], label_col)
+                documents = [" ".join(str(row.get(col, "")) for col in search_cols) for table in rows.tables for row in table]
+                engine = _new_engine()
+                with span("fit", file="+".join(map(str, labels)), documents=len(documents)):
+                    engine.fit(documents)
+                combined = self._combined[key] = {"signature": signature, "rows": rows, "engine": engine, "sharded": {}}
+            self._combined.move_to_end(key)
+            self._trim_combined(keep=key)
+            if shards and shards > 1:
+                sharded = combined["sharded"].get(shards)
+                if sharded is None and not self._start_shards:
+                    return combined["rows"], combined["engine"], combined["engine"]
+                if sharded is None:
+                    with span("shard_start", file="+".join(map(str, labels)), shards=shards):
+                        sharded = combined["sharded"][shards] = ShardedIndex(combined["engine"], shards)
+                return combined["rows"], combined["engine"], sharded
+            return combined["rows"], combined["engine"], combined["engine"]
+
+    def _trim_combined(self, keep):
+        while len(self._combined) > COMBINED_CACHE_SIZE:
+            candidates = [key for key in self._combined if key != keep]
+            # Prefer selections without workers: once pinned, dropped workers cannot be restarted
+            victim = next((key for key in candidates if not self._combined[key]["sharded"]), None)
+            if victim is None and self._start_shards:
+                victim = candidates[0]
+            if victim is None:
+                return
+            self._close_shards(self._combined.pop(victim))
+
+    def suggester(self, domain=None):
+        """Suggester over one domain's index and titles (None: every domain), rebuilt when a file changes"""
+        filepaths = [(name, os.path.join(DATA_DIR, CSV_CONFIG[name]["file"]))
+                     for name in (CSV_CONFIG if domain is None else [domain])]
+        # Validated with one stat per file, so a keystroke never waits on path resolution
+        signature = []
+        for name, filepath in filepaths:
+            try:
+                signature.append((filepath, self._signature(filepath)))
+            except OSError:
+                signature.append((filepath, None))
+        with self._lock:
+            cached = self._suggesters.get(domain)
+            if cached is None or cached[0] != signature:
+                sources = []
+                for (name, filepath), (_, file_signature) in zip(filepaths, signature):
+                    if file_signature is not None:
+                        config = CSV_CONFIG[name]
+                        rows, bm25 = self.index(Path(filepath), config["search_cols"])
+                        sources.append((name, bm25, rows, config.get("title_col")))
+                with span("suggest_index", domain=domain or ALL_DOMAINS):
+                    cached = self._suggesters[domain] = (signature, Suggester(sources))
+            return cached[1]
+
+    def warm(self, domains=None, stacks=None, shards=None, fuzzy=False, suggest=False):
+        """Load and index domains/stacks up front (default: all of them).
+
+        With every stack, the combined "all" index is built too. shards > 1
+        also starts shard workers; fuzzy also builds each index's FuzzyIndex,
+        so the first typo query does not pay for it; suggest builds the
+        autocomplete tries (every domain, and each one alone).
+        """
+        targets = [(DATA_DIR / CSV_CONFIG[domain]["file"], CSV_CONFIG[domain]["search_cols"])
+                   for domain in (CSV_CONFIG if domains is None else domains)]
+        targets += [(DATA_DIR / STACK_CONFIG[stack]["file"], _STACK_COLS["search_cols"])
+                    for stack in (STACK_CONFIG if stacks is None else stacks)]
+        for filepath, search_cols in targets:
+            if filepath.exists():
+                _, bm25 = self.index(filepath, search_cols)
+                if fuzzy:
+                    bm25.fuzzy_index()
+                if shards and shards > 1:
+                    self.sharded(filepath, search_cols, shards)
+        if stacks is None:
+            names = [name for name in AVAILABLE_STACKS if (DATA_DIR / STACK_CONFIG[name]["file"]).exists()]
+            if names:
+                _, engine, _ = self.combined([DATA_DIR / STACK_CONFIG[name]["file"] for name in names], names,
+                                             _STACK_COLS["search_cols"], STACK_LABEL_COL, shards)
+                if fuzzy:
+                    engine.fuzzy_index()
+        if suggest:
+            self.suggester()
+            for domain in (CSV_CONFIG if domains is None else domains):
+                self.suggester(domain)
+
+    def invalidate(self, filepath=None):
+        """Drop one file's entry, or everything when filepath is None"""
+        with self._lock:
+            if filepath is None:
+                entries, self._entries = list(self._entries.values()), {}
+                entries += self._combined.values()
+                self._combined = OrderedDict()
+                self._suggesters = {}
+                _reset_vocabulary()
+            else:
+                path = str(Path(filepath).resolve())
+                entry = self._entries.pop(path, None)
+                entries = [entry] if entry is not None else []
+                for key in [key for key in self._combined if path in key[0]]:
+                    entries.append(self._combined.pop(key))
+            for entry in entries:
+                self._close_shards(entry)
+
+
+_registry = CorpusRegistry()
+
+
+def load_rows(filepath):
+    """Parsed CSV rows from the shared registry"""
+    return _registry.rows(filepath)
+
+
+def warm(domains=None, stacks=None, shards=None, fuzzy=False, suggest=False):
+    """Pre-load indexes into the shared registry (for long-lived embedders)"""
+    _registry.warm(domains, stacks, shards, fuzzy, suggest)
+
+
+def pin_shards():
+    """Use only the shard workers already running from now on (see CorpusRegistry.pin_shards)"""
+    _registry.pin_shards()
+
+
+def invalidate(filepath=None):
+    """Forget cached rows/indexes for one file, or all files"""
+    global _domain_classifier
+    _registry.invalidate(filepath)
+    if filepath is None:
+        _result_cache.clear()
+    if filepath is None or Path(filepath).name == DOMAIN_KEYWORDS_FILE:
+        _domain_classifier = None
+
+
+# ============ RESULT CACHE ============
+RESULT_CACHE_SIZE = 512
+# Path of a SQLite file shared by separate processes (unset = in-memory LRU only)
+RESULT_CACHE_ENV = "UIPRO_CACHE_DB"
+# SQLite tier row cap: the oldest-written rows (entries of edited CSVs first) are pruned
+# beyond it when the file opens and every RESULT_CACHE_DISK_PRUNE_EVERY writes
+RESULT_CACHE_DISK_ROWS = 50000
+RESULT_CACHE_DISK_PRUNE_EVERY = 1000
+
+
+class _DiskCache:
+    """SQLite tier: JSON result lists keyed by cache-key digest"""
+
+    def __init__(self, path, max_rows=RESULT_CACHE_DISK_ROWS):
+        self.path = str(path)
+        self.max_rows = max_rows
+        self._writes = 0
+        self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        try:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._prune()
+        except sqlite3.Error:
+            self._conn.close()
+            raise
+
+    def _prune(self):
+        # INSERT OR REPLACE gives every write a fresh, higher rowid, so low rowids are the oldest
+        self._conn.execute("DELETE FROM results WHERE rowid <= (SELECT max(rowid) FROM results) - ?", (self.max_rows,))
+        self._conn.commit()
+
+    def get(self, digest):
+        row = self._conn.execute("SELECT value FROM results WHERE key = ?", (digest,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, digest, results):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO results (key, value) VALUES (?, ?)",
+            (digest, json.dumps(results, ensure_ascii=False)),
+        )
+        self._conn.commit()
+        self._writes += 1
+        if self._writes % RESULT_CACHE_DISK_PRUNE_EVERY == 0:
+            self._prune()
+
+    def clear(self):
+        self._conn.execute("DELETE FROM results")
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+class ResultCache:
+    """Bounded LRU of ranked search results with an optional SQLite tier.
+
+    Keys are (file, search/output columns, data version, query tokens,
+    max_results). The data version is the backing CSV's (mtime, size), so an
+    edited file simply stops matching its old entries.
+    """
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE, disk_path=None):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        self.hits = self.misses = self.evictions = self.disk_hits = 0
+        if disk_path:
+            self.attach_disk(disk_path)
+
+    def attach_disk(self, path):
+        """Share entries through a SQLite file (None detaches).
+
+        A file that cannot be opened leaves the cache memory-only, with a
+        warning on stderr, instead of failing the search.
+        """
+        with self._lock:
+            self._detach()
+            if path is not None and sqlite3 is not None:
+                try:
+                    self._disk = _DiskCache(path)
+                except sqlite3.Error as e:
+                    print(f"Warning: result cache {path} unavailable ({e}); caching in memory only", file=sys.stderr)
+
+    def _detach(self):
+        if self._disk is not None:
+            try:
+                self._disk.close()
+            except sqlite3.Error:
+                pass
+            self._disk = None
+
+    def _disk_failed(self, error):
+        """Warn once and continue memory-only after a SQLite error (caller holds the lock)"""
+        print(f"Warning: result cache {self._disk.path} failed ({error}); caching in memory only", file=sys.stderr)
+        self._detach()
+
+    @staticmethod
+    def _digest(key):
+        return hashlib.sha1(json.dumps(key, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Cached results for key, or None"""
+        with self._lock:
+            results = self._entries.get(key)
+            if results is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return results
+            if self._disk is not None:
+                try:
+                    results = self._disk.get(self._digest(key))
+                except ValueError:  # unreadable row: recomputed and overwritten
+                    results = None
+                except sqlite3.Error as e:
+                    self._disk_failed(e)
+                    results = None
+                if results is not None:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._store(key, results)
+                    return results
+            self.misses += 1
+            return None
+
+    def put(self, key, results):
+        with self._lock:
+            self._store(key, results)
+            if self._disk is not None:
+                try:
+                    self._disk.put(self._digest(key), results)
+                except sqlite3.Error as e:
+                    self._disk_failed(e)
+
+    def _store(self, key, results):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = results
+        self._entries.move_to_end(key)
+        self._trim()
+
+    def _trim(self):
+        while len(self._entries) > max(self.maxsize, 0):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            self._trim()
+
+    def clear(self, disk=False):
+        """Drop in-memory entries (and the SQLite tier when disk=True)"""
+        with self._lock:
+            self._entries.clear()
+            if disk and self._disk is not None:
+                try:
+                    self._disk.clear()
+                except sqlite3.Error as e:
+                    self._disk_failed(e)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "disk": self._disk.path if self._disk is not None else None,
+            }
+
+
+_result_cache = ResultCache(disk_path=os.environ.get(RESULT_CACHE_ENV))
+_query_tokenizer = BM25()
+
+
+def cache_stats():
+    """Hit/miss/eviction counters of the shared result cache"""
+    return _result_cache.stats()
+
+
+def configure_cache(maxsize=None, disk_path=False):
+    """Resize the in-memory LRU and/or attach (path) or detach (None) the SQLite tier"""
+    if maxsize is not None:
+        _result_cache.resize(maxsize)
+    if disk_path is not False:
+        _result_cache.attach_disk(disk_path)
+
+
+def _cache_key(filepath, search_cols, output_cols, query, max_results, conditions=(), fuzzy=False):
+    stat = os.stat(filepath)
+    key = (
+        str(filepath),
+        tuple(search_cols),
+        tuple(output_cols),
+        (stat.st_mtime_ns, stat.st_size),
+        tuple(_query_tokenizer.tokenize(query)),
+        max_results,
+    )
+    # Unfiltered, exact keys keep their original shape, so existing disk-tier entries stay valid
+    if conditions:
+        key += (conditions,)
+    return key + ("fuzzy",) if fuzzy else key
+
+
+def _mapped_section(filepath, search_cols):
+    """Section of the prebuilt binary index for this CSV, if built and still fresh"""
+    from binary_index import open_index
+
+    index = open_index()
+    if index is None:
+        return None
+    try:
+        rel_file = Path(filepath).relative_to(DATA_DIR).as_posix()
+    except ValueError:
+        return None
+    section = index.section(rel_file, search_cols)
+    if section is None or not section.is_fresh(filepath):
+        return None
+    return section
+
+
+def _open_corpus(filepath, search_cols, shards=None):
+    """(engine, rows) for a CSV: the mapped section when fresh, else registry rows + BM25.
+
+    shards > 1 selects the registry's scatter-gather ShardedIndex instead.
+    """
+    if shards and shards > 1:
+        rows, sharded = _registry.sharded(filepath, search_cols, shards)
+        return sharded, rows
+
+    section = _mapped_section(filepath, search_cols)
+    if section is not None:
+        return section, section.rows
+
+    rows, bm25 = _registry.index(filepath, search_cols)
+    return bm25, rows
+
+
+def _allowed_rows(rows, conditions):
+    """Row bitmap for filter conditions (None = unfiltered)"""
+    if not conditions:
+        return None
+    with span("filter", conditions=len(conditions)):
+        return rows.where(conditions)
 
 
 # ============ SEARCH FUNCTIONS ============
-def _load_csv(filepath):
-    """Load CSV and return list of dicts"""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return list(csv.DictReader(f))
+def _search_csv_many(filepath, search_cols, output_cols, queries, max_results, shards=None, conditions=(), fuzzy=False):
+    """Rank several queries against one CSV, opening its index once"""
+    if not filepath.exists():
+        return [[] for _ in queries]
 
+    engine, rows = _open_corpus(filepath, search_cols, shards)
+    # Filters are resolved to a row bitmap first, so only matching rows are scored
+    ranked_lists = engine.top_k_many(queries, max_results, _allowed_rows(rows, conditions), fuzzy)
+    # top_k only yields score > 0; stored fields are decoded for the top-k rows only
+    with span("materialise", rows=sum(map(len, ranked_lists))):
+        return [[rows.record(idx, output_cols) for idx, score in ranked] for ranked in ranked_lists]
 
-def _search_csv(filepath, search_cols, output_cols, query, max_results):
+
+def _search_csv_cached(filepath, search_cols, output_cols, queries, max_results, shards=None, conditions=(),
+                       fuzzy=False):
+    """_search_csv_many through the result cache; each caller gets its own row dicts"""
+    with span("cache_lookup", queries=len(queries)):
+        keys = [_cache_key(filepath, search_cols, output_cols, query, max_results, conditions, fuzzy) for query in queries]
+        ranked = [_result_cache.get(key) for key in keys]
+
+    missing = [pos for pos, results in enumerate(ranked) if results is None]
+    if missing:
+        computed = _search_csv_many(filepath, search_cols, output_cols, [queries[pos] for pos in missing], max_results,
+                                    shards, conditions, fuzzy)
+        for pos, results in zip(missing, computed):
+            _result_cache.put(keys[pos], results)
+            ranked[pos] = results
+
+    return [[dict(row) for row in results] for results in ranked]
+
+
+def _search_csv(filepath, search_cols, output_cols, query, max_results, shards=None, conditions=(), fuzzy=False):
     """Core search function using BM25"""
-    if not filepath.exists():
-        return []
+    return _search_csv_cached(filepath, search_cols, output_cols, [query], max_results, shards, conditions, fuzzy)[0]
+
+
+def _search_csv_iter(filepath, search_cols, output_cols, query, max_results, shards=None, conditions=(), fuzzy=False):
+    """(count, row iterator) for one query; rows are decoded only as the iterator is consumed.
+
+    Served from the result cache when present; a miss ranks the query but does
+    not fill the cache, since the rows are never held together.
+    """
+    with span("cache_lookup", queries=1):
+        cached = _result_cache.get(_cache_key(filepath, search_cols, output_cols, query, max_results, conditions, fuzzy))
+    if cached is not None:
+        return len(cached), (dict(row) for row in cached)
+
+    engine, rows = _open_corpus(filepath, search_cols, shards)
+    ranked = engine.top_k_many([query], max_results, _allowed_rows(rows, conditions), fuzzy)[0]
+    return len(ranked), (rows.record(idx, output_cols) for idx, score in ranked)
+
+
+class DomainClassifier:
+    """Keyword-hit domain router compiled into one regex scan.
 
-    data = _load_csv(filepath)
+    A query scores one point per listed keyword it contains; the highest
+    score wins, ties go to the domain listed first, and a query with no hits
+    falls back to FALLBACK_DOMAIN.
 
-    # Build documents from search columns
-    documents = [" ".join(str(row.get(col, "")) for col in search_cols) for row in data]
+    The keywords are folded into a prefix-trie regex inside a lookahead, so
+    each query position yields the longest keyword starting there; every
+    other keyword starting at that position is a prefix of it (precomputed).
+    """
 
-    # BM25 search
-    bm25 = BM25()
-    bm25.fit(documents)
-    ranked = bm25.score(query)
+    def __init__(self, domain_keywords):
+        self.domains = list(domain_keywords)
+        # keyword -> (domain position, serial) per listing, so repeats count separately
+        listed = defaultdict(list)
+        serial = 0
+        for pos, keywords in enumerate(domain_keywords.values()):
+            for kw in keywords:
+                listed[kw.lower()].append((pos, serial))
+                serial += 1
+        self._always = tuple(pos for pos, _ in listed.pop("", ()))
 
-    # Get top results with score > 0
-    results = []
-    for idx, score in ranked[:max_results]:
-        if score > 0:
-            row = data[idx]
-            results.append({col: row.get(col, "") for col in output_cols if col in row})
+        self._hits = {
+            kw: tuple(hit for other in listed if kw.startswith(other) for hit in listed[other])
+            for kw in listed
+        }
+        self._pattern = re.compile(f"(?=({self._trie_regex(listed)}))", re.DOTALL) if listed else None
 
-    return results
+    @staticmethod
+    def _trie_regex(keywords):
+        """Regex matching the longest of keywords at a position, branching on one char at a time"""
+        trie = {}
+        for kw in keywords:
+            node = trie
+            for char in kw:
+                node = node.setdefault(char, {})
+            node[""] = True
+
+        def compile_node(node):
+            branches = [re.escape(char) + compile_node(child) for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ""
+            body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+            # Greedy optional: a longer keyword is preferred over one ending here
+            return f"(?:{body})?" if "" in node else body
+
+        return compile_node(trie)
+
+    @classmethod
+    def from_csv(cls, filepath):
+        domain_keywords = {}
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                keywords = [kw.strip() for kw in (row.get("Keywords") or "").split(",")]
+                domain_keywords.setdefault(row["Domain"].strip(), []).extend(kw for kw in keywords if kw)
+        return cls(domain_keywords)
+
+    def _counts(self, query):
+        counts = [0] * len(self.domains)
+        for pos in self._always:
+            counts[pos] += 1
+        if self._pattern is not None:
+            longest = self._pattern.findall(query.lower())
+            if longest:
+                # Each listed keyword counts once however often it occurs
+                found = set()
+                for kw in set(longest):
+                    found.update(self._hits[kw])
+                for pos, _ in found:
+                    counts[pos] += 1
+        return counts
+
+    def scores(self, query):
+        """Hits per domain, in listing order"""
+        return dict(zip(self.domains, self._counts(query)))
+
+    def classify(self, query):
+        """Best-scoring domain, or FALLBACK_DOMAIN when nothing matches"""
+        counts = self._counts(query)
+        best = max(counts, default=0)
+        return self.domains[counts.index(best)] if best > 0 else FALLBACK_DOMAIN
+
+
+_domain_classifier = None
+
+
+def domain_classifier():
+    """Compiled classifier for DOMAIN_KEYWORDS_FILE (built once; reset by invalidate())"""
+    global _domain_classifier
+    classifier = _domain_classifier
+    if classifier is None:
+        filepath = DATA_DIR / DOMAIN_KEYWORDS_FILE
+        classifier = DomainClassifier.from_csv(filepath) if filepath.exists() else DomainClassifier({})
+        _domain_classifier = classifier
+    return classifier
 
 
 def detect_domain(query):
     """Auto-detect the most relevant domain from query"""
-    query_lower = query.lower()
-
-    domain_keywords = {
-        "color": ["color", "palette", "hex", "#", "rgb"],
-        "chart": ["chart", "graph", "visualization", "trend", "bar", "pie", "scatter", "heatmap", "funnel"],
-        "landing": ["landing", "page", "cta", "conversion", "hero", "testimonial", "pricing", "section"],
-        "product": ["saas", "ecommerce", "e-commerce", "fintech", "healthcare", "gaming", "portfolio", "crypto", "dashboard"],
-        "style": ["style", "design", "ui", "minimalism", "glassmorphism", "neumorphism", "brutalism", "dark mode", "flat", "aurora", "prompt", "css", "implementation", "variable", "checklist", "tailwind"],
-        "ux": ["ux", "usability", "accessibility", "wcag", "touch", "scroll", "animation", "keyboard", "navigation", "mobile"],
-        "typography": ["font", "typography", "heading", "serif", "sans"],
-        "icons": ["icon", "icons", "lucide", "heroicons", "symbol", "glyph", "pictogram", "svg icon"],
-        "react": ["react", "next.js", "nextjs", "suspense", "memo", "usecallback", "useeffect", "rerender", "bundle", "waterfall", "barrel", "dynamic import", "rsc", "server component"],
-        "web": ["aria", "focus", "outline", "semantic", "virtualize", "autocomplete", "form", "input type", "preconnect"]
-    }
+    return domain_classifier().classify(query)
+
+
+def _with_filters(response, conditions):
+    """Echo applied filters (column -> normalised values) ahead of count and results"""
+    if not conditions:
+        return response
+    results, count = response.pop("results"), response.pop("count")
+    response["where"] = {col: list(keys) for col, keys in conditions}
+    response["count"] = count
+    response["results"] = results
+    return response
+
+
+def _domain_response(domain, config, query, results, count=None, conditions=()):
+    return _with_filters({
+        "domain": domain,
+        "query": query,
+        "file": config["file"],
+        "count": len(results) if count is None else count,
+        "results": results
+    }, conditions)
+
+
+def _stack_response(stack, query, results, count=None, conditions=()):
+    return _with_filters({
+        "domain": "stack",
+        "stack": stack,
+        "query": query,
+        "file": STACK_CONFIG[stack]["file"],
+        "count": len(results) if count is None else count,
+        "results": results
+    }, conditions)
+
+
+def _fuse(matches, k, fusion):
+    """Top-k (idx, fused score, raw score) of one domain's matches, calibrated for cross-domain merging.
+
+    zscore standardises against the mean and deviation of every matching
+    document's score in the domain; rrf uses reciprocal rank 1 / (RRF_K + rank).
+    """
+    top = heapq.nsmallest(k, matches, key=lambda match: (-match[1], match[0]))
+    if fusion == "rrf":
+        return [(idx, 1 / (RRF_K + rank), score) for rank, (idx, score) in enumerate(top, 1)]
+    mean = sum(score for _, score in matches) / len(matches)
+    std = sqrt(sum((score - mean) ** 2 for _, score in matches) / len(matches))
+    return [(idx, (score - mean) / std if std > 0 else 0.0, score) for idx, score in top]
+
+
+def _search_all_domains(query, max_results=MAX_RESULTS, stream=False, where=None, fusion="zscore", fuzzy=False):
+    """Search every CSV_CONFIG domain and merge one calibrated top-k.
+
+    The query is tokenised once; each domain's resident index yields all its
+    matches in one postings pass, which are calibrated per domain (see _fuse)
+    and merged by fused score (raw score, then domain order, break ties).
+    Rows are tagged with their domain under DOMAIN_LABEL_COL. With filters,
+    domains lacking a filter column are left out.
+    """
+    if fusion not in FUSION_METHODS:
+        return {"error": f"Unknown fusion: {fusion}. Available: {', '.join(FUSION_METHODS)}", "domain": ALL_DOMAINS}
+    try:
+        conditions = where_conditions(where)
+    except FilterError as e:
+        return {"error": str(e), "domain": ALL_DOMAINS}
+
+    with span("tokenize"):
+        tokens = _query_tokenizer.tokenize(query)
+
+    domains, candidates, domain_counts, record_of = [], [], {}, {}
+    with span("search", domain=ALL_DOMAINS):
+        for order, (domain, config) in enumerate(CSV_CONFIG.items()):
+            filepath = DATA_DIR / config["file"]
+            if not filepath.exists():
+                continue
+            engine, rows = _open_corpus(filepath, config["search_cols"])
+            try:
+                allowed = _allowed_rows(rows, conditions)
+            except FilterError:
+                continue
+            domains.append(domain)
+            with span("score", domain=domain):
+                # Unknown tokens expand against each domain's own vocabulary
+                weighted = engine.expand(tokens) if fuzzy else None
+                if max_results <= 0 or allowed == 0:
+                    matches = []
+                elif weighted is None:
+                    matches = engine.scored_matches(tokens, allowed)
+                else:
+                    matches = engine.weighted_matches(weighted, allowed)
+            domain_counts[domain] = len(matches)
+            if matches:
+                record_of[domain] = (rows, config["output_cols"])
+                candidates.extend((-fused, -score, order, idx, domain) for idx, fused, score in _fuse(matches, max_results, fusion))
+
+    with span("top_k"):
+        top = sorted(candidates)[:max(max_results, 0)]
+
+    def record(domain, idx):
+        rows, output_cols = record_of[domain]
+        return {DOMAIN_LABEL_COL: domain, **rows.record(idx, output_cols)}
 
-    scores = {domain: sum(1 for kw in keywords if kw in query_lower) for domain, keywords in domain_keywords.items()}
-    best = max(scores, key=scores.get)
-    return best if scores[best] > 0 else "style"
+    if stream:
+        results = (record(domain, idx) for _, _, _, idx, domain in top)
+    else:
+        with span("materialise", rows=len(top)):
+            results = [record(domain, idx) for _, _, _, idx, domain in top]
+
+    return _with_filters({
+        "domain": ALL_DOMAINS,
+        "domains": domains,
+        "query": query,
+        "file": ", ".join(CSV_CONFIG[domain]["file"] for domain in domains),
+        "fusion": fusion,
+        "domain_counts": domain_counts,
+        "count": len(top),
+        "results": results
+    }, conditions)
 
 
-def search(query, domain=None, max_results=MAX_RESULTS):
-    """Main search function with auto-domain detection"""
+def search(query, domain=None, max_results=MAX_RESULTS, shards=None, stream=False, where=None, fusion="zscore",
+           fuzzy=False):
+    """Main search function with auto-domain detection.
+
+    shards > 1 scores the domain on that many worker processes (same results).
+    stream=True returns "results" as an iterator that builds each row dict on
+    demand ("count" is still exact, since ranking happens up front).
+    where restricts ranking to rows matching structured filters, e.g.
+    {"Severity": "High", "Platform": ["Web", "Mobile"]} or ["Severity=High"]
+    (see where_conditions); top-k is taken over the matching rows only.
+    domain="all" searches every domain and merges one top-k calibrated by
+    fusion ("zscore" or "rrf"; see _search_all_domains). Shards are not used there.
+    fuzzy=True tolerates typos: query tokens missing from the index expand to
+    near vocabulary terms at a discounted weight (see BM25.expand).
+    """
+    if domain == ALL_DOMAINS:
+        return _search_all_domains(query, max_results, stream, where, fusion, fuzzy)
+
     if domain is None:
-        domain = detect_domain(query)
+        with span("detect_domain"):
+            domain = detect_domain(query)
 
     config = CSV_CONFIG.get(domain, CSV_CONFIG["style"])
     filepath = DATA_DIR / config["file"]
@@ -220,19 +2270,100 @@ def search(query, domain=None, max_results=MAX_RESULTS):
     if not filepath.exists():
         return {"error": f"File not found: {filepath}", "domain": domain}
 
-    results = _search_csv(filepath, config["search_cols"], config["output_cols"], query, max_results)
+    try:
+        conditions = where_conditions(where)
+        if stream:
+            with span("search", domain=domain):
+                count, rows = _search_csv_iter(filepath, config["search_cols"], config["output_cols"], query, max_results,
+                                               shards, conditions, fuzzy)
+            return _domain_response(domain, config, query, rows, count, conditions)
 
-    return {
-        "domain": domain,
+        with span("search", domain=domain):
+            results = _search_csv(filepath, config["search_cols"], config["output_cols"], query, max_results, shards,
+                                  conditions, fuzzy)
+    except FilterError as e:
+        return {"error": str(e), "domain": domain}
+
+    return _domain_response(domain, config, query, results, conditions=conditions)
+
+
+def _is_multi_stack(stack):
+    return not isinstance(stack, str) or stack.strip() == "all" or "," in stack
+
+
+def _stack_selection(stack):
+    """(stacks in STACK_CONFIG order, unknown names) for "all", "a,b,c" or a list"""
+    if isinstance(stack, str):
+        names = AVAILABLE_STACKS if stack.strip() == "all" else [name.strip() for name in stack.split(",") if name.strip()]
+    else:
+        names = [str(name).strip() for name in stack]
+    wanted = set(names)
+    return [name for name in AVAILABLE_STACKS if name in wanted], [name for name in names if name not in STACK_CONFIG]
+
+
+def _stacks_response(label, stacks, query, results, stack_counts, count=None, conditions=()):
+    return _with_filters({
+        "domain": "stack",
+        "stack": label,
+        "stacks": stacks,
         "query": query,
-        "file": config["file"],
-        "count": len(results),
+        "file": ", ".join(STACK_CONFIG[stack]["file"] for stack in stacks),
+        "stack_counts": stack_counts,
+        "count": len(results) if count is None else count,
         "results": results
-    }
+    }, conditions)
+
+
+def _search_stacks_many(queries, stack, max_results=MAX_RESULTS, shards=None, where=None, stream=False, fuzzy=False):
+    """Search several stacks through one combined index.
+
+    Returns per query a global top-k (each row tagged with its stack under
+    STACK_LABEL_COL) and stack_counts: how many guidelines of each stack match
+    the query at all.
+    """
+    stacks, unknown = _stack_selection(stack)
+    label = stack if isinstance(stack, str) else ",".join(stacks)
+    if unknown or not stacks:
+        error = f"Unknown stack: {', '.join(unknown) or label}. Available: all, {', '.join(AVAILABLE_STACKS)}"
+        return [{"error": error} for _ in queries]
+
+    stacks = [name for name in stacks if (DATA_DIR / STACK_CONFIG[name]["file"]).exists()]
+    if not stacks:
+        return [{"error": f"Stack files not found for: {label}", "stack": label} for _ in queries]
+
+    try:
+        conditions = where_conditions(where)
+        with span("search_stack", stack=label):
+            filepaths = [DATA_DIR / STACK_CONFIG[name]["file"] for name in stacks]
+            rows, engine, scorer = _registry.combined(filepaths, stacks, _STACK_COLS["search_cols"], STACK_LABEL_COL, shards)
+            allowed = _allowed_rows(rows, conditions)
+            ranked_lists = scorer.top_k_many(queries, max_results, allowed, fuzzy)
+            with span("stack_counts", queries=len(queries)):
+                stack_counts = [rows.label_counts(engine.matching(query, allowed, fuzzy)) for query in queries]
+    except FilterError as e:
+        return [{"error": str(e), "stack": label} for _ in queries]
+
+    output_cols = _STACK_COLS["output_cols"]
+    responses = []
+    for query, ranked, counts in zip(queries, ranked_lists, stack_counts):
+        if stream:
+            results = (rows.record(idx, output_cols) for idx, score in ranked)
+        else:
+            with span("materialise", rows=len(ranked)):
+                results = [rows.record(idx, output_cols) for idx, score in ranked]
+        responses.append(_stacks_response(label, stacks, query, results, counts, len(ranked), conditions))
+    return responses
+
 
+def search_stack(query, stack, max_results=MAX_RESULTS, shards=None, stream=False, where=None, fuzzy=False):
+    """Search stack-specific guidelines (stream=True, where and fuzzy behave as in search).
+
+    stack may also be "all", a comma-separated list or a Python list: those
+    stacks are searched through one combined index (see _search_stacks_many).
+    """
+    if _is_multi_stack(stack):
+        return _search_stacks_many([query], stack, max_results, shards, where, stream, fuzzy)[0]
 
-def search_stack(query, stack, max_results=MAX_RESULTS):
-    """Search stack-specific guidelines"""
     if stack not in STACK_CONFIG:
         return {"error": f"Unknown stack: {stack}. Available: {', '.join(AVAILABLE_STACKS)}"}
 
@@ -241,13 +2372,106 @@ def search_stack(query, stack, max_results=MAX_RESULTS):
     if not filepath.exists():
         return {"error": f"Stack file not found: {filepath}", "stack": stack}
 
-    results = _search_csv(filepath, _STACK_COLS["search_cols"], _STACK_COLS["output_cols"], query, max_results)
+    try:
+        conditions = where_conditions(where)
+        if stream:
+            with span("search_stack", stack=stack):
+                count, rows = _search_csv_iter(filepath, _STACK_COLS["search_cols"], _STACK_COLS["output_cols"], query,
+                                               max_results, shards, conditions, fuzzy)
+            return _stack_response(stack, query, rows, count, conditions)
+
+        with span("search_stack", stack=stack):
+            results = _search_csv(filepath, _STACK_COLS["search_cols"], _STACK_COLS["output_cols"], query, max_results,
+                                  shards, conditions, fuzzy)
+    except FilterError as e:
+        return {"error": str(e), "stack": stack}
+
+    return _stack_response(stack, query, results, conditions=conditions)
+
+
+# ============ BATCH SEARCH ============
+def search_many(queries, domain=None, max_results=MAX_RESULTS, shards=None, where=None, fuzzy=False):
+    """Run many searches, grouped by (detected) domain so each index is opened once.
+
+    Returns one search()-shaped result per query, in input order. where
+    and fuzzy apply to every query.
+    """
+    queries = list(queries)
+    if domain == ALL_DOMAINS:
+        return [_search_all_domains(query, max_results, where=where, fuzzy=fuzzy) for query in queries]
+    try:
+        conditions = where_conditions(where)
+    except FilterError as e:
+        return [{"error": str(e), "domain": domain} for _ in queries]
+    groups = defaultdict(list)
+    for pos, query in enumerate(queries):
+        groups[domain if domain is not None else detect_domain(query)].append(pos)
+
+    responses = [None] * len(queries)
+    for group_domain, positions in groups.items():
+        config = CSV_CONFIG.get(group_domain, CSV_CONFIG["style"])
+        filepath = DATA_DIR / config["file"]
+        if not filepath.exists():
+            for pos in positions:
+                responses[pos] = {"error": f"File not found: {filepath}", "domain": group_domain}
+            continue
+
+        group_queries = [queries[pos] for pos in positions]
+        try:
+            ranked = _search_csv_cached(filepath, config["search_cols"], config["output_cols"], group_queries, max_results,
+                                        shards, conditions, fuzzy)
+        except FilterError as e:
+            for pos in positions:
+                responses[pos] = {"error": str(e), "domain": group_domain}
+            continue
+        for pos, query, results in zip(positions, group_queries, ranked):
+            responses[pos] = _domain_response(group_domain, config, query, results, conditions=conditions)
+
+    return responses
+
+
+def search_stack_many(queries, stack, max_results=MAX_RESULTS, shards=None, where=None, fuzzy=False):
+    """Run many searches against one stack (or several, as in search_stack); results in input order"""
+    queries = list(queries)
+    if _is_multi_stack(stack):
+        return _search_stacks_many(queries, stack, max_results, shards, where, fuzzy=fuzzy)
+
+    if stack not in STACK_CONFIG:
+        return [search_stack(query, stack, max_results) for query in queries]
+
+    filepath = DATA_DIR / STACK_CONFIG[stack]["file"]
+    if not filepath.exists():
+        return [search_stack(query, stack, max_results) for query in queries]
+
+    try:
+        conditions = where_conditions(where)
+        ranked = _search_csv_cached(filepath, _STACK_COLS["search_cols"], _STACK_COLS["output_cols"], queries, max_results,
+                                    shards, conditions, fuzzy)
+    except FilterError as e:
+        return [{"error": str(e), "stack": stack} for _ in queries]
+    return [_stack_response(stack, query, results, conditions=conditions) for query, results in zip(queries, ranked)]
+
 
+# ============ SUGGESTIONS ============
+def suggest(prefix, domain=None, limit=SUGGEST_LIMIT):
+    """Autocomplete a partial query from the resident indexes.
+
+    Returns "terms" (vocabulary words completing the prefix's last word,
+    most document-frequent first) and "titles" (row titles - Style Category,
+    Product Type, Font Pairing Name, Icon Name - with a word starting with
+    the prefix, most mentioned first). domain None or "all" covers every
+    domain. Answers come from tries with each node's top SUGGEST_TOP_N
+    precomputed, built once per domain alongside its BM25 index.
+    """
+    if domain == ALL_DOMAINS:
+        domain = None
+    if domain is not None and domain not in CSV_CONFIG:
+        return {"error": f"Unknown domain: {domain}. Available: {ALL_DOMAINS}, {', '.join(CSV_CONFIG)}"}
+    with span("suggest", domain=domain or ALL_DOMAINS):
+        terms, titles = _registry.suggester(domain).suggest(prefix, limit)
     return {
-        "domain": "stack",
-        "stack": stack,
-        "query": query,
-        "file": STACK_CONFIG[stack]["file"],
-        "count": len(results),
-        "results": results
+        "prefix": prefix,
+        "domain": domain or ALL_DOMAINS,
+        "terms": terms,
+        "titles": titles
     }
@@ -11,14 +11,34 @@ Usage:
     # With persistence (Master + Overrides pattern)
     result = generate_design_system("SaaS dashboard", "My Project", persist=True)
     result = generate_design_system("SaaS dashboard", "My Project", persist=True, page="dashboard")
+    result = generate_design_system("SaaS dashboard", "My Project", persist=True, page="dashboard,settings,pricing")
+
+    # Bulk generation from a JSONL manifest on a process pool
+    python design_system.py --manifest projects.jsonl --workers 8
+    # each line: {"query": "...", "project_name": "...", "pages": ["checkout"], "output_dir": "..."}
 """
 
-import csv
+import copy
+import hashlib
 import json
+import multiprocessing
 import os
+import re
+import shutil
+import sys
+import threading
+import time
+from bisect import bisect_right
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from core import search, DATA_DIR
+from config import page_names
+from core import AhoCorasick, search, search_many, load_rows, span, warm, DATA_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes stay atomic, concurrent persists are just not serialised
+    fcntl = None
 
 
 # ============ CONFIGURATION ============
@@ -33,20 +53,132 @@ SEARCH_CONFIG = {
 }
 
 
+DEFAULT_REASONING = {
+    "pattern": "Hero + Features + CTA",
+    "style_priority": ["Minimalism", "Flat Design"],
+    "color_mood": "Professional",
+    "typography_mood": "Clean",
+    "key_effects": "Subtle hover transitions",
+    "anti_patterns": "",
+    "decision_rules": {},
+    "severity": "MEDIUM"
+}
+
+
+# ============ REASONING RULES ============
+class ReasoningRule:
+    """One ui-reasoning.csv row with its derived fields parsed once."""
+
+    __slots__ = ("row", "reasoning")
+
+    def __init__(self, row):
+        self.row = row
+        decision_rules = {}
+        try:
+            decision_rules = json.loads(row.get("Decision_Rules", "{}"))
+        except json.JSONDecodeError:
+            pass
+        self.reasoning = {
+            "pattern": row.get("Recommended_Pattern", ""),
+            "style_priority": [s.strip() for s in row.get("Style_Priority", "").split("+")],
+            "color_mood": row.get("Color_Mood", ""),
+            "typography_mood": row.get("Typography_Mood", ""),
+            "key_effects": row.get("Key_Effects", ""),
+            "anti_patterns": row.get("Anti_Patterns", ""),
+            "decision_rules": decision_rules,
+            "severity": row.get("Severity", "MEDIUM")
+        }
+
+
+class ReasoningMatcher:
+    """Category -> rule lookup compiled once per reasoning table.
+
+    Keeps the precedence of the original three linear scans (exact, then
+    partial, then keyword; first rule in file order within a tier):
+        exact    dict of lowercased UI_Category
+        partial  automaton over UI_Category ("ui_cat in category") plus one
+                 str.find over the joined categories ("category in ui_cat")
+        keyword  automaton over the words of each UI_Category
+    """
+
+    _SEPARATOR = "\x00"
+
+    def __init__(self, rows):
+        self.rules = [ReasoningRule(row) for row in rows]
+        ui_cats = [(rule.row.get("UI_Category", "") or "").lower() for rule in self.rules]
+
+        self._exact = {}
+        for i, ui_cat in enumerate(ui_cats):
+            self._exact.setdefault(ui_cat, i)
+
+        self._partial = AhoCorasick((ui_cat, i) for i, ui_cat in enumerate(ui_cats))
+        self._joined = self._SEPARATOR.join(ui_cats)
+        self._starts = []
+        position = 0
+        for ui_cat in ui_cats:
+            self._starts.append(position)
+            position += len(ui_cat) + len(self._SEPARATOR)
+
+        self._keywords = AhoCorasick(
+            (kw, i)
+            for i, ui_cat in enumerate(ui_cats)
+            for kw in ui_cat.replace("/", " ").replace("-", " ").split()
+        )
+        self._ui_cats = ui_cats
+
+    def _containing(self, category_lower):
+        """Index of the first UI_Category that contains category_lower, or None"""
+        if self._SEPARATOR in category_lower:
+            return next((i for i, ui_cat in enumerate(self._ui_cats) if category_lower in ui_cat), None)
+        position = self._joined.find(category_lower)
+        if position < 0:
+            return None
+        return bisect_right(self._starts, position) - 1
+
+    def find(self, category: str):
+        """Matching ReasoningRule for a category, or None"""
+        category_lower = category.lower()
+
+        index = self._exact.get(category_lower)
+        if index is None:
+            candidates = self._partial.values(category_lower)
+            containing = self._containing(category_lower)
+            if containing is not None:
+                candidates.add(containing)
+            if not candidates:
+                candidates = self._keywords.values(category_lower)
+            index = min(candidates) if candidates else None
+
+        return None if index is None else self.rules[index]
+
+
+# (rows, matcher) for the reasoning table loaded last; a reloaded table replaces it
+_matcher = (None, None)
+
+
+def _compiled_matcher(rows):
+    """ReasoningMatcher for a reasoning table, compiled once per loaded table"""
+    global _matcher
+    cached = _matcher
+    if cached[0] is not rows:
+        cached = _matcher = (rows, ReasoningMatcher(rows))
+    return cached[1]
+
+
 # ============ DESIGN SYSTEM GENERATOR ============
 class DesignSystemGenerator:
     """Generates design system recommendations from aggregated searches."""
 
     def __init__(self):
         self.reasoning_data = self._load_reasoning()
+        self.matcher = _compiled_matcher(self.reasoning_data)
 
     def _load_reasoning(self) -> list:
-        """Load reasoning rules from CSV."""
+        """Load reasoning rules from CSV (shared registry, parsed once per process)."""
         filepath = DATA_DIR / REASONING_FILE
         if not filepath.exists():
             return []
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return list(csv.DictReader(f))
+        return load_rows(filepath)
 
     def _multi_domain_search(self, query: str, style_priority: list = None) -> dict:
         """Execute searches across multiple domains."""
@@ -63,61 +195,14 @@ class DesignSystemGenerator:
 
     def _find_reasoning_rule(self, category: str) -> dict:
         """Find matching reasoning rule for a category."""
-        category_lower = category.lower()
-
-        # Try exact match first
-        for rule in self.reasoning_data:
-            if rule.get("UI_Category", "").lower() == category_lower:
-                return rule
-
-        # Try partial match
-        for rule in self.reasoning_data:
-            ui_cat = rule.get("UI_Category", "").lower()
-            if ui_cat in category_lower or category_lower in ui_cat:
-                return rule
-
-        # Try keyword match
-        for rule in self.reasoning_data:
-            ui_cat = rule.get("UI_Category", "").lower()
-            keywords = ui_cat.replace("/", " ").replace("-", " ").split()
-            if any(kw in category_lower for kw in keywords):
-                return rule
-
-        return {}
+        rule = self.matcher.find(category)
+        return rule.row if rule else {}
 
     def _apply_reasoning(self, category: str, search_results: dict) -> dict:
         """Apply reasoning rules to search results."""
-        rule = self._find_reasoning_rule(category)
-
-        if not rule:
-            return {
-                "pattern": "Hero + Features + CTA",
-                "style_priority": ["Minimalism", "Flat Design"],
-                "color_mood": "Professional",
-                "typography_mood": "Clean",
-                "key_effects": "Subtle hover transitions",
-                "anti_patterns": "",
-                "decision_rules": {},
-                "severity": "MEDIUM"
-            }
-
-        # Parse decision rules JSON
-        decision_rules = {}
-        try:
-            decision_rules = json.loads(rule.get("Decision_Rules", "{}"))
-        except json.JSONDecodeError:
-            pass
-
-        return {
-            "pattern": rule.get("Recommended_Pattern", ""),
-            "style_priority": [s.strip() for s in rule.get("Style_Priority", "").split("+")],
-            "color_mood": rule.get("Color_Mood", ""),
-            "typography_mood": rule.get("Typography_Mood", ""),
-            "key_effects": rule.get("Key_Effects", ""),
-            "anti_patterns": rule.get("Anti_Patterns", ""),
-            "decision_rules": decision_rules,
-            "severity": rule.get("Severity", "MEDIUM")
-        }
+        rule = self.matcher.find(category)
+        # Copies keep callers from mutating the shared compiled rules
+        return copy.deepcopy(rule.reasoning if rule else DEFAULT_REASONING)
 
     def _select_best_match(self, results: list, priority_keywords: list) -> dict:
         """Select best matching result based on priority keywords."""
@@ -469,73 +554,265 @@ def generate_design_system(query: str, project_name: str = None, output_format:
         project_name: Optional project name for output header
         output_format: "ascii" (default) or "markdown"
         persist: If True, save design system to design-system/ folder
-        page: Optional page name for page-specific override file
+        page: Optional page name(s) for page-specific override files (list or comma-separated)
         output_dir: Optional output directory (defaults to current working directory)
 
     Returns:
         Formatted design system string
     """
     generator = DesignSystemGenerator()
-    design_system = generator.generate(query, project_name)
+    with span("generate"):
+        design_system = generator.generate(query, project_name)
     
     # Persist to files if requested
     if persist:
-        persist_design_system(design_system, page, output_dir, query)
+        with span("persist"):
+            persist_design_system(design_system, page, output_dir, query)
 
     if output_format == "markdown":
-        return format_markdown(design_system)
-    return format_ascii_box(design_system)
+        with span("format_markdown"):
+            return format_markdown(design_system)
+    with span("format_ascii_box"):
+        return format_ascii_box(design_system)
+
+
+# ============ MANIFEST MODE ============
+_manifest_generator = None
+
+
+def _read_manifest(lines):
+    """Parse manifest JSONL into entries; malformed lines become error entries"""
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {"line": line_no, "error": f"Invalid JSON line: {e}"}
+            continue
+        if not isinstance(entry, dict) or not isinstance(entry.get("query"), str):
+            yield {"line": line_no, "error": "Manifest line needs a string 'query'"}
+            continue
+        pages = entry.get("pages")
+        if pages is not None and not isinstance(pages, str) and not (
+                isinstance(pages, list) and all(isinstance(name, str) for name in pages)):
+            yield {"line": line_no, "error": "Manifest 'pages' must be a string or list of strings"}
+            continue
+        bad = [field for field in ("project_name", "output_dir") if not isinstance(entry.get(field), (str, type(None)))]
+        if bad:
+            yield {"line": line_no, "error": f"Manifest '{bad[0]}' must be a string"}
+            continue
+        pages = page_names(pages)
+        yield {
+            "line": line_no,
+            "query": entry["query"],
+            "project_name": entry.get("project_name"),
+            "pages": pages,
+            "output_dir": entry.get("output_dir"),
+        }
+
+
+def _prepare_manifest_worker():
+    """Warm every index and the reasoning rules (before fork, or per spawned worker)"""
+    global _manifest_generator
+    if _manifest_generator is None:
+        warm()
+        _manifest_generator = DesignSystemGenerator()
+
+
+def _run_manifest_entry(entry):
+    """Generate and persist one manifest entry; never raises"""
+    report = {"line": entry["line"], "query": entry.get("query"), "project_name": entry.get("project_name")}
+    if "error" in entry:
+        return dict(report, status="error", error=entry["error"], files=[], seconds=0.0)
+
+    start = time.perf_counter()
+    try:
+        _prepare_manifest_worker()
+        design_system = _manifest_generator.generate(entry["query"], entry["project_name"])
+        result = persist_design_system(design_system, entry["pages"], entry["output_dir"], entry["query"])
+        report.update(status="success", project_name=design_system["project_name"],
+                      design_system_dir=result["design_system_dir"], files=result["created_files"],
+                      written=result["written"])
+    except Exception as e:  # one bad entry must not abort the whole run
+        report.update(status="error", error=f"{type(e).__name__}: {e}", files=[])
+    report["seconds"] = round(time.perf_counter() - start, 4)
+    return report
+
+
+def run_manifest(manifest_path: str, workers: int = None, report_path: str = None, progress=None) -> dict:
+    """
+    Generate and persist a design system for every manifest entry.
+
+    Indexes are warmed once in the parent and inherited by forked workers.
+    Returns the summary report (entries in manifest order), which is also
+    written as JSON to report_path (default: <manifest>.report.json).
+    """
+    progress = progress or sys.stderr
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        entries = list(_read_manifest(f))
+    workers = max(1, min(workers or os.cpu_count() or 1, len(entries) or 1))
+
+    start = time.perf_counter()
+    _prepare_manifest_worker()
+
+    def results():
+        if workers == 1:
+            yield from map(_run_manifest_entry, entries)
+            return
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        with context.Pool(workers, initializer=_prepare_manifest_worker) as pool:
+            yield from pool.imap_unordered(_run_manifest_entry, entries, chunksize=max(1, len(entries) // (workers * 8)))
+
+    reports = []
+    for done, report in enumerate(results(), 1):
+        reports.append(report)
+        label = report.get("project_name") or report.get("query") or f"line {report['line']}"
+        detail = f"{report['seconds']:.2f}s" if report["status"] == "success" else report["error"]
+        progress.write(f"[{done}/{len(entries)}] {label}: {report['status']} ({detail})\n")
+        progress.flush()
+
+    reports.sort(key=lambda r: r["line"])
+    summary = {
+        "manifest": str(manifest_path),
+        "workers": workers,
+        "total": len(reports),
+        "succeeded": sum(1 for r in reports if r["status"] == "success"),
+        "failed": sum(1 for r in reports if r["status"] != "success"),
+        "seconds": round(time.perf_counter() - start, 3),
+        "entries": reports,
+    }
+    report_path = Path(report_path) if report_path else Path(f"{manifest_path}.report.json")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    summary["report"] = str(report_path)
+    return summary
 
 
 # ============ PERSISTENCE FUNCTIONS ============
-def persist_design_system(design_system: dict, page: str = None, output_dir: str = None, page_query: str = None) -> dict:
+# Lines that change on every run and are ignored when deciding whether a file changed
+_VOLATILE_LINES = re.compile(r'^.*\*\*Generated:\*\*.*\n?', re.MULTILINE)
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha256(_VOLATILE_LINES.sub("", text).encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def _directory_lock(directory: Path):
+    """Advisory exclusive lock on a directory, held for the with-block (no-op without flock)"""
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # releases the lock
+
+
+def _write_if_changed(path: Path, content: str) -> str:
+    """
+    Atomically replace path with content unless it already holds the same content.
+
+    Returns "unchanged" (byte-identical), "skipped" (differs only in its
+    Generated timestamp) or "written".
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            current = f.read()
+    except (FileNotFoundError, UnicodeDecodeError):
+        current = None
+    if current is not None:
+        if current == content:
+            return "unchanged"
+        if _content_hash(current) == _content_hash(content):
+            return "skipped"
+
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, 'x', encoding='utf-8') as f:
+            f.write(content)
+        # The replacement is a new inode: keep the permissions of the file it replaces
+        try:
+            shutil.copymode(path, tmp)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return "written"
+
+
+def _path_slug(name: str) -> str:
+    """File-name slug of a project or page name; ValueError when it could leave its directory"""
+    slug = name.lower().replace(' ', '-')
+    if not slug.strip(".") or "/" in slug or "\\" in slug or ".." in slug or "\0" in slug:
+        raise ValueError(f"Name cannot be used as a file name: {name!r}")
+    return slug
+
+
+def persist_design_system(design_system: dict, page=None, output_dir: str = None, page_query: str = None) -> dict:
     """
     Persist design system to design-system/<project>/ folder using Master + Overrides pattern.
     
     Args:
         design_system: The generated design system dictionary
-        page: Optional page name for page-specific override file
+        page: Optional page name, list of names or comma-separated names for
+            page-specific override files; all pages share one batched search pass
         output_dir: Optional output directory (defaults to current working directory)
         page_query: Optional query string for intelligent page override generation
     
+    Files whose content is unchanged apart from the Generated timestamp are
+    left untouched; changed files are replaced atomically. Concurrent persists
+    of the same project are serialised by an advisory lock on its directory.
+    Project and page names containing path separators or ".." raise ValueError
+    before anything is written.
+
     Returns:
-        dict with created file paths and status
+        dict with status, created_files (every target file) and the same paths
+        split into written, skipped (only the timestamp differed) and unchanged
     """
     base_dir = Path(output_dir) if output_dir else Path.cwd()
     
     # Use project name for project-specific folder
     project_name = design_system.get("project_name", "default")
-    project_slug = project_name.lower().replace(' ', '-')
+    project_slug = _path_slug(project_name)
+    pages = page_names(page)
+    page_slugs = [_path_slug(name) for name in pages]
     
     design_system_dir = base_dir / "design-system" / project_slug
     pages_dir = design_system_dir / "pages"
     
     created_files = []
+    outcomes = {"written": [], "skipped": [], "unchanged": []}
     
     # Create directories
     design_system_dir.mkdir(parents=True, exist_ok=True)
     pages_dir.mkdir(parents=True, exist_ok=True)
     
     master_file = design_system_dir / "MASTER.md"
+    targets = [(master_file, format_master_md(design_system))]
     
-    # Generate and write MASTER.md
-    master_content = format_master_md(design_system)
-    with open(master_file, 'w', encoding='utf-8') as f:
-        f.write(master_content)
-    created_files.append(str(master_file))
+    # If pages are specified, create page override files with intelligent content
+    for name, slug, page_overrides in zip(pages, page_slugs, _generate_page_overrides(pages, page_query, design_system)):
+        page_file = pages_dir / f"{slug}.md"
+        targets.append((page_file, format_page_override_md(design_system, name, page_query, page_overrides)))
     
-    # If page is specified, create page override file with intelligent content
-    if page:
-        page_file = pages_dir / f"{page.lower().replace(' ', '-')}.md"
-        page_content = format_page_override_md(design_system, page, page_query)
-        with open(page_file, 'w', encoding='utf-8') as f:
-            f.write(page_content)
-        created_files.append(str(page_file))
+    with _directory_lock(design_system_dir):
+        for path, content in targets:
+            outcomes[_write_if_changed(path, content)].append(str(path))
+            created_files.append(str(path))
     
     return {
         "status": "success",
         "design_system_dir": str(design_system_dir),
-        "created_files": created_files
+        "created_files": created_files,
+        **outcomes
     }
 
 
@@ -802,14 +1079,16 @@ def format_master_md(design_system: dict) -> str:
     return "\n".join(lines)
 
 
-def format_page_override_md(design_system: dict, page_name: str, page_query: str = None) -> str:
+def format_page_override_md(design_system: dict, page_name: str, page_query: str = None,
+                            page_overrides: dict = None) -> str:
     """Format a page-specific override file with intelligent AI-generated content."""
     project = design_system.get("project_name", "PROJECT")
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     page_title = page_name.replace("-", " ").replace("_", " ").title()
     
-    # Detect page type and generate intelligent overrides
-    page_overrides = _generate_intelligent_overrides(page_name, page_query, design_system)
+    # Detect page type and generate intelligent overrides (unless precomputed in a batch)
+    if page_overrides is None:
+        page_overrides = _generate_intelligent_overrides(page_name, page_query, design_system)
     
     lines = []
     
@@ -918,22 +1197,31 @@ def _generate_intelligent_overrides(page_name: str, page_query: str, design_syst
     Uses the existing search infrastructure to find relevant style, UX, and layout
     data instead of hardcoded page types.
     """
-    from core import search
-    
-    page_lower = page_name.lower()
+    return _generate_page_overrides([page_name], page_query, design_system)[0]
+
+
+# Per-domain result counts for page override searches
+PAGE_SEARCHES = (("style", 1), ("ux", 3), ("landing", 1))
+
+
+def _generate_page_overrides(pages: list, page_query: str, design_system: dict) -> list:
+    """Overrides for several pages, scoring every page context in one batched pass per domain"""
     query_lower = (page_query or "").lower()
-    combined_context = f"{page_lower} {query_lower}"
-    
-    # Search across multiple domains for page-specific guidance
-    style_search = search(combined_context, "style", max_results=1)
-    ux_search = search(combined_context, "ux", max_results=3)
-    landing_search = search(combined_context, "landing", max_results=1)
-    
-    # Extract results from search response
-    style_results = style_search.get("results", [])
-    ux_results = ux_search.get("results", [])
-    landing_results = landing_search.get("results", [])
+    contexts = [f"{name.lower()} {query_lower}" for name in pages]
+    if not contexts:
+        return []
     
+    # One search_many per domain: each index is opened once for all pages
+    per_domain = [search_many(contexts, domain, max_results=n) for domain, n in PAGE_SEARCHES]
+    return [
+        _overrides_from_results(context, *(responses[i].get("results", []) for responses in per_domain))
+        for i, context in enumerate(contexts)
+    ]
+
+
+def _overrides_from_results(combined_context: str, style_results: list, ux_results: list,
+                            landing_results: list) -> dict:
+    """Build a page's overrides from its style, UX and landing search results"""
     # Detect page type from search results or context
     page_type = _detect_page_type(combined_context, style_results)
     
@@ -1057,11 +1345,24 @@ if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Generate Design System")
-    parser.add_argument("query", help="Search query (e.g., 'SaaS dashboard')")
+    parser.add_argument("query", nargs="?", help="Search query (e.g., 'SaaS dashboard')")
     parser.add_argument("--project-name", "-p", type=str, default=None, help="Project name")
     parser.add_argument("--format", "-f", choices=["ascii", "markdown"], default="ascii", help="Output format")
+    # Bulk generation
+    parser.add_argument("--manifest", type=str, default=None, help="JSONL manifest: query, project_name, pages, output_dir per line")
+    parser.add_argument("--workers", "-w", type=int, default=None, help="Worker processes for --manifest (default: CPU count)")
+    parser.add_argument("--report", type=str, default=None, help="Summary report path (default: <manifest>.report.json)")
 
     args = parser.parse_args()
 
+    if args.manifest:
+        summary = run_manifest(args.manifest, args.workers, args.report)
+        print(f"{summary['succeeded']}/{summary['total']} design systems generated "
+              f"({summary['failed']} failed) in {summary['seconds']}s with {summary['workers']} workers")
+        print(f"Report: {summary['report']}")
+        sys.exit(1 if summary["failed"] else 0)
+    if args.query is None:
+        parser.error("the following arguments are required: query (or --manifest)")
+
     result = generate_design_system(args.query, args.project_name, args.format)
     print(result)
@@ -3,22 +3,74 @@
 """
 UI/UX Pro Max Search - BM25 search engine for UI/UX style guides
 Usage: python search.py "<query>" [--domain <domain>] [--stack <stack>] [--max-results 3]
+       python search.py --batch [queries.txt|queries.jsonl|-] [--domain <domain>] [--stack <stack>]
+       python search.py "<prefix>" --suggest [N] [--domain <domain>]
        python search.py "<query>" --design-system [-p "Project Name"]
        python search.py "<query>" --design-system --persist [-p "Project Name"] [--page "dashboard"]
 
 Domains: style, prompt, color, chart, landing, product, ux, typography
-Stacks: html-tailwind, react, nextjs
+         or "all": every domain at once, merged into one top-k labelled by domain
+         (scores calibrated per domain with --fusion zscore (default) or rrf)
+Stacks: html-tailwind, react, nextjs, ... - or "all", or a comma-separated list
+        (e.g. --stack react,nextjs,vue) to rank every listed stack in one combined
+        index; each row is tagged with its stack and per-stack match counts are reported
+
+Filters:
+  --where COL=VALUE  Only rank rows whose COL equals VALUE (case-insensitive), e.g.
+                     --where Severity=HIGH --where Platform=Mobile. Repeat a column
+                     to allow several values; different columns must all match
+
+Typos:
+  --fuzzy      Tolerate misspellings: query words missing from the index match the
+               closest indexed words (1-2 edits, e.g. "glasmorphism"), weighted lower
+
+Autocomplete:
+  --suggest [N]  Complete a partial query (default 10 per list): indexed words
+                 completing its last word, most frequent first, and row titles
+                 (styles, products, font pairings, icons) with a word starting
+                 with it. Scoped to --domain when given
 
 Persistence (Master + Overrides pattern):
   --persist    Save design system to design-system/MASTER.md
-  --page       Also create a page-specific override file in design-system/pages/
+  --page       Also create page-specific override files in design-system/pages/
+               (comma-separated for several pages, e.g. dashboard,settings,pricing)
+
+Server mode:
+  --serve      Run a daemon that keeps every index resident (see server.py)
+  --address    Daemon address, host:port or unix:/path. Searches are forwarded only when
+               this or $UIPRO_SERVER is set (--serve defaults to 127.0.0.1:8765)
+  --no-daemon  Always run in-process, even when a daemon is configured
+  --shards N   Score on N worker processes (scatter-gather; same results). With
+               --serve, shard workers start once and serve every request
+
+Streaming:
+  --ndjson     Run in-process and stream NDJSON: a header line (domain, query, file,
+               count), then one line per result row as it is built, with values
+               truncated to 300 characters as in the text output
+
+Profiling:
+  --profile    Run in-process and print a JSON trace of per-stage timings
+               (csv_load, fit, tokenize, score, top_k, materialise, rendering) to stderr
+
+Batch mode:
+  --batch      Read queries from a file or stdin (one per line, or JSONL objects with
+               "query" and optional "domain", "stack", "max_results", "where", "fuzzy") and stream one
+               NDJSON result per query, in input order
+
+Result cache:
+  Repeated queries are answered from an in-memory LRU. Set UIPRO_CACHE_DB to a
+  SQLite file path to share cached results between separate invocations.
 """
 
 import argparse
+import json
+import os
 import sys
 import io
-from core import CSV_CONFIG, AVAILABLE_STACKS, MAX_RESULTS, search, search_stack
-from design_system import generate_design_system, persist_design_system
+from contextlib import nullcontext
+# Only stdlib-light modules at import time: a daemon-forwarded call never loads the engine
+from client import call
+from config import CSV_CONFIG, AVAILABLE_STACKS, MAX_RESULTS, ALL_DOMAINS, FUSION_METHODS, SUGGEST_LIMIT, field_error, page_names
 
 # Force UTF-8 for stdout/stderr to handle emojis on Windows (cp1252 default)
 if sys.stdout.encoding and sys.stdout.encoding.lower() != 'utf-8':
@@ -27,88 +79,301 @@ if sys.stderr.encoding and sys.stderr.encoding.lower() != 'utf-8':
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
 
-def format_output(result):
-    """Format results for Claude consumption (token-optimized)"""
+# Longest value shown per field before it is cut with "..."
+MAX_VALUE_CHARS = 300
+
+
+def _truncate(value):
+    value_str = str(value)
+    if len(value_str) > MAX_VALUE_CHARS:
+        value_str = value_str[:MAX_VALUE_CHARS] + "..."
+    return value_str
+
+
+def iter_output_lines(result):
+    """Lines of format_output, produced row by row (works with stream=True results)"""
     if "error" in result:
-        return f"Error: {result['error']}"
+        yield f"Error: {result['error']}"
+        return
 
-    output = []
     if result.get("stack"):
-        output.append(f"## UI Pro Max Stack Guidelines")
-        output.append(f"**Stack:** {result['stack']} | **Query:** {result['query']}")
+        yield f"## UI Pro Max Stack Guidelines"
+        yield f"**Stack:** {result['stack']} | **Query:** {result['query']}"
+    else:
+        yield f"## UI Pro Max Search Results"
+        yield f"**Domain:** {result['domain']} | **Query:** {result['query']}"
+    counts_key = "stack_counts" if "stack_counts" in result else "domain_counts"
+    if counts_key in result:
+        yield f"**Source:** {result['file']}"
+        matched = sorted((item for item in result[counts_key].items() if item[1]), key=lambda item: -item[1])
+        label = "stack" if counts_key == "stack_counts" else "domain"
+        yield f"**Matches per {label}:** {', '.join(f'{name} {n}' for name, n in matched) or 'none'}"
+        yield f"**Found:** {result['count']} results\n"
     else:
-        output.append(f"## UI Pro Max Search Results")
-        output.append(f"**Domain:** {result['domain']} | **Query:** {result['query']}")
-    output.append(f"**Source:** {result['file']} | **Found:** {result['count']} results\n")
+        yield f"**Source:** {result['file']} | **Found:** {result['count']} results\n"
 
     for i, row in enumerate(result['results'], 1):
-        output.append(f"### Result {i}")
+        yield f"### Result {i}"
         for key, value in row.items():
-            value_str = str(value)
-            if len(value_str) > 300:
-                value_str = value_str[:300] + "..."
-            output.append(f"- **{key}:** {value_str}")
-        output.append("")
+            yield f"- **{key}:** {_truncate(value)}"
+        yield ""
 
-    return "\n".join(output)
 
+def _span(name):
+    """core.span when the engine runs in this process; a forwarded result has nothing to time"""
+    core = sys.modules.get("core")
+    return core.span(name) if core is not None else nullcontext()
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="UI Pro Max Search")
-    parser.add_argument("query", help="Search query")
-    parser.add_argument("--domain", "-d", choices=list(CSV_CONFIG.keys()), help="Search domain")
-    parser.add_argument("--stack", "-s", choices=AVAILABLE_STACKS, help="Stack-specific search (html-tailwind, react, nextjs)")
-    parser.add_argument("--max-results", "-n", type=int, default=MAX_RESULTS, help="Max results (default: 3)")
-    parser.add_argument("--json", action="store_true", help="Output as JSON")
-    # Design system generation
-    parser.add_argument("--design-system", "-ds", action="store_true", help="Generate complete design system recommendation")
-    parser.add_argument("--project-name", "-p", type=str, default=None, help="Project name for design system output")
-    parser.add_argument("--format", "-f", choices=["ascii", "markdown"], default="ascii", help="Output format for design system")
-    # Persistence (Master + Overrides pattern)
-    parser.add_argument("--persist", action="store_true", help="Save design system to design-system/MASTER.md (creates hierarchical structure)")
-    parser.add_argument("--page", type=str, default=None, help="Create page-specific override file in design-system/pages/")
-    parser.add_argument("--output-dir", "-o", type=str, default=None, help="Output directory for persisted files (default: current directory)")
 
-    args = parser.parse_args()
+def format_output(result):
+    """Format results for Claude consumption (token-optimized)"""
+    return "\n".join(iter_output_lines(result))
+
+
+def format_suggestions(result):
+    """Format suggest() output: one line of terms, then one line per title"""
+    if "error" in result:
+        return f"Error: {result['error']}"
+    terms = ", ".join(f"{t['term']} ({t['doc_freq']})" for t in result["terms"])
+    lines = [
+        "## UI Pro Max Suggestions",
+        f"**Prefix:** {result['prefix']} | **Domain:** {result['domain']}",
+        f"**Terms:** {terms or 'none'}",
+        "**Titles:**" if result["titles"] else "**Titles:** none",
+    ]
+    lines += [f"- {t['title']} ({t['domain']} / {t['column']}, {t['mentions']} mentions)" for t in result["titles"]]
+    return "\n".join(lines)
+
+
+def write_ndjson(result, out=None):
+    """Stream a (stream=True) result as NDJSON: header line, then one truncated row per line"""
+    out = out or sys.stdout
+    if "error" in result:
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        return
+    header = {key: value for key, value in result.items() if key != "results"}
+    out.write(json.dumps(header, ensure_ascii=False) + "\n")
+    out.flush()
+    for row in result["results"]:
+        out.write(json.dumps({key: _truncate(value) for key, value in row.items()}, ensure_ascii=False) + "\n")
+        out.flush()
+
+
+# ============ BATCH MODE ============
+BATCH_CHUNK_SIZE = 1000
+
+
+def _read_batch(lines, domain, stack, max_results, where=None, fuzzy=False):
+    """Parse batch input lines into request dicts (plain query or JSONL object)
 
+    A line that cannot be answered becomes an {"error": ...} in its place,
+    so one bad line never aborts the rest of the batch.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {"error": f"Invalid JSON line: {e}"}
+                continue
+            error = field_error(request, required=("query",))
+            if error:
+                yield {"error": f"JSON line {error}"}
+                continue
+            # A null field falls back to the command-line default
+            request = {key: value for key, value in request.items() if value is not None}
+        else:
+            request = {"query": line}
+        request.setdefault("domain", domain)
+        request.setdefault("stack", stack)
+        request.setdefault("max_results", max_results)
+        request.setdefault("where", where)
+        request.setdefault("fuzzy", fuzzy)
+        yield request
+
+
+def _run_batch_chunk(requests, shards=None):
+    """Answer a chunk of requests, grouping by target so each index is opened once"""
+    from core import FilterError, search_many, search_stack_many, where_conditions
+
+    responses = [None] * len(requests)
+    groups = {}
+    for pos, request in enumerate(requests):
+        if "error" in request:
+            responses[pos] = request
+            continue
+        try:
+            conditions = where_conditions(request["where"])
+        except FilterError as e:
+            responses[pos] = {"error": str(e)}
+            continue
+        stack = request["stack"]
+        if isinstance(stack, list):
+            stack = ",".join(stack)
+        key = (stack, request["domain"], request["max_results"], conditions, bool(request["fuzzy"]))
+        groups.setdefault(key, []).append(pos)
+
+    for (stack, domain, max_results, conditions, fuzzy), positions in groups.items():
+        queries = [requests[pos]["query"] for pos in positions]
+        if stack:
+            results = search_stack_many(queries, stack, max_results, shards, conditions, fuzzy)
+        else:
+            results = search_many(queries, domain, max_results, shards, conditions, fuzzy)
+        for pos, result in zip(positions, results):
+            responses[pos] = result
+    return responses
+
+
+def run_batch(lines, domain=None, stack=None, max_results=MAX_RESULTS, out=None, shards=None, where=None, fuzzy=False):
+    """Stream NDJSON results for batch input, one line per query in input order"""
+    out = out or sys.stdout
+    chunk = []
+    for request in _read_batch(lines, domain, stack, max_results, where, fuzzy):
+        chunk.append(request)
+        if len(chunk) >= BATCH_CHUNK_SIZE:
+            for result in _run_batch_chunk(chunk, shards):
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            chunk = []
+    for result in _run_batch_chunk(chunk, shards):
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+    out.flush()
+
+
+def _request(args):
+    """(method, params) for a command the daemon can answer, or None (serve, batch, ndjson)"""
+    if args.serve or args.batch is not None or args.ndjson:
+        return None
+    # Autocomplete: the query is a prefix being typed
+    if args.suggest is not None:
+        domain = args.domain if args.domain != ALL_DOMAINS else None
+        return "suggest", {"prefix": args.query, "domain": domain, "limit": args.suggest}
     # Design system takes priority
     if args.design_system:
-        result = generate_design_system(
-            args.query, 
-            args.project_name, 
-            args.format,
-            persist=args.persist,
-            page=args.page,
-            output_dir=args.output_dir
-        )
-        print(result)
-        
+        return "generate_design_system", {
+            "query": args.query,
+            "project_name": args.project_name,
+            "output_format": args.format,
+            "persist": args.persist,
+            "page": args.page,
+            # The daemon has its own cwd, so always send an absolute directory
+            "output_dir": os.path.abspath(args.output_dir or os.getcwd())
+        }
+    # Stack search
+    if args.stack:
+        return "search_stack", {"query": args.query, "stack": args.stack, "max_results": args.max_results, "shards": args.shards, "where": args.where, "fuzzy": args.fuzzy}
+    # Domain search
+    return "search", {"query": args.query, "domain": args.domain, "max_results": args.max_results, "shards": args.shards, "where": args.where, "fusion": args.fusion, "fuzzy": args.fuzzy}
+
+
+def _print_result(args, method, result):
+    """Print a daemon or in-process answer the way the command asked for"""
+    if method == "generate_design_system":
+        print(result["output"])
+
         # Print persistence confirmation
         if args.persist:
             project_slug = args.project_name.lower().replace(' ', '-') if args.project_name else "default"
             print("\n" + "=" * 60)
             print(f"✅ Design system persisted to design-system/{project_slug}/")
             print(f"   📄 design-system/{project_slug}/MASTER.md (Global Source of Truth)")
-            if args.page:
-                page_filename = args.page.lower().replace(' ', '-')
+            for page in page_names(args.page):
+                page_filename = page.lower().replace(' ', '-')
                 print(f"   📄 design-system/{project_slug}/pages/{page_filename}.md (Page Overrides)")
             print("")
             print(f"📖 Usage: When building a page, check design-system/{project_slug}/pages/[page].md first.")
             print(f"   If exists, its rules override MASTER.md. Otherwise, use MASTER.md.")
             print("=" * 60)
-    # Stack search
-    elif args.stack:
-        result = search_stack(args.query, args.stack, args.max_results)
-        if args.json:
-            import json
-            print(json.dumps(result, indent=2, ensure_ascii=False))
-        else:
-            print(format_output(result))
-    # Domain search
+    elif args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    elif method == "suggest":
+        print(format_suggestions(result))
     else:
-        result = search(args.query, args.domain, args.max_results)
-        if args.json:
-            import json
-            print(json.dumps(result, indent=2, ensure_ascii=False))
-        else:
-            print(format_output(result))
+        with _span("format_output"):
+            text = format_output(result)
+        print(text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="UI Pro Max Search")
+    parser.add_argument("query", nargs="?", help="Search query")
+    parser.add_argument("--domain", "-d", choices=list(CSV_CONFIG.keys()) + [ALL_DOMAINS], help="Search domain (all = every domain, merged)")
+    parser.add_argument("--fusion", choices=FUSION_METHODS, default="zscore", help="Score calibration for --domain all (default: zscore)")
+    parser.add_argument("--stack", "-s", help=f"Stack-specific search: {', '.join(AVAILABLE_STACKS)}, all, or a comma-separated list")
+    parser.add_argument("--max-results", "-n", type=int, default=MAX_RESULTS, help="Max results (default: 3)")
+    parser.add_argument("--where", action="append", default=None, metavar="COL=VALUE", help="Only rank rows where COL equals VALUE (repeatable)")
+    parser.add_argument("--fuzzy", action="store_true", help="Match misspelled query words to the closest indexed words")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+    parser.add_argument("--ndjson", action="store_true", help="Stream a header line and one JSON line per result row")
+    parser.add_argument("--suggest", nargs="?", type=int, const=SUGGEST_LIMIT, default=None, metavar="N", help="Autocomplete the query as a prefix (N completions per list, default 10)")
+    # Design system generation
+    parser.add_argument("--design-system", "-ds", action="store_true", help="Generate complete design system recommendation")
+    parser.add_argument("--project-name", "-p", type=str, default=None, help="Project name for design system output")
+    parser.add_argument("--format", "-f", choices=["ascii", "markdown"], default="ascii", help="Output format for design system")
+    # Persistence (Master + Overrides pattern)
+    parser.add_argument("--persist", action="store_true", help="Save design system to design-system/MASTER.md (creates hierarchical structure)")
+    parser.add_argument("--page", type=str, default=None, help="Create page-specific override files in design-system/pages/ (comma-separated list)")
+    parser.add_argument("--output-dir", "-o", type=str, default=None, help="Output directory for persisted files (default: current directory)")
+    # Batch mode
+    parser.add_argument("--batch", nargs="?", const="-", default=None, metavar="FILE", help="Read queries from FILE or stdin (-), one per line or JSONL; stream NDJSON results")
+    # Server mode
+    parser.add_argument("--serve", action="store_true", help="Run a search daemon with all indexes resident")
+    parser.add_argument("--address", type=str, default=None, help="Daemon address: host:port or unix:/path (forwarding is off unless this or $UIPRO_SERVER is set)")
+    parser.add_argument("--no-daemon", action="store_true", help="Do not forward to a configured daemon")
+    parser.add_argument("--shards", type=int, default=None, help="Split each corpus across N scoring worker processes")
+    # Instrumentation
+    parser.add_argument("--profile", action="store_true", help="Run in-process and print a JSON per-stage timing trace to stderr")
+
+    args = parser.parse_args()
+
+    if args.query is None and args.batch is None and not args.serve:
+        parser.error("the following arguments are required: query")
+
+    # A profile must time this process, not a daemon round trip
+    use_daemon = not args.no_daemon and not args.profile
+    request = _request(args)
+    # Forward first: a daemon's answer needs no engine imports in this process
+    result = call(*request, args.address) if request is not None and use_daemon else None
+
+    if result is not None:
+        _print_result(args, request[0], result)
+    else:
+        from core import profile, search, search_stack, span
+        from server import handle, serve
+
+        with (profile() if args.profile else nullcontext()) as trace:
+            # Server mode: keep indexes warm for many short-lived clients
+            if args.serve:
+                serve(args.address, args.shards)
+            # Batch mode: one process for many queries
+            elif args.batch is not None:
+                if args.batch == "-":
+                    run_batch(sys.stdin, args.domain, args.stack, args.max_results, shards=args.shards, where=args.where,
+                              fuzzy=args.fuzzy)
+                else:
+                    with open(args.batch, 'r', encoding='utf-8') as f:
+                        run_batch(f, args.domain, args.stack, args.max_results, shards=args.shards, where=args.where,
+                                  fuzzy=args.fuzzy)
+            # Streaming search: rows are built and written one at a time
+            elif args.ndjson:
+                if args.stack:
+                    result = search_stack(args.query, args.stack, args.max_results, args.shards, stream=True,
+                                          where=args.where, fuzzy=args.fuzzy)
+                else:
+                    result = search(args.query, args.domain, args.max_results, args.shards, stream=True, where=args.where,
+                                    fusion=args.fusion, fuzzy=args.fuzzy)
+                with span("format_output"):
+                    write_ndjson(result)
+            # Suggest, design system, stack or domain search, answered in-process
+            else:
+                try:
+                    result = handle(*request)
+                except ValueError as e:  # e.g. a project name that is not a safe directory name
+                    sys.exit(f"Error: {e}")
+                _print_result(args, request[0], result)
+
+        if args.profile:
+            sys.stderr.write(json.dumps(trace.to_dict(), indent=2, ensure_ascii=False) + "\n")
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Search Server - long-lived daemon that keeps every domain, stack and
+reasoning index resident and answers search requests over local HTTP.
+
+Usage:
+    python search.py --serve                           # 127.0.0.1:8765
+    python search.py --serve --address unix:/tmp/uipro.sock
+    UIPRO_SERVER=127.0.0.1:8765 python search.py "fintech"   # client uses that daemon
+
+Protocol: POST /<method> with Content-Type application/json and a JSON
+object of parameters, reply is JSON. Over TCP every POST must carry
+X-UIPro-Nonce and X-UIPro-Auth (HMAC of the nonce with the token the daemon
+writes to ~/.cache/uipro/server-<host>-<port>.token); replies carry
+X-UIPro-Proof so the client can tell the daemon from any other listener.
+The unix socket is created owner-only and needs no token. "persist" is
+served only over the unix socket and only into directories under
+$UIPRO_PERSIST_ROOT (default: the home directory); other persist requests
+get a 403 and search.py writes the files in-process instead.
+    search                  {"query", "domain", "max_results", "shards", "where", "fusion", "fuzzy"}
+                            -> same dict as search.py --json
+    search_stack            {"query", "stack", "max_results", "shards", "where", "fuzzy"}
+                            -> same dict as search.py --stack --json
+    suggest                 {"prefix", "domain", "limit"}       -> same dict as search.py --suggest --json
+    generate_design_system  {"query", "project_name", "output_format", "persist", "page", "output_dir"}
+                            -> {"output": <formatted design system>}
+    cache_stats             {}                                   -> result cache hit/miss/eviction counters
+    GET /health             -> {"status": "ok"}
+
+search.py forwards to a running daemon and falls back to in-process
+execution when none is reachable. With --shards N the daemon starts N shard
+worker processes per corpus and for the combined "all"-stack index at
+startup, and uses them for every request. Shard workers are forked, which is
+unsafe from a handler thread, so nothing is forked after startup: a request
+naming a different count gets a 400 (search.py then runs it in-process), and
+other multi-stack selections are scored unsharded. Typo-tolerance indexes for
+"fuzzy" requests and the autocomplete tries are built at startup too.
+"""
+
+import hmac
+import json
+import os
+import secrets
+import signal
+import socketserver
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from client import (AUTH_HEADER, DEFAULT_ADDRESS, NONCE_HEADER, PROOF_HEADER, SERVER_ENV, TOKEN_DIR, _parse_address,
+                    _sign, _token_path, call)
+from config import field_error
+from core import MAX_RESULTS, SUGGEST_LIMIT, cache_stats, pin_shards, search, search_stack, suggest, warm
+from design_system import DesignSystemGenerator, generate_design_system
+
+
+# ============ REQUEST HANDLING ============
+# Pending connections each listening socket queues (socketserver's default of 5 overflows
+# under a handful of concurrent clients, which then fall back to slow in-process runs)
+REQUEST_QUEUE_SIZE = 128
+# persist requests may only write below this directory (default: the home directory)
+PERSIST_ROOT_ENV = "UIPRO_PERSIST_ROOT"
+
+# Set by serve(): the shard count of every request, fixed once the workers are forked
+_serving = False
+_default_shards = None
+
+
+def _shards(params):
+    """Shard count for a request; in the daemon a count other than the startup one is a ValueError (400)"""
+    requested = params.get("shards")
+    if not _serving:
+        return requested
+    # A request without a count gets the startup one; 1 and None both mean unsharded
+    if requested and requested != (_default_shards or 1):
+        raise ValueError(f"shards is fixed at {_default_shards or 1} by the server's --shards")
+    return _default_shards
+
+
+METHODS = {
+    "search": lambda p: search(p["query"], p.get("domain"), p.get("max_results", MAX_RESULTS),
+                               _shards(p), where=p.get("where"),
+                               fusion=p.get("fusion", "zscore"), fuzzy=p.get("fuzzy", False)),
+    "search_stack": lambda p: search_stack(p["query"], p["stack"], p.get("max_results", MAX_RESULTS),
+                                           _shards(p), where=p.get("where"),
+                                           fuzzy=p.get("fuzzy", False)),
+    "generate_design_system": lambda p: {"output": generate_design_system(
+        p["query"],
+        p.get("project_name"),
+        p.get("output_format", "ascii"),
+        persist=p.get("persist", False),
+        page=p.get("page"),
+        output_dir=p.get("output_dir"),
+    )},
+    "suggest": lambda p: suggest(p["prefix"], p.get("domain"), p.get("limit", SUGGEST_LIMIT)),
+    "cache_stats": lambda p: cache_stats(),
+}
+
+
+# Parameters each method cannot do without (types of all fields: config.REQUEST_FIELDS)
+REQUIRED_PARAMS = {
+    "search": ("query",),
+    "search_stack": ("query", "stack"),
+    "suggest": ("prefix",),
+    "generate_design_system": ("query",),
+    "cache_stats": (),
+}
+
+
+def handle(method, params):
+    """Dispatch one request; raises KeyError for unknown methods or missing params"""
+    return METHODS[method](params)
+
+
+def _persist_error(params, over_unix):
+    """Why the daemon refuses a persist request, or None when it may write"""
+    if not params.get("persist"):
+        return None
+    if not over_unix:
+        return "persist is only served over a unix socket"
+    output_dir = params.get("output_dir")
+    if not isinstance(output_dir, str) or not os.path.isabs(output_dir):
+        return "persist needs an absolute output_dir"
+    root = os.path.realpath(os.environ.get(PERSIST_ROOT_ENV) or os.path.expanduser("~"))
+    if os.path.commonpath([root, os.path.realpath(output_dir)]) != root:
+        return f"output_dir must be inside {root}"
+    return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    _nonce = None
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if self._nonce is not None:
+            self.send_header(PROOF_HEADER, _sign(self.server.token, "server", self._nonce))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorised(self):
+        """Unix peers pass on file permissions; TCP peers must sign their nonce with the token"""
+        token = self.server.token
+        if token is None:
+            return True
+        nonce, auth = self.headers.get(NONCE_HEADER), self.headers.get(AUTH_HEADER)
+        if not nonce or not auth or not hmac.compare_digest(auth, _sign(token, "client", nonce)):
+            return False
+        self._nonce = nonce
+        return True
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(200, {"status": "ok"})
+        else:
+            self._reply(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        self._nonce = None
+        # Browsers cannot send application/json cross-site without a CORS preflight
+        if self.headers.get_content_type() != "application/json":
+            self._reply(415, {"error": "Content-Type must be application/json"})
+            return
+        if not self._authorised():
+            self._reply(403, {"error": "Missing or invalid daemon token"})
+            return
+        method = self.path.strip("/")
+        if method not in METHODS:
+            self._reply(404, {"error": f"Unknown method: {method}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            params = json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+            if not isinstance(params, dict):
+                raise ValueError("body must be a JSON object")
+            error = field_error(params, REQUIRED_PARAMS[method])
+            if error:
+                self._reply(400, {"error": f"Bad request: {error}"})
+                return
+            refused = _persist_error(params, self.server.token is None) if method == "generate_design_system" else None
+            if refused:
+                self._reply(403, {"error": refused})
+                return
+            result = handle(method, params)
+        except (ValueError, KeyError, TypeError) as e:
+            self._reply(400, {"error": f"Bad request: {e}"})
+            return
+        self._reply(200, result)
+
+    def address_string(self):
+        # Unix-socket peers have no (host, port) tuple
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _TCPHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = REQUEST_QUEUE_SIZE
+    token = None
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = REQUEST_QUEUE_SIZE
+    token = None
+
+    def server_bind(self):
+        # Owner-only from the start: the socket's permissions are its authentication
+        umask = os.umask(0o177)
+        try:
+            socketserver.UnixStreamServer.server_bind(self)
+        finally:
+            os.umask(umask)
+        self.server_name, self.server_port = "localhost", 0
+
+
+def _write_token(target):
+    """Create a fresh token for the TCP daemon on target in an owner-only file; returns it"""
+    token = secrets.token_hex(32).encode("ascii")
+    os.makedirs(TOKEN_DIR, mode=0o700, exist_ok=True)
+    path = _token_path(target)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(token)
+    os.replace(tmp, path)
+    return token
+
+
+def serve(address=None, shards=None):
+    """Warm every index (and shard workers, before any thread starts) and serve requests until interrupted"""
+    global _default_shards, _serving
+    kind, target = _parse_address(address)
+
+    _default_shards = shards
+    warm(shards=shards, fuzzy=True, suggest=True)
+    DesignSystemGenerator()  # loads the reasoning table into the shared registry
+    # Handler threads must never fork: selections not warmed above are scored unsharded
+    pin_shards()
+    _serving = True
+
+    if kind == "unix":
+        if os.path.exists(target):
+            os.unlink(target)
+        server = _UnixHTTPServer(target, _Handler)
+    else:
+        server = _TCPHTTPServer(target, _Handler)
+        server.token = _write_token(target)
+
+    # SIGTERM unwinds like Ctrl-C, so the socket and token files are removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"UI Pro Max search server listening on {address or os.environ.get(SERVER_ENV) or DEFAULT_ADDRESS}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if kind == "unix" and os.path.exists(target):
+            os.unlink(target)
+        if server.token is not None:
+            try:
+                os.unlink(_token_path(target))
+            except OSError:
+                pass
+
+
+# ============ CLIENT ============
+def call_or_run(method, params, address=None, use_daemon=True):
+    """Forward to the daemon when it is running, otherwise execute in-process"""
+    if use_daemon:
+        result = call(method, params, address)
+        if result is not None:
+            return result
+    return handle(method, params)
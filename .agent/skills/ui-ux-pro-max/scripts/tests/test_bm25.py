@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for BM25 MaxScore top-k selection against exhaustive scoring.
+
+Run: python -m pytest scripts/tests   (or python -m unittest discover scripts/tests)
+"""
+
+import random
+import sys
+import unittest
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from core import BM25, CSV_CONFIG, DATA_DIR, load_rows
+
+WORDS = ["dark", "glass", "card", "mode", "toggle", "grid", "layout", "modal", "button", "color", "font", "hero"]
+
+
+def _expected(bm25, query, k):
+    """score()[:k] without the zero-score tail"""
+    return [(idx, score) for idx, score in bm25.score(query) if score > 0][:k]
+
+
+class MaxScoreTest(unittest.TestCase):
+    def test_random_corpora_match_exhaustive_scoring(self):
+        rng = random.Random(11)
+        for _ in range(60):
+            bm25 = BM25()
+            # A small word list makes ties and skewed term frequencies common
+            bm25.fit([" ".join(rng.choices(WORDS, k=rng.randint(0, 12))) for _ in range(rng.randint(1, 80))])
+            for _ in range(10):
+                query = " ".join(rng.choices(WORDS + ["unknown"], k=rng.randint(1, 5)))
+                for k in (1, 3, 10):
+                    self.assertEqual(bm25.top_k(query, k), _expected(bm25, query, k), (query, k))
+
+    def test_shipped_styles_match_exhaustive_scoring(self):
+        cols = CSV_CONFIG["style"]["search_cols"]
+        rows = load_rows(DATA_DIR / CSV_CONFIG["style"]["file"])
+        bm25 = BM25()
+        bm25.fit([" ".join(str(row.get(col, "")) for col in cols) for row in rows])
+        for query in ("glassmorphism", "minimal dark dashboard", "playful colorful kids app", "modern modern saas"):
+            self.assertEqual(bm25.top_k(query, 5), _expected(bm25, query, 5), query)
+
+    def test_edge_cases(self):
+        bm25 = BM25()
+        bm25.fit(["dark glass", "light card"])
+        self.assertEqual(bm25.top_k("dark", 0), [])
+        self.assertEqual(bm25.top_k("nothing here", 3), [])
+        self.assertEqual(bm25.top_k("a an", 3), [])
+        self.assertEqual(BM25().top_k("dark", 3), [])
+
+    def test_top_k_many_matches_top_k(self):
+        bm25 = BM25()
+        bm25.fit(["dark glass card", "light glass", "dark mode toggle", "card grid layout"])
+        queries = ["dark", "glass card", "grid toggle", "missing"]
+        self.assertEqual(bm25.top_k_many(queries, 2), [bm25.top_k(query, 2) for query in queries])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the compiled domain classifier against per-keyword substring checks.
+
+Run: python -m pytest scripts/tests   (or python -m unittest discover scripts/tests)
+"""
+
+import csv
+import random
+import sys
+import unittest
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from core import DATA_DIR, DOMAIN_KEYWORDS_FILE, FALLBACK_DOMAIN, DomainClassifier, detect_domain
+
+
+def _shipped_keywords():
+    """domain -> keywords as listed in DOMAIN_KEYWORDS_FILE, read without the classifier"""
+    domain_keywords = {}
+    with open(DATA_DIR / DOMAIN_KEYWORDS_FILE, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            keywords = [kw.strip() for kw in (row.get("Keywords") or "").split(",")]
+            domain_keywords.setdefault(row["Domain"].strip(), []).extend(kw for kw in keywords if kw)
+    return domain_keywords
+
+
+def _linear_scores(domain_keywords, query):
+    query_lower = query.lower()
+    return {domain: sum(1 for kw in keywords if kw.lower() in query_lower) for domain, keywords in domain_keywords.items()}
+
+
+def _linear_classify(domain_keywords, query):
+    scores = _linear_scores(domain_keywords, query)
+    best = max(scores, key=scores.get, default=None)
+    return best if best is not None and scores[best] > 0 else FALLBACK_DOMAIN
+
+
+class DomainClassifierTest(unittest.TestCase):
+    def test_random_keyword_tables(self):
+        rng = random.Random(13)
+        for _ in range(200):
+            # Short keywords over a tiny alphabet: prefixes, nesting, overlaps and repeats are common
+            domain_keywords = {
+                f"d{i}": ["".join(rng.choices("ab ", k=rng.randint(0, 3))) for _ in range(rng.randint(0, 4))]
+                for i in range(rng.randint(1, 4))
+            }
+            classifier = DomainClassifier(domain_keywords)
+            for _ in range(20):
+                query = "".join(rng.choices("abAB c", k=rng.randint(0, 12)))
+                self.assertEqual(classifier.scores(query), _linear_scores(domain_keywords, query), (domain_keywords, query))
+                self.assertEqual(classifier.classify(query), _linear_classify(domain_keywords, query))
+
+    def test_regex_metacharacters_are_literal(self):
+        domain_keywords = {"web": ["next.js", "a+b", "(x)"], "style": ["nextxjs"]}
+        classifier = DomainClassifier(domain_keywords)
+        for query in ("next.js app", "nextxjs", "a+b (x)", "aab"):
+            self.assertEqual(classifier.scores(query), _linear_scores(domain_keywords, query), query)
+
+    def test_shipped_keywords(self):
+        classifier = DomainClassifier.from_csv(DATA_DIR / DOMAIN_KEYWORDS_FILE)
+        domain_keywords = _shipped_keywords()
+        rng = random.Random(17)
+        words = [kw for keywords in domain_keywords.values() for kw in keywords] + ["app", "for", "the"]
+        for _ in range(1000):
+            query = " ".join(rng.choices(words, k=rng.randint(1, 4)))
+            self.assertEqual(classifier.scores(query), _linear_scores(domain_keywords, query), query)
+            self.assertEqual(detect_domain(query), _linear_classify(domain_keywords, query), query)
+        self.assertEqual(detect_domain("nothing relevant"), FALLBACK_DOMAIN)
+
+
+if __name__ == "__main__":
+    unittest.main()
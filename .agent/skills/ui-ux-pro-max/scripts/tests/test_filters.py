@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for --where filters: where_conditions, row bitmaps and filtered top-k.
+
+Run: python -m pytest scripts/tests   (or python -m unittest discover scripts/tests)
+"""
+
+import csv
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from core import BM25, FilterError, Table, bitmap_count, bitmap_ids, bitmap_mask, search, where_conditions
+
+COLUMNS = ["Name", "Severity", "Platform", "Notes"]
+
+
+def _scan(rows, conditions):
+    """Row ids matching every condition, by plain comparison"""
+    def key(value):
+        return "" if value is None else value.strip().casefold()
+
+    return [idx for idx, row in enumerate(rows)
+            if all(key(row.get(next(c for c in COLUMNS if c.casefold() == col.casefold()))) in keys
+                   for col, keys in conditions)]
+
+
+class WhereConditionsTest(unittest.TestCase):
+    def test_normalises_every_accepted_form(self):
+        expected = (("Severity", ("high", "medium")),)
+        self.assertEqual(where_conditions("Severity=HIGH"), (("Severity", ("high",)),))
+        self.assertEqual(where_conditions(["Severity=High", "severity= medium "]), expected)
+        self.assertEqual(where_conditions({"Severity": ["High", "Medium"]}), expected)
+        self.assertEqual(where_conditions([("Severity", ("high", "medium"))]), expected)
+        self.assertEqual(where_conditions(None), ())
+        self.assertEqual(where_conditions([]), ())
+
+    def test_columns_are_anded_and_sorted(self):
+        self.assertEqual(where_conditions(["Type=General", "Severity=High"]),
+                         (("Severity", ("high",)), ("Type", ("general",))))
+
+    def test_malformed_filters_raise(self):
+        for where in ("Severity", "=High", ["Severity"], 42, {1: "High"}, [(1, "High")], {"Severity"}):
+            with self.assertRaises(FilterError, msg=repr(where)):
+                where_conditions(where)
+
+    def test_filter_error_is_a_value_error(self):
+        self.assertTrue(issubclass(FilterError, ValueError))
+
+
+class BitmapTest(unittest.TestCase):
+    def test_helpers(self):
+        rng = random.Random(1)
+        for n in (0, 1, 7, 8, 9, 100):
+            ids = sorted(rng.sample(range(n), rng.randint(0, n))) if n else []
+            bitmap = sum(1 << idx for idx in ids)
+            self.assertEqual(list(bitmap_ids(bitmap)), ids)
+            self.assertEqual(bitmap_count(bitmap), len(ids))
+            self.assertEqual(bitmap_mask(bitmap, n), bytes(int(idx in ids) for idx in range(n)))
+
+
+class TableWhereTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(21)
+        cls.tmp = tempfile.TemporaryDirectory()
+        path = Path(cls.tmp.name) / "rows.csv"
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            for idx in range(300):
+                row = [f"row {idx}", rng.choice(["High", "high ", "Medium", "Low", ""]),
+                       rng.choice(["Web", "iOS", "Android"]), f"note {rng.randint(0, 200)}"]
+                # Short rows leave trailing cells empty (None)
+                writer.writerow(row[:rng.choice([2, 4, 4, 4])])
+        cls.table = Table.from_csv(path)
+        cls.rows = [dict(row) for row in cls.table]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_low_cardinality_columns_are_faceted(self):
+        facets = self.table.facets()
+        self.assertIn("Severity", facets)
+        self.assertNotIn("Name", facets)
+
+    def test_bitmaps_match_row_scan(self):
+        for where in ("Severity=high", ["severity=High", "Platform=web"], "Platform=", "Severity=",
+                      {"Severity": ["low", "medium"], "Platform": "ios"}, "Notes=note 7", "Name=row 3",
+                      "Severity=missing"):
+            conditions = where_conditions(where)
+            self.assertEqual(list(bitmap_ids(self.table.where(conditions))), _scan(self.rows, conditions), where)
+
+    def test_unknown_column_raises(self):
+        with self.assertRaises(FilterError):
+            self.table.where(where_conditions("Colour=red"))
+
+    def test_filtered_top_k_ranks_only_allowed_rows(self):
+        bm25 = BM25()
+        bm25.fit([" ".join(str(value or "") for value in row.values()) for row in self.rows])
+        rng = random.Random(4)
+        for where in ("Severity=high", "Platform=android", "Notes=note 1", "Severity=missing"):
+            allowed = self.table.where(where_conditions(where))
+            ids = set(bitmap_ids(allowed))
+            for query in ("note 12", "row web", "ios high note"):
+                expected = [(idx, score) for idx, score in bm25.score(query) if score > 0 and idx in ids][:5]
+                self.assertEqual(bm25.top_k(query, 5, allowed), expected, (where, query))
+        # Both strategies: selective bitmaps score row by row, broad ones mask MaxScore
+        for _ in range(50):
+            allowed = sum(1 << idx for idx in range(len(self.rows)) if rng.random() < rng.choice([0.01, 0.5, 0.95]))
+            ids = set(bitmap_ids(allowed))
+            expected = [(idx, score) for idx, score in bm25.score("note row") if score > 0 and idx in ids][:3]
+            self.assertEqual(bm25.top_k("note row", 3, allowed), expected)
+
+
+class SearchWhereTest(unittest.TestCase):
+    def test_filtered_results_all_match(self):
+        result = search("form input", "ux", max_results=10, where="Severity=HIGH")
+        self.assertGreater(result["count"], 0)
+        self.assertEqual(result["where"], {"Severity": ["high"]})
+        self.assertTrue(all(row["Severity"].strip().casefold() == "high" for row in result["results"]))
+
+    def test_bad_filters_are_reported(self):
+        self.assertIn("error", search("form", "ux", where="Colour=red"))
+        self.assertIn("error", search("form", "ux", where="Severity"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for typo-tolerant matching: edit_distance, FuzzyIndex and fuzzy=True search.
+
+Run: python -m pytest scripts/tests   (or python -m unittest discover scripts/tests)
+"""
+
+import itertools
+import random
+import sys
+import unittest
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import core
+from core import BM25, FuzzyIndex, edit_distance, search, search_stack
+
+
+def _reference_distance(a, b):
+    """Full-table optimal string alignment distance"""
+    d = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i in range(len(a) + 1):
+        d[i][0] = i
+    for j in range(len(b) + 1):
+        d[0][j] = j
+    for i, j in itertools.product(range(1, len(a) + 1), range(1, len(b) + 1)):
+        cost = a[i - 1] != b[j - 1]
+        d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + cost)
+        if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+            d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[len(a)][len(b)]
+
+
+class EditDistanceTest(unittest.TestCase):
+    def test_matches_full_table_within_limit(self):
+        rng = random.Random(7)
+        for _ in range(2000):
+            a = "".join(rng.choice("abc") for _ in range(rng.randint(0, 7)))
+            b = "".join(rng.choice("abc") for _ in range(rng.randint(0, 7)))
+            expected = _reference_distance(a, b)
+            for limit in (0, 1, 2, 3):
+                self.assertEqual(edit_distance(a, b, limit), expected if expected <= limit else limit + 1, (a, b, limit))
+
+    def test_adjacent_swap_costs_one(self):
+        self.assertEqual(edit_distance("tailwnid", "tailwind", 2), 1)
+
+
+class FuzzyIndexTest(unittest.TestCase):
+    def test_lookup_equals_vocabulary_scan(self):
+        rng = random.Random(3)
+        terms = sorted({"".join(rng.choice("abcde") for _ in range(rng.randint(1, 9))) for _ in range(400)})
+        index = FuzzyIndex(terms)
+        for _ in range(300):
+            word = "".join(rng.choice("abcdef") for _ in range(rng.randint(1, 10)))
+            scan = sorted((edit_distance(word, term, 2), pos) for pos, term in enumerate(terms)
+                          if edit_distance(word, term, 2) <= 2)
+            self.assertEqual(index.lookup(word), [(pos, distance) for distance, pos in scan], word)
+
+
+class FuzzySearchTest(unittest.TestCase):
+    def test_misspelled_style_queries_find_rows(self):
+        self.assertEqual(search("glassmorphism")["results"][:1], search("glasmorphism", fuzzy=True)["results"][:1])
+        self.assertGreater(search("neumorphizm", fuzzy=True)["count"], 0)
+        self.assertEqual(search("neumorphizm")["count"], 0)
+
+    def test_tailwnd_is_found_through_its_stack_only(self):
+        # The stack vocabulary has "tailwind"; the auto-detected domain's does not, even unmisspelt
+        self.assertGreater(search_stack("tailwnd", "html-tailwind", fuzzy=True)["count"], 0)
+        self.assertEqual(search("tailwnd", fuzzy=True)["count"], 0)
+        self.assertEqual(search("tailwind")["count"], 0)
+
+    def test_known_tokens_keep_exact_ranking(self):
+        bm25 = BM25()
+        bm25.fit(["dark glass card", "light glass", "dark mode toggle", "card grid layout"])
+        for query in ("dark glass", "card", "mode toggle glass"):
+            self.assertIsNone(bm25.expand(bm25.tokenize(query)))
+            self.assertEqual(bm25.top_k_many([query], 3, fuzzy=True), bm25.top_k_many([query], 3))
+
+    def test_expansion_weights_by_distance(self):
+        bm25 = BM25()
+        bm25.fit(["dark glass card", "light glass", "dark mode toggle"])
+        weighted = dict(bm25.expand(bm25.tokenize("glas drak")))
+        self.assertEqual(weighted["glass"], core.FUZZY_DISCOUNTS[1])
+        self.assertEqual(weighted["dark"], core.FUZZY_DISCOUNTS[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
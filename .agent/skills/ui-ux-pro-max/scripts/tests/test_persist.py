@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for change-aware, atomic and locked persist_design_system writes.
+
+Run: python -m pytest scripts/tests   (or python -m unittest discover scripts/tests)
+"""
+
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import design_system
+from design_system import DesignSystemGenerator, _directory_lock, _write_if_changed, fcntl, persist_design_system
+
+# Exit status 1 when another process holds the lock on argv[1], 0 once it could take it
+_TRY_LOCK = """
+import fcntl, os, sys
+fd = os.open(sys.argv[1], os.O_RDONLY)
+try:
+    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+except BlockingIOError:
+    sys.exit(1)
+"""
+
+
+class WriteIfChangedTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.path = self.dir / "MASTER.md"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_outcomes(self):
+        first = "# Master\n**Generated:** 2024-01-01 10:00:00\nbody\n"
+        self.assertEqual(_write_if_changed(self.path, first), "written")
+        self.assertEqual(_write_if_changed(self.path, first), "unchanged")
+        self.assertEqual(_write_if_changed(self.path, first.replace("10:00", "11:00")), "skipped")
+        self.assertEqual(self.path.read_text(encoding="utf-8"), first)
+        self.assertEqual(_write_if_changed(self.path, first.replace("body", "changed")), "written")
+        self.assertIn("changed", self.path.read_text(encoding="utf-8"))
+        self.assertEqual(os.listdir(self.dir), ["MASTER.md"])
+
+    def test_replacing_keeps_the_file_mode(self):
+        self.path.write_text("old", encoding="utf-8")
+        os.chmod(self.path, 0o640)
+        self.assertEqual(_write_if_changed(self.path, "new"), "written")
+        self.assertEqual(stat.S_IMODE(self.path.stat().st_mode), 0o640)
+
+    def test_failed_replace_leaves_the_old_file_and_no_temp_file(self):
+        self.path.write_text("old", encoding="utf-8")
+        with mock.patch.object(design_system.os, "replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                _write_if_changed(self.path, "new")
+        self.assertEqual(self.path.read_text(encoding="utf-8"), "old")
+        self.assertEqual(os.listdir(self.dir), ["MASTER.md"])
+
+
+@unittest.skipIf(fcntl is None, "flock is not available")
+class DirectoryLockTest(unittest.TestCase):
+    def _locked_elsewhere(self, directory):
+        return subprocess.run([sys.executable, "-c", _TRY_LOCK, str(directory)]).returncode == 1
+
+    def test_lock_excludes_other_processes_until_released(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with _directory_lock(Path(tmp)):
+                self.assertTrue(self._locked_elsewhere(tmp))
+            self.assertFalse(self._locked_elsewhere(tmp))
+
+
+class PersistTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.design_system = DesignSystemGenerator().generate("fintech dashboard dark", "Test Project")
+
+    def test_rerun_writes_nothing(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            first = persist_design_system(self.design_system, page="Checkout, Settings", output_dir=tmp)
+            self.assertEqual(len(first["written"]), 3)
+            second = persist_design_system(self.design_system, page="Checkout, Settings", output_dir=tmp)
+            self.assertEqual(second["written"], [])
+            self.assertEqual(sorted(second["skipped"] + second["unchanged"]), sorted(first["created_files"]))
+
+    def test_concurrent_persists_leave_whole_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(
+                persist_design_system(self.design_system, page="Checkout", output_dir=tmp))) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(sum(len(result["written"]) for result in results), 2)
+            master = Path(tmp) / "design-system" / "test-project" / "MASTER.md"
+            self.assertTrue(master.read_text(encoding="utf-8").startswith("# Design System Master File"))
+            self.assertEqual(sorted(os.listdir(master.parent)), ["MASTER.md", "pages"])
+
+    def test_unsafe_names_write_nothing(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for page, project in (("../escape", "Test Project"), ("a/b", "Test Project"), (None, "..")):
+                with self.assertRaises(ValueError):
+                    persist_design_system({**self.design_system, "project_name": project}, page=page, output_dir=tmp)
+            self.assertEqual(os.listdir(tmp), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the Aho-Corasick automaton and the compiled reasoning-rule matcher.
+
+Run: python -m pytest scripts/tests   (or python -m unittest discover scripts/tests)
+"""
+
+import random
+import sys
+import unittest
+from collections import Counter
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from core import AhoCorasick, DATA_DIR, load_rows
+from design_system import REASONING_FILE, ReasoningMatcher, _compiled_matcher
+
+
+def _linear_rule(rows, category):
+    """The three linear scans ReasoningMatcher replaces: exact, then partial, then keyword"""
+    category_lower = category.lower()
+    for rule in rows:
+        if rule.get("UI_Category", "").lower() == category_lower:
+            return rule
+    for rule in rows:
+        ui_cat = rule.get("UI_Category", "").lower()
+        if ui_cat in category_lower or category_lower in ui_cat:
+            return rule
+    for rule in rows:
+        keywords = rule.get("UI_Category", "").lower().replace("/", " ").replace("-", " ").split()
+        if any(kw in category_lower for kw in keywords):
+            return rule
+    return {}
+
+
+def _occurrences(pattern, text):
+    """Overlapping occurrences of pattern in text"""
+    if not pattern:
+        return 1
+    return sum(text.startswith(pattern, i) for i in range(len(text)))
+
+
+class AhoCorasickTest(unittest.TestCase):
+    def test_reports_every_occurrence(self):
+        rng = random.Random(5)
+        for _ in range(300):
+            patterns = ["".join(rng.choices("abc", k=rng.randint(0, 4))) for _ in range(rng.randint(1, 8))]
+            text = "".join(rng.choices("abcd", k=rng.randint(0, 30)))
+            automaton = AhoCorasick((pattern, i) for i, pattern in enumerate(patterns))
+            expected = Counter({i: _occurrences(p, text) for i, p in enumerate(patterns) if _occurrences(p, text)})
+            self.assertEqual(Counter(automaton.iter_values(text)), expected, (patterns, text))
+            self.assertEqual(automaton.values(text), set(expected), (patterns, text))
+
+    def test_nested_and_overlapping_patterns(self):
+        automaton = AhoCorasick([("he", "he"), ("she", "she"), ("his", "his"), ("hers", "hers")])
+        self.assertEqual(sorted(automaton.iter_values("ushers")), ["he", "hers", "she"])
+        self.assertEqual(automaton.values("ahishe"), {"his", "she", "he"})
+
+
+class ReasoningMatcherTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.rows = load_rows(DATA_DIR / REASONING_FILE)
+        cls.matcher = ReasoningMatcher(cls.rows)
+
+    def _assert_same(self, category):
+        rule = self.matcher.find(category)
+        self.assertEqual(rule.row if rule else {}, _linear_rule(self.rows, category), category)
+
+    def test_shipped_categories_match_linear_scans(self):
+        for row in self.rows:
+            ui_cat = row.get("UI_Category", "")
+            self._assert_same(ui_cat)
+            self._assert_same(ui_cat.upper())
+            self._assert_same(f"modern {ui_cat} platform")
+            for word in ui_cat.replace("/", " ").replace("-", " ").split():
+                self._assert_same(word)
+                self._assert_same(word[1:-1])
+
+    def test_free_text_matches_linear_scans(self):
+        rng = random.Random(9)
+        words = [word for row in self.rows for word in row.get("UI_Category", "").lower().split()] + ["zzz", "a", "/"]
+        for _ in range(2000):
+            self._assert_same(" ".join(rng.choices(words, k=rng.randint(1, 4))))
+        for category in ("", "\x00", "unmatched category", "SaaS", "e-commerce"):
+            self._assert_same(category)
+
+    def test_compiled_once_per_table(self):
+        self.assertIs(_compiled_matcher(self.rows), _compiled_matcher(self.rows))
+
+
+if __name__ == "__main__":
+    unittest.main()
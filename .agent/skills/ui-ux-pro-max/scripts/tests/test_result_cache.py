@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the result cache: in-memory LRU and the shared SQLite tier.
+
+Run: python -m pytest scripts/tests   (or python -m unittest discover scripts/tests)
+"""
+
+import contextlib
+import io
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import core
+from core import ResultCache, _DiskCache
+
+ROWS = [{"Style Category": "Glassmorphism", "Keywords": "glass, frosted"}]
+
+
+class LRUTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = ResultCache(maxsize=2)
+        cache.put("a", ROWS)
+        cache.put("b", [])
+        self.assertEqual(cache.get("a"), ROWS)
+        cache.put("c", [])
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), ROWS)
+        stats = cache.stats()
+        self.assertEqual((stats["size"], stats["hits"], stats["misses"], stats["evictions"]), (2, 2, 1, 1))
+
+    def test_resize_and_disable(self):
+        cache = ResultCache(maxsize=4)
+        for key in "abcd":
+            cache.put(key, [])
+        cache.resize(1)
+        self.assertEqual(cache.stats()["size"], 1)
+        self.assertIsNotNone(cache.get("d"))
+        cache.resize(0)
+        cache.put("e", [])
+        self.assertIsNone(cache.get("e"))
+
+
+class DiskTierTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "cache.db"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_entries_are_shared_between_caches(self):
+        writer, reader = ResultCache(disk_path=self.path), ResultCache(disk_path=self.path)
+        key = ("styles.csv", ("Keywords",), (1, 2), ("glass",), 3)
+        writer.put(key, ROWS)
+        self.assertEqual(reader.get(key), ROWS)
+        self.assertEqual(reader.stats()["disk_hits"], 1)
+        # The disk hit was promoted into memory
+        self.assertEqual(reader.get(key), ROWS)
+        self.assertEqual(reader.stats()["disk_hits"], 1)
+        writer.clear(disk=True)
+        self.assertIsNone(ResultCache(disk_path=self.path).get(key))
+
+    def test_row_cap_keeps_the_newest_rows(self):
+        disk = _DiskCache(self.path)
+        for i in range(20):
+            disk.put(f"k{i}", [i])
+        disk.put("k3", [3])
+        disk.close()
+        disk = _DiskCache(self.path, max_rows=5)
+        kept = {key for key, in disk._conn.execute("SELECT key FROM results")}
+        self.assertEqual(kept, {"k3", "k16", "k17", "k18", "k19"})
+        disk.close()
+
+    def test_unreadable_row_is_a_miss(self):
+        cache = ResultCache(disk_path=self.path)
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("INSERT INTO results (key, value) VALUES (?, ?)", (cache._digest("k"), "{not json"))
+        self.assertIsNone(cache.get("k"))
+        cache.put("k", ROWS)
+        self.assertEqual(ResultCache(disk_path=self.path).get("k"), ROWS)
+
+    def test_unusable_file_falls_back_to_memory(self):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            cache = ResultCache(disk_path=self.tmp.name)  # a directory
+        self.assertIn("caching in memory only", stderr.getvalue())
+        self.assertIsNone(cache.stats()["disk"])
+        cache.put("k", ROWS)
+        self.assertEqual(cache.get("k"), ROWS)
+
+    def test_failing_tier_is_detached(self):
+        cache = ResultCache(disk_path=self.path)
+        cache._disk._conn.close()
+        with contextlib.redirect_stderr(io.StringIO()):
+            cache.put("k", ROWS)
+        self.assertIsNone(cache.stats()["disk"])
+        self.assertEqual(cache.get("k"), ROWS)
+
+
+class SearchCacheTest(unittest.TestCase):
+    def tearDown(self):
+        core.configure_cache(disk_path=None)
+        core.invalidate()
+
+    def test_cached_results_equal_fresh_ones(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            core.configure_cache(disk_path=Path(tmp) / "cache.db")
+            core.invalidate()
+            fresh = core.search("minimal dark dashboard", "style")
+            core.invalidate()
+            before = core.cache_stats()["disk_hits"]
+            cached = core.search("minimal dark dashboard", "style")
+            self.assertEqual(cached, fresh)
+            self.assertEqual(core.cache_stats()["disk_hits"], before + 1)
+            # Callers get their own row dicts
+            cached["results"][0]["Style Category"] = "changed"
+            self.assertEqual(core.search("minimal dark dashboard", "style"), fresh)
+
+
+if __name__ == "__main__":
+    unittest.main()
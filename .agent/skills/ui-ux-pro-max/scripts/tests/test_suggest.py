@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for prefix autocomplete: PrefixTrie top-N lists and suggest().
+
+Run: python -m pytest scripts/tests   (or python -m unittest discover scripts/tests)
+"""
+
+import random
+import re
+import sys
+import unittest
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from core import PrefixTrie, suggest
+
+
+class PrefixTrieTest(unittest.TestCase):
+    def test_top_matches_sorting_every_item(self):
+        rng = random.Random(8)
+        for _ in range(100):
+            top_n = rng.randint(1, 5)
+            trie, items = PrefixTrie(top_n), []
+            for value in range(rng.randint(0, 40)):
+                keys = {"".join(rng.choices("abc", k=rng.randint(0, 4))) for _ in range(rng.randint(1, 3))}
+                rank = (rng.randint(0, 5), value)
+                trie.add(keys, value, rank)
+                items.append((rank, value, keys))
+            trie.freeze()
+            for prefix in ("", "a", "ab", "ba", "abc", "cccc", "d"):
+                matching = sorted((rank, value) for rank, value, keys in items
+                                  if any(key.startswith(prefix) for key in keys))
+                for limit in (0, 1, top_n, top_n + 3):
+                    self.assertEqual(trie.top(prefix, limit), [value for _, value in matching[:limit]], (prefix, limit))
+
+
+class SuggestTest(unittest.TestCase):
+    def test_terms_complete_the_last_word(self):
+        result = suggest("dark glas", "style")
+        self.assertTrue(result["terms"])
+        self.assertTrue(all(entry["term"].startswith("glas") for entry in result["terms"]))
+        freqs = [entry["doc_freq"] for entry in result["terms"]]
+        self.assertEqual(freqs, sorted(freqs, reverse=True))
+
+    def test_titles_complete_any_word_start(self):
+        titles = [entry["title"] for entry in suggest("dash", "product", limit=50)["titles"]]
+        self.assertTrue(titles)
+        self.assertTrue(all(re.search(r"\bdash", title.lower()) for title in titles))
+        self.assertNotIn("Glassmorphism", [entry["title"] for entry in suggest("morph", "style")["titles"]])
+
+    def test_trailing_space_completes_no_term(self):
+        self.assertEqual(suggest("dark ", "style")["terms"], [])
+
+    def test_unknown_domain(self):
+        self.assertIn("error", suggest("dark", "nope"))
+
+
+if __name__ == "__main__":
+    unittest.main()
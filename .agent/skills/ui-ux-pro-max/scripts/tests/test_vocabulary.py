@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the shared token vocabulary and its reset on invalidate().
+
+Run: python -m pytest scripts/tests   (or python -m unittest discover scripts/tests)
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import core
+from core import BM25
+
+
+class VocabularyTest(unittest.TestCase):
+    def tearDown(self):
+        core.invalidate()
+
+    def test_indexes_share_token_ids(self):
+        first, second = BM25(), BM25()
+        first.fit(["glass card", "dark mode"])
+        second.fit(["dark glass"])
+        self.assertEqual(first.vocabulary.get("glass"), second.vocabulary.get("glass"))
+
+    def test_invalidate_starts_a_fresh_vocabulary(self):
+        core.search("glassmorphism dark", "style")
+        before = core._vocabulary
+        self.assertGreater(len(before.terms), 0)
+        core.invalidate()
+        self.assertIsNot(core._vocabulary, before)
+        self.assertEqual(core._vocabulary.terms, [])
+
+    def test_index_built_before_invalidate_keeps_its_terms(self):
+        bm25 = BM25()
+        bm25.fit(["dark glass card", "light glass", "dark mode toggle"])
+        expected = bm25.top_k_many(["glass toggle"], 3)
+        core.invalidate()
+        fresh = BM25()
+        fresh.fit(["toggle switch"])
+        self.assertEqual(bm25.top_k_many(["glass toggle"], 3), expected)
+        self.assertEqual(sorted(bm25.idf), ["card", "dark", "glass", "light", "mode", "toggle"])
+
+    def test_search_results_survive_invalidate(self):
+        before = core.search("minimal dashboard", "style")["results"]
+        core.invalidate()
+        self.assertEqual(core.search("minimal dashboard", "style")["results"], before)
+
+
+if __name__ == "__main__":
+    unittest.main()